@@ -0,0 +1,146 @@
+"""Per-model accuracy of resolved predictions, maintained incrementally."""
+
+import bisect
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+from symbols import DEFAULT_SYMBOL
+
+ROLLING_WINDOW = 20
+
+
+def direction_hits(prediction, actual_price, base_price) -> np.ndarray:
+    """1.0 where the predicted and realised moves share a sign, else 0.0.
+
+    Both moves are measured from ``base_price``, the close the prediction
+    was made on.  Rows without a base price (stored before it was recorded)
+    or an actual price are NaN.  The API summary and the backtest both score
+    hits with this function.
+    """
+    prediction = np.asarray(prediction, dtype=float)
+    actual = np.asarray(actual_price, dtype=float)
+    base = np.asarray(base_price, dtype=float)
+    hits = ((prediction > 0) == (actual > base)).astype(float)
+    hits[np.isnan(base) | np.isnan(actual)] = np.nan
+    return hits
+
+
+def score_rows(rows) -> pd.DataFrame:
+    """Absolute error and direction hit for each resolved prediction row.
+
+    ``hit`` is 1.0/0.0, or NaN for rows without a ``base_price``.
+    """
+    frame = pd.DataFrame(rows)
+    if frame.empty:
+        return pd.DataFrame(columns=["id", "symbol", "model_type", "date", "abs_error", "hit"])
+    if "symbol" not in frame:
+        frame["symbol"] = DEFAULT_SYMBOL
+    predicted = frame["predicted_price"].astype(float)
+    actual = frame["actual_price"].astype(float)
+    base = frame["base_price"].astype(float) if "base_price" in frame else np.nan
+    return pd.DataFrame(
+        {
+            "id": frame["id"],
+            "symbol": frame["symbol"].fillna(DEFAULT_SYMBOL),
+            "model_type": frame["model_type"],
+            "date": frame["10_days_later_date"].astype(str).str[:10],
+            "abs_error": (actual - predicted).abs(),
+            "hit": direction_hits(frame["prediction"].astype(float), actual, base),
+        }
+    )
+
+
+def _rate(hits):
+    """Share of hits among the scored (non-NaN) entries, None if there are none."""
+    scored = [h for h in hits if not np.isnan(h)]
+    return sum(scored) / len(scored) if scored else None
+
+
+class AccuracySummary:
+    """Running MAE and hit rate per (symbol, model), overall and over the
+    ``window`` most recently resolved predictions.  Hit rates only count rows
+    with a base price and are None when there are none.
+
+    The aggregate is seeded from ``loader()`` on first use and afterwards
+    folds in newly resolved rows passed to :meth:`add`.  Rows already
+    counted (by id) are ignored, so a row resolved while the seed is loading
+    is not counted twice.
+
+    Rows resolved by another process never reach :meth:`add`.  With
+    ``version``, a callable returning the number of resolved rows stored,
+    each summary compares it with the rows counted here and re-seeds when
+    they differ.
+    """
+
+    def __init__(self, loader, window: int = ROLLING_WINDOW, version=None):
+        self._loader = loader
+        self._version = version
+        self.window = window
+        self._lock = Lock()
+        self._seeded = False
+        self._seen = set()
+        self._stats = {}
+
+    def _fold(self, rows):
+        scored = score_rows(rows)
+        scored = scored[~scored["id"].isin(self._seen)]
+        for (symbol, model), group in scored.groupby(["symbol", "model_type"]):
+            stats = self._stats.setdefault(
+                (symbol, model),
+                {"count": 0, "abs_error": 0.0, "hits": 0, "scored": 0, "recent": []},
+            )
+            stats["count"] += len(group)
+            stats["abs_error"] += float(group["abs_error"].sum())
+            stats["hits"] += int(group["hit"].sum())
+            stats["scored"] += int(group["hit"].notna().sum())
+            recent = stats["recent"]
+            for date, hit, error in zip(group["date"], group["hit"], group["abs_error"]):
+                bisect.insort(recent, (date, float(hit), float(error)))
+            del recent[:-self.window]
+        self._seen.update(scored["id"])
+
+    def _ensure_seeded(self):
+        if not self._seeded:
+            self._fold(self._loader())
+            self._seeded = True
+
+    def add(self, rows):
+        """Fold newly resolved prediction rows into the aggregate."""
+        with self._lock:
+            if self._seeded:
+                self._fold(rows)
+
+    def reset(self):
+        with self._lock:
+            self._seeded = False
+            self._seen.clear()
+            self._stats.clear()
+
+    def summary(self, symbol: str = None) -> list:
+        current = self._version() if self._version is not None else None
+        with self._lock:
+            if self._seeded and current is not None and current != len(self._seen):
+                self._seeded = False
+                self._seen.clear()
+                self._stats.clear()
+            self._ensure_seeded()
+            out = []
+            for (row_symbol, model), stats in sorted(self._stats.items()):
+                if symbol is not None and row_symbol != symbol:
+                    continue
+                recent = stats["recent"]
+                out.append(
+                    {
+                        "symbol": row_symbol,
+                        "model_type": model,
+                        "count": stats["count"],
+                        "mae": stats["abs_error"] / stats["count"],
+                        "hit_rate": stats["hits"] / stats["scored"] if stats["scored"] else None,
+                        "rolling_mae": sum(e for _, _, e in recent) / len(recent),
+                        "rolling_hit_rate": _rate(h for _, h, _ in recent),
+                        "rolling_window": len(recent),
+                    }
+                )
+            return out
@@ -0,0 +1,221 @@
+"""Walk-forward backtest of the models over a symbol's full price history.
+
+Features are computed once for the whole history.  The sample range is cut
+into windows of ``BACKTEST_CADENCE`` trading days; for each window a model
+is fitted (through the model module's ``fit_window``) on the samples whose
+10-day outcome was already known when the window starts, then every day of
+the window is predicted with one vectorised forward pass.  Independent
+windows train in parallel on the ``parallel_training`` pool; warm-start
+models (``WARM_START = True``) run in order so each window fine-tunes the
+last.  Results are written in the ``prediction_histories`` row shape.
+"""
+
+import importlib
+import os
+import sys
+import time
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import db
+from accuracy_summary import direction_hits
+from feature_engine import HORIZON, compute_features
+from model_registry import MODEL_MODULES
+from parallel_training import TRAINING_WORKERS, attach_shared, run_shared
+from stock_cache import fetch_stock_prices
+from symbols import DEFAULT_SYMBOL, normalize_symbol
+
+TABLE_NAME = os.getenv("BACKTEST_TABLE", "prediction_backtests")
+# Trading days between retrains.
+CADENCE = int(os.getenv("BACKTEST_CADENCE", "63"))
+# Samples required before the first window is predicted.
+MIN_TRAIN_SAMPLES = int(os.getenv("BACKTEST_MIN_TRAIN_SAMPLES", "500"))
+# Train on at most this many recent samples (0 keeps an expanding window).
+# Warm-start models always use an expanding window.
+MAX_TRAIN_SAMPLES = int(os.getenv("BACKTEST_MAX_TRAIN_SAMPLES", "0"))
+WRITE_BATCH_SIZE = int(os.getenv("BACKTEST_WRITE_BATCH_SIZE", "1000"))
+
+
+def plan_windows(positions, cadence=CADENCE, min_train=MIN_TRAIN_SAMPLES, max_train=MAX_TRAIN_SAMPLES):
+    """Split the samples into ``(train, test)`` slice pairs.
+
+    ``positions`` are the price-row positions of the samples.  A sample's
+    target is only known ``HORIZON`` rows later, so a window starting at
+    row ``p`` trains on samples at rows ``<= p - HORIZON``.
+    """
+    positions = np.asarray(positions)
+    # Number of samples with a known outcome at each sample's row.
+    known = np.searchsorted(positions + HORIZON, positions, side="right")
+    plan = []
+    for start in range(int(np.searchsorted(known, min_train)), len(positions), cadence):
+        train_end = int(known[start])
+        train_start = max(0, train_end - max_train) if max_train else 0
+        stop = min(start + cadence, len(positions))
+        plan.append((slice(train_start, train_end), slice(start, stop)))
+    return plan
+
+
+def _predict_window(module_name, X, y, train, test, previous=None):
+    module = importlib.import_module(module_name)
+    fitted = module.fit_window(X[train], y[train], previous)
+    preds = fitted["net"].predict(fitted["scaler"].transform(X[test]))
+    return preds.ravel(), fitted
+
+
+def _predict_window_shared(module_name, handles, window):
+    train, test = window
+    with attach_shared(handles) as arrays:
+        return _predict_window(module_name, arrays["X"], arrays["y"], train, test)[0]
+
+
+def walk_forward(module_name: str, X, y, plan, workers: int = TRAINING_WORKERS):
+    """Out-of-sample predictions for every test slice of ``plan``, in order."""
+    if getattr(importlib.import_module(module_name), "WARM_START", False):
+        previous, preds = None, []
+        for train, test in plan:
+            # The fine-tune split assumes the window only grows.
+            window, previous = _predict_window(
+                module_name, X, y, slice(0, train.stop), test, previous
+            )
+            preds.append(window)
+        return np.concatenate(preds) if preds else np.empty(0)
+
+    if workers <= 1 or len(plan) <= 1:
+        preds = [_predict_window(module_name, X, y, train, test)[0] for train, test in plan]
+        return np.concatenate(preds) if preds else np.empty(0)
+
+    preds = run_shared(partial(_predict_window_shared, module_name), {"X": X, "y": y}, plan, workers)
+    return np.concatenate(preds)
+
+
+def prediction_rows(df: pd.DataFrame, positions, preds, model_type: str, symbol: str) -> pd.DataFrame:
+    """Backtest predictions as resolved ``prediction_histories`` rows.
+
+    ``base_price`` is the close each prediction was made on, as for live
+    predictions.
+    """
+    dates = df["timestamp"].astype(str).str[:10].to_numpy()
+    close = df["close"].to_numpy(dtype=float)
+    positions = np.asarray(positions)
+    later = positions + HORIZON
+    predicted_price = np.round(close[positions] * (1 + preds), 2)
+    actual = close[later]
+    return pd.DataFrame(
+        {
+            "date_of_prediction": dates[positions],
+            "symbol": symbol,
+            "model_type": model_type,
+            "prediction": preds.astype(float),
+            "predicted_price": predicted_price,
+            "10_days_later_date": dates[later],
+            "actual_price": actual,
+            "difference": actual - predicted_price,
+            "base_price": close[positions],
+        }
+    )
+
+
+def summarize(rows: pd.DataFrame) -> dict:
+    """MAE of the predicted price and directional hit rate per model."""
+    if rows.empty:
+        return {}
+    scored = rows.assign(
+        abs_error=rows["difference"].abs(),
+        hit=direction_hits(rows["prediction"], rows["actual_price"], rows["base_price"]),
+    )
+    grouped = scored.groupby("model_type")
+    return {
+        model: {
+            "count": int(len(group)),
+            "mae": float(group["abs_error"].mean()),
+            "hit_rate": float(group["hit"].mean()),
+        }
+        for model, group in grouped
+    }
+
+
+def run_backtest(
+    df: pd.DataFrame,
+    models=None,
+    symbol: str = DEFAULT_SYMBOL,
+    workers: int = TRAINING_WORKERS,
+    **plan_options,
+):
+    """Backtest ``models`` (default: all) on ``df``.
+
+    Returns the prediction rows and a summary with per-model accuracy and
+    timings.  ``plan_options`` are passed to :func:`plan_windows`.
+    """
+    models = list(models or MODEL_MODULES)
+    unknown = [name for name in models if name not in MODEL_MODULES]
+    if unknown:
+        raise ValueError(f"Unknown models: {', '.join(unknown)}")
+    features, targets = compute_features(df)
+    positions = df.index.get_indexer(features.index)
+    X = features.to_numpy(dtype=float)
+    y = targets.to_numpy(dtype=float)
+    plan = plan_windows(positions, **plan_options)
+    if not plan:
+        raise ValueError("Not enough price history to backtest.")
+    tested = np.arange(plan[0][1].start, len(positions))
+
+    frames, seconds = [], {}
+    for name in models:
+        started = time.perf_counter()
+        preds = walk_forward(MODEL_MODULES[name], X, y, plan, workers)
+        seconds[name] = time.perf_counter() - started
+        frames.append(prediction_rows(df, positions[tested], preds, name, symbol))
+
+    rows = pd.concat(frames, ignore_index=True)
+    summary = {
+        "windows": len(plan),
+        "models": {
+            name: {**stats, "seconds": seconds[name]}
+            for name, stats in summarize(rows).items()
+        },
+    }
+    return rows, summary
+
+
+def write_rows(rows: pd.DataFrame, symbol: str, table: str = TABLE_NAME) -> int:
+    """Replace the symbol's backtest rows for these models with ``rows``."""
+    client = db.get_client()
+    models = sorted(rows["model_type"].unique())
+    db.execute(
+        client.table(table).delete().eq("symbol", symbol).in_("model_type", models),
+        "prediction_backtests.delete",
+    )
+    records = rows.to_dict(orient="records")
+    for start in range(0, len(records), WRITE_BATCH_SIZE):
+        db.execute(
+            client.table(table).insert(records[start:start + WRITE_BATCH_SIZE]),
+            "prediction_backtests.insert",
+            retry=False,
+        )
+    return len(records)
+
+
+def backtest(symbol: str = DEFAULT_SYMBOL, models=None, write: bool = True) -> dict:
+    """Load ``symbol``'s full history, backtest it and store the rows."""
+    df = fetch_stock_prices(db.get_client(), symbol)
+    if df.empty:
+        raise ValueError(f"No prices stored for {symbol}.")
+    rows, summary = run_backtest(df, models, symbol)
+    if write:
+        summary["written"] = write_rows(rows, symbol)
+    return summary
+
+
+if __name__ == "__main__":
+    # Usage: python backtest.py [SYMBOL] [MODEL,MODEL,...]
+    symbol = normalize_symbol(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SYMBOL
+    models = sys.argv[2].split(",") if len(sys.argv) > 2 else None
+    result = backtest(symbol, models)
+    print(f"{symbol}: {result['windows']} windows, {result.get('written', 0)} rows written")
+    for name, stats in result["models"].items():
+        print(
+            f"  {name}: {stats['count']} predictions, MAE {stats['mae']:.2f}, "
+            f"hit rate {stats['hit_rate']:.1%}, {stats['seconds']:.1f}s"
+        )
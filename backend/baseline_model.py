@@ -6,124 +6,106 @@ from sklearn.metrics import (
     mean_absolute_error,
     mean_squared_error,
 )
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense
-import matplotlib.pyplot as plt
-import io
-import base64
-
-# Minimum number of rows required to compute all features. ``rsi200`` needs a
-# 200 day window and the model uses a 10-day look-back and 10-day forecast.
-MIN_REQUIRED_ROWS = 210
-
+from dense_inference import DenseNet
+from feature_engine import MIN_REQUIRED_ROWS, compute_features
+from tracing import stage
+
+# Training settings; part of the prediction cache key.
+MODEL_CONFIG = {
+    "units1": 100,
+    "units2": 20,
+    "epochs": 25,
+    "train_fraction": 0.85,
+    "importance_repeats": 3,
+    "importance_seed": 0,
+}
+
+def permutation_importance(model, X, y, baseline: float, repeats: int = 1, seed=None):
+    """Return the mean drop in R² when each feature column is shuffled.
+
+    Every permuted copy of ``X`` (``repeats`` per feature) is stacked into a
+    single batch so the model is evaluated with one predict call.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows, n_features = X.shape
+    y = np.asarray(y, dtype=float)
+
+    batch = np.broadcast_to(X, (repeats, n_features, n_rows, n_features)).copy()
+    perms = rng.permuted(
+        np.broadcast_to(np.arange(n_rows), (repeats, n_features, n_rows)), axis=-1
+    )
+    for j in range(n_features):
+        batch[:, j, :, j] = X[perms[:, j], j]
 
-def compute_features(df: pd.DataFrame):
-    """Return feature matrix and targets for training."""
-    df = df.copy()
+    flat = batch.reshape(-1, n_features)
+    preds = model.predict(flat, batch_size=len(flat), verbose=0).reshape(
+        repeats, n_features, n_rows
+    )
 
-    if len(df) < MIN_REQUIRED_ROWS:
-        raise ValueError(
-            f"Not enough data to compute features — at least {MIN_REQUIRED_ROWS} rows required."
-        )
+    ss_res = ((y - preds) ** 2).sum(axis=-1)
+    ss_tot = ((y - y.mean()) ** 2).sum()
+    scores = 1 - ss_res / ss_tot
+    return baseline - scores.mean(axis=0)
 
-    df["10d_future_close"] = df["close"].shift(-10)
-    df["10d_future_close_pct"] = (df["10d_future_close"] - df["close"]) / df[
-        "close"
-    ]
-    df["10d_close_pct"] = df["close"].pct_change(10)
-
-    df["ma14"] = df["close"].rolling(14).mean()
-    df["rsi14"] = (
-        df["close"].diff().clip(lower=0).rolling(14).mean()
-        / df["close"].abs().rolling(14).mean()
-    ) * 100
-
-    df["ma30"] = df["close"].rolling(30).mean()
-    df["rsi30"] = (
-        df["close"].diff().clip(lower=0).rolling(30).mean()
-        / df["close"].abs().rolling(30).mean()
-    ) * 100
-
-    df["ma50"] = df["close"].rolling(50).mean()
-    df["rsi50"] = (
-        df["close"].diff().clip(lower=0).rolling(50).mean()
-        / df["close"].abs().rolling(50).mean()
-    ) * 100
-
-    df["ma200"] = df["close"].rolling(200).mean()
-    df["rsi200"] = (
-        df["close"].diff().clip(lower=0).rolling(200).mean()
-        / df["close"].abs().rolling(200).mean()
-    ) * 100
-
-    df = df.dropna()
-    if df.empty:
-        raise ValueError(
-            f"Not enough data to compute features — at least {MIN_REQUIRED_ROWS} rows required."
-        )
+def _build_model(input_dim: int):
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Dense
 
-    features = df[
+    # Basic feed-forward neural network with two hidden layers.  This is a
+    # lightweight model intended for demonstration purposes.
+    model = Sequential(
         [
-            "10d_close_pct",
-            "ma14",
-            "rsi14",
-            "ma30",
-            "rsi30",
-            "ma50",
-            "rsi50",
-            "ma200",
-            "rsi200",
+            Dense(MODEL_CONFIG["units1"], input_dim=input_dim, activation='relu'),
+            Dense(MODEL_CONFIG["units2"], activation='relu'),
+            Dense(1, activation='linear'),
         ]
-    ]
-    targets = df["10d_future_close_pct"]
+    )
+    model.compile(optimizer='adam', loss='mse')
+    return model
 
-    return features, targets
+def fit_window(features, targets, previous=None):
+    """Fit scaler and network on one backtest training window."""
+    scaler = StandardScaler()
+    scaled = scaler.fit_transform(features)
+    model = _build_model(scaled.shape[1])
+    model.fit(scaled, targets, epochs=MODEL_CONFIG["epochs"], verbose=0)
+    return {"scaler": scaler, "net": DenseNet.from_keras(model)}
+
+def _pairs(predicted, actual) -> dict:
+    return {
+        "predicted": np.asarray(predicted, dtype=float).ravel().tolist(),
+        "actual": np.asarray(actual, dtype=float).ravel().tolist(),
+    }
 
 def train_and_predict(df: pd.DataFrame):
     """Train model on historical prices and predict future percentage change."""
-
-    features, targets = compute_features(df)
+    with stage("compute_features"):
+        features, targets = compute_features(df)
 
     scaler = StandardScaler()
     scaled_features = scaler.fit_transform(features)
 
     # Simple chronological train/test split.  Recent data is reserved for
     # evaluating model performance.
-    train_size = int(0.85 * len(features))
+    train_size = int(MODEL_CONFIG["train_fraction"] * len(features))
     X_train, X_test = scaled_features[:train_size], scaled_features[train_size:]
     y_train, y_test = targets[:train_size], targets[train_size:]
 
-    # Basic feed-forward neural network with two hidden layers.  This is a
-    # lightweight model intended for demonstration purposes.
-    model = Sequential(
-        [
-            Dense(100, input_dim=X_train.shape[1], activation='relu'),
-            Dense(20, activation='relu'),
-            Dense(1, activation='linear'),
-        ]
-    )
-    model.compile(optimizer='adam', loss='mse')
-    model.fit(X_train, y_train, epochs=25, verbose=0)
-
-    preds_train = model.predict(X_train)
-    preds_test = model.predict(X_test)
-
-    # Prediction for the most recent row of data
-    latest_input = scaled_features[-1].reshape(1, -1)
-    latest_prediction = model.predict(latest_input)[0][0]
-
-    # Visualise how well predictions line up with actual values
-    plt.figure()
-    plt.scatter(preds_train, y_train, label='train')
-    plt.scatter(preds_test, y_test, label='test')
-    plt.xlabel("Predicted stock price % change (10 days ahead)")
-    plt.ylabel("Actual stock price % change (10 days ahead)")
-    plt.legend()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close()
+    with stage("fit"):
+        # TensorFlow is imported here, on first use, so importing this module
+        # stays cheap.
+        model = _build_model(X_train.shape[1])
+        model.fit(X_train, y_train, epochs=MODEL_CONFIG["epochs"], verbose=0)
+
+    # Inference runs on the extracted weights rather than through Keras.
+    with stage("predict"):
+        net = DenseNet.from_keras(model)
+        preds_train = net.predict(X_train)
+        preds_test = net.predict(X_test)
+
+        # Prediction for the most recent row of data
+        latest_input = scaled_features[-1].reshape(1, -1)
+        latest_prediction = net.predict(latest_input)[0][0]
 
     # === Model evaluation metrics ===
     r2 = r2_score(y_test, preds_test)
@@ -134,31 +116,33 @@ def train_and_predict(df: pd.DataFrame):
         rmse = np.sqrt(mean_squared_error(y_test, preds_test))
 
     # === Feature importance via permutation ===
-    baseline = r2
-    importances = []
-    for i in range(X_test.shape[1]):
-        X_perm = X_test.copy()
-        np.random.shuffle(X_perm[:, i])
-        perm_preds = model.predict(X_perm)
-        score = r2_score(y_test, perm_preds)
-        importances.append(baseline - score)
-
-    plt.figure()
-    plt.bar(range(len(importances)), importances)
-    plt.xticks(range(len(importances)), features.columns, rotation=45, ha='right')
-    plt.ylabel('Importance (ΔR²)')
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    importance_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close()
+    with stage("importance"):
+        importances = permutation_importance(
+            net,
+            X_test,
+            y_test,
+            baseline=r2,
+            repeats=MODEL_CONFIG["importance_repeats"],
+            seed=MODEL_CONFIG["importance_seed"],
+        )
+
+    # Raw data behind the diagnostic plots; ``plots.render_plot`` draws them
+    # on demand so training never pays for rendering.
+    diagnostics = {
+        "predicted_vs_actual": {
+            "train": _pairs(preds_train, y_train),
+            "test": _pairs(preds_test, y_test),
+        },
+        "importances": {
+            "features": list(features.columns),
+            "values": np.asarray(importances).tolist(),
+        },
+    }
 
     return {
         "prediction": float(latest_prediction),
-        "plot_base64": img_base64,
         "r2": float(r2),
         "mae": float(mae),
         "rmse": float(rmse),
-        "importance_plot_base64": importance_base64,
+        "diagnostics": diagnostics,
     }
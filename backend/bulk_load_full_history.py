@@ -1,70 +1,179 @@
 import os
+import sys
+import csv
+import json
 import requests
 from datetime import datetime
-from supabase import create_client, Client
-from dotenv import load_dotenv
+from itertools import islice
 import time
 
-# === Load secrets ===
-load_dotenv()
+import db
+from stock_cache import existing_timestamps
+from symbols import DEFAULT_SYMBOL, normalize_symbol
 
 ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
 TABLE_NAME = "stock_prices"
-SYMBOL = "AAPL"
+SYMBOL = DEFAULT_SYMBOL
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Rows per insert.
+CHUNK_SIZE = int(os.getenv("BULK_LOAD_CHUNK_SIZE", "1000"))
+CHECKPOINT_PATH = os.getenv("BULK_LOAD_CHECKPOINT", ".bulk_load_checkpoint.json")
+MAX_RETRIES = 6
+MIN_DELAY = 0.0
+MAX_DELAY = 30.0
 
 def get_full_history(symbol: str):
+    """Yield the daily history of ``symbol``, newest first, as it downloads.
+
+    The CSV response is parsed line by line, so the first chunk can be
+    uploaded before the whole history has arrived.
+    """
     url = "https://www.alphavantage.co/query"
     params = {
         "function": "TIME_SERIES_DAILY",
         "symbol": symbol,
         "outputsize": "full",  # 👈 key difference here
+        "datatype": "csv",
         "apikey": ALPHA_VANTAGE_API_KEY
     }
 
     print(f"Fetching full history for {symbol}...")
-    r = requests.get(url, params=params)
-    data = r.json()
+    with requests.get(url, params=params, stream=True) as r:
+        lines = r.iter_lines(decode_unicode=True)
+        header = next(lines, "")
+        if not header.startswith("timestamp"):
+            # Errors and rate-limit notes come back as JSON instead of CSV.
+            raise ValueError(f"Failed to fetch stock data: {header}{''.join(lines)}")
+        for row in csv.DictReader(lines, fieldnames=header.split(",")):
+            yield {
+                "symbol": symbol,
+                "timestamp": row["timestamp"],
+                "open": float(row["open"]),
+                "high": float(row["high"]),
+                "low": float(row["low"]),
+                "close": float(row["close"]),
+                "volume": float(row["volume"])
+            }
+
+def iter_chunks(records, chunk_size: int):
+    records = iter(records)
+    while chunk := list(islice(records, chunk_size)):
+        yield chunk
+
+def load_checkpoint(path: str, symbol: str):
+    """Return the oldest timestamp uploaded for ``symbol`` or ``None``.
+
+    The history arrives newest first, so every row at or after the
+    checkpoint is stored.
+    """
+    try:
+        with open(path) as fh:
+            checkpoint = json.load(fh)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if checkpoint.get("symbol") != symbol:
+        return None
+    return checkpoint.get("oldest_timestamp")
+
+def save_checkpoint(path: str, symbol: str, oldest_timestamp: str):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(
+            {
+                "symbol": symbol,
+                "oldest_timestamp": oldest_timestamp,
+                "updated_at": datetime.utcnow().isoformat(),
+            },
+            fh,
+        )
+    os.replace(tmp, path)
+
+class Backoff:
+    """Delay between requests that grows on failure and decays on success."""
+
+    def __init__(self, minimum: float = MIN_DELAY, maximum: float = MAX_DELAY):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.delay = minimum
+
+    def success(self):
+        self.delay = max(self.minimum, self.delay / 2)
 
-    if "Time Series (Daily)" not in data:
-        print("❌ Failed to fetch stock data:", data)
-        return []
+    def failure(self):
+        self.delay = min(self.maximum, max(self.delay * 2, 0.5))
 
-    records = []
-    for date_str, values in data["Time Series (Daily)"].items():
-        records.append({
-            "timestamp": date_str,
-            "open": float(values["1. open"]),
-            "high": float(values["2. high"]),
-            "low": float(values["3. low"]),
-            "close": float(values["4. close"]),
-            "volume": float(values["5. volume"])
-        })
+    def wait(self):
+        if self.delay:
+            time.sleep(self.delay)
 
-    print(f"✅ Retrieved {len(records)} total rows.")
-    return records
+def _with_retries(backoff: Backoff, action):
+    for attempt in range(1, MAX_RETRIES + 1):
+        backoff.wait()
+        try:
+            result = action()
+        except Exception as e:
+            if attempt == MAX_RETRIES:
+                raise
+            backoff.failure()
+            print(f"   ⚠️ {e} — retrying in {backoff.delay:.1f}s")
+            continue
+        backoff.success()
+        return result
 
-def upload_deduplicated(records):
-    print("Checking existing timestamps...")
-    existing_res = supabase.table(TABLE_NAME).select("timestamp").execute()
-    existing_dates = set(row["timestamp"] for row in existing_res.data)
+def _upload_new(chunk) -> int:
+    """Insert the rows of ``chunk`` not stored yet; returns how many.
 
-    to_upload = [r for r in records if r["timestamp"] not in existing_dates]
+    Re-checked on every attempt: a failed insert may still have been
+    committed, and sending it again would duplicate the rows.
+    """
+    timestamps = [r["timestamp"] for r in chunk]
+    existing = existing_timestamps(
+        db.get_client(), chunk[0]["symbol"], min(timestamps), max(timestamps)
+    )
+    to_upload = [r for r in chunk if r["timestamp"] not in existing]
+    if to_upload:
+        db.execute(
+            db.get_client().table(TABLE_NAME).insert(to_upload),
+            "stock_prices.insert",
+            retry=False,
+        )
+    return len(to_upload)
 
-    print(f"📦 Uploading {len(to_upload)} new rows...")
+def upload_deduplicated(
+    records,
+    symbol: str = SYMBOL,
+    chunk_size: int = CHUNK_SIZE,
+    checkpoint_path: str = CHECKPOINT_PATH,
+):
+    """Upload ``records`` (newest first, any iterable) in deduplicated chunks."""
+    resume_before = load_checkpoint(checkpoint_path, symbol)
+    if resume_before:
+        records = (r for r in records if r["timestamp"] < resume_before)
+        print(f"↩️ Resuming before {resume_before}.")
 
-    for row in to_upload:
-        supabase.table(TABLE_NAME).insert(row).execute()
-        print(f"   + {row['timestamp']}")
-        time.sleep(0.1)  # Small delay to avoid rate limits
+    backoff = Backoff()
+    uploaded = 0
+    started = time.perf_counter()
+    for i, chunk in enumerate(iter_chunks(records, chunk_size), start=1):
+        added = _with_retries(backoff, lambda: _upload_new(chunk))
+        uploaded += added
+        save_checkpoint(checkpoint_path, symbol, chunk[-1]["timestamp"])
+        print(
+            f"📦 Chunk {i}: {added} new of {len(chunk)} "
+            f"({chunk[-1]['timestamp']} to {chunk[0]['timestamp']})"
+        )
 
-    print("✅ Upload complete.")
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    print(f"✅ Upload complete: {uploaded} rows in {time.perf_counter() - started:.1f}s.")
+    return uploaded
 
 if __name__ == "__main__":
-    data = get_full_history(SYMBOL)
-    if data:
-        upload_deduplicated(data)
+    # Usage: python bulk_load_full_history.py [SYMBOL]
+    symbol = normalize_symbol(sys.argv[1]) if len(sys.argv) > 1 else SYMBOL
+    try:
+        upload_deduplicated(get_full_history(symbol), symbol=symbol)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -1,56 +1,75 @@
 import numpy as np
 import pandas as pd
-from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
 from sklearn.model_selection import TimeSeriesSplit
 from sklearn.preprocessing import StandardScaler
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense
 
 from baseline_model import compute_features
+from dense_inference import DenseNet
+from parallel_training import train_many
+from tracing import stage
+
+# Each fold is its own task on the prediction pool (see jobs.TrainingPool), so
+# train_and_predict itself runs in the calling thread.
+FAN_OUT = True
+
+# Fewer splits and epochs keep training time reasonable for the demo
+MODEL_CONFIG = {"n_splits": 3, "units1": 100, "units2": 20, "epochs": 15}
+
+
+def _build_model(input_dim: int, units1: int, units2: int):
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Dense
+
+    model = Sequential([
+        Dense(units1, input_dim=input_dim, activation="relu"),
+        Dense(units2, activation="relu"),
+        Dense(1, activation="linear"),
+    ])
+    model.compile(optimizer="adam", loss="mse")
+    return model
+
+
+def fit_window(features, targets, previous=None):
+    """Fit the final full-data model on one backtest training window."""
+    scaler = StandardScaler()
+    scaled = scaler.fit_transform(features)
+    model = _build_model(scaled.shape[1], MODEL_CONFIG["units1"], MODEL_CONFIG["units2"])
+    model.fit(scaled, targets, epochs=MODEL_CONFIG["epochs"], verbose=0)
+    return {"scaler": scaler, "net": DenseNet.from_keras(model)}
 
 
 def train_and_predict(df: pd.DataFrame):
     """Train using cross validation and return average metrics."""
-    features, targets = compute_features(df)
+    with stage("compute_features"):
+        features, targets = compute_features(df)
 
     scaler = StandardScaler()
     scaled = scaler.fit_transform(features)
 
-    # Fewer splits and epochs keep training time reasonable for the demo
-    tss = TimeSeriesSplit(n_splits=3)
-    r2_scores = []
-    mae_scores = []
-    rmse_scores = []
-    for train_idx, test_idx in tss.split(scaled):
-        X_train, X_test = scaled[train_idx], scaled[test_idx]
-        y_train, y_test = targets.iloc[train_idx], targets.iloc[test_idx]
-
-        model = Sequential([
-            Dense(100, input_dim=X_train.shape[1], activation="relu"),
-            Dense(20, activation="relu"),
-            Dense(1, activation="linear"),
-        ])
-        model.compile(optimizer="adam", loss="mse")
-        model.fit(X_train, y_train, epochs=15, verbose=0)
-
-        preds = model.predict(X_test)
-        r2_scores.append(r2_score(y_test, preds))
-        mae_scores.append(mean_absolute_error(y_test, preds))
-        rmse_scores.append(np.sqrt(mean_squared_error(y_test, preds)))
-
-    # Train on full data for final prediction
-    final_model = Sequential([
-        Dense(100, input_dim=scaled.shape[1], activation="relu"),
-        Dense(20, activation="relu"),
-        Dense(1, activation="linear"),
-    ])
-    final_model.compile(optimizer="adam", loss="mse")
-    final_model.fit(scaled, targets, epochs=15, verbose=0)
-    latest_pred = final_model.predict(scaled[-1].reshape(1, -1))[0][0]
+    params = {
+        "units1": MODEL_CONFIG["units1"],
+        "units2": MODEL_CONFIG["units2"],
+        "epochs": MODEL_CONFIG["epochs"],
+    }
+    # Folds are contiguous in time, so they travel to workers as slices.
+    tss = TimeSeriesSplit(n_splits=MODEL_CONFIG["n_splits"])
+    tasks = [
+        {
+            "train": slice(train_idx[0], train_idx[-1] + 1),
+            "test": slice(test_idx[0], test_idx[-1] + 1),
+            **params,
+        }
+        for train_idx, test_idx in tss.split(scaled)
+    ]
+    # Train on full data for final prediction, alongside the folds
+    tasks.append({"train": slice(None), **params})
+
+    with stage("fit"):
+        *folds, final = train_many(_build_model, scaled, targets, tasks)
 
     return {
-        "prediction": float(latest_pred),
-        "r2": float(np.mean(r2_scores)),
-        "mae": float(np.mean(mae_scores)),
-        "rmse": float(np.mean(rmse_scores)),
+        "prediction": final["latest"],
+        "r2": float(np.mean([f["r2"] for f in folds])),
+        "mae": float(np.mean([f["mae"] for f in folds])),
+        "rmse": float(np.mean([f["rmse"] for f in folds])),
     }
@@ -0,0 +1,169 @@
+"""Shared Supabase data access.
+
+Every module goes through one client per process (sync and async), so
+HTTP connections are pooled and kept alive instead of each module opening
+its own.  Queries run through :func:`execute` / :func:`aexecute` (other
+requests through :func:`call`), which retry transient network failures
+with exponential backoff and record per-query latency in
+:data:`QUERY_METRICS`.  Inserts pass ``retry=False``: a timeout may come
+after the server committed the rows, and resending would duplicate them.
+"""
+
+import asyncio
+import os
+import time
+from threading import Lock
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+MAX_RETRIES = int(os.getenv("SUPABASE_MAX_RETRIES", "3"))
+RETRY_BASE_DELAY = float(os.getenv("SUPABASE_RETRY_DELAY", "0.2"))
+QUERY_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "30"))
+
+# Network-level failures are safe to retry; API errors (bad filters,
+# constraint violations) are not.
+RETRYABLE = (httpx.TransportError,)
+
+# PostgreSQL error code PostgREST reports for a unique constraint violation.
+UNIQUE_VIOLATION = "23505"
+
+_client = None
+_async_client = None
+_client_lock = Lock()
+_async_lock = None
+
+
+def _credentials():
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise RuntimeError("Supabase credentials are missing.")
+    return SUPABASE_URL, SUPABASE_KEY
+
+
+def get_client():
+    """The process-wide synchronous client, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from supabase import ClientOptions, create_client
+
+                _client = create_client(
+                    *_credentials(),
+                    options=ClientOptions(postgrest_client_timeout=QUERY_TIMEOUT),
+                )
+    return _client
+
+
+async def get_async_client():
+    """The process-wide asynchronous client, created on first use."""
+    global _async_client, _async_lock
+    if _async_client is None:
+        if _async_lock is None:
+            _async_lock = asyncio.Lock()
+        async with _async_lock:
+            if _async_client is None:
+                from supabase import AsyncClientOptions, acreate_client
+
+                _async_client = await acreate_client(
+                    *_credentials(),
+                    options=AsyncClientOptions(postgrest_client_timeout=QUERY_TIMEOUT),
+                )
+    return _async_client
+
+
+class QueryMetrics:
+    """Latency, error and retry counts per named query."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._stats = {}
+
+    def record(self, name: str, seconds: float, ok: bool, retries: int):
+        with self._lock:
+            stats = self._stats.setdefault(
+                name,
+                {"count": 0, "errors": 0, "retries": 0, "total_seconds": 0.0, "max_seconds": 0.0},
+            )
+            stats["count"] += 1
+            stats["errors"] += 0 if ok else 1
+            stats["retries"] += retries
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {**stats, "mean_seconds": stats["total_seconds"] / stats["count"]}
+                for name, stats in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+QUERY_METRICS = QueryMetrics()
+
+
+def is_unique_violation(exc: Exception) -> bool:
+    """Whether ``exc`` is a PostgREST error for a duplicate key."""
+    return getattr(exc, "code", None) == UNIQUE_VIOLATION
+
+
+def _delay(attempt: int) -> float:
+    return RETRY_BASE_DELAY * 2 ** (attempt - 1)
+
+
+def call(func, name: str = "query", retry: bool = True):
+    """Run ``func()`` with retries, timing it under ``name``.
+
+    For requests that are not PostgREST queries, such as Storage uploads.
+    ``retry=False`` makes a single attempt, for requests that are not
+    idempotent.
+    """
+    started = time.perf_counter()
+    attempts = MAX_RETRIES if retry else 1
+    for attempt in range(1, attempts + 1):
+        try:
+            result = func()
+        except RETRYABLE:
+            if attempt == attempts:
+                QUERY_METRICS.record(name, time.perf_counter() - started, False, attempt - 1)
+                raise
+            time.sleep(_delay(attempt))
+        except Exception:
+            QUERY_METRICS.record(name, time.perf_counter() - started, False, attempt - 1)
+            raise
+        else:
+            QUERY_METRICS.record(name, time.perf_counter() - started, True, attempt - 1)
+            return result
+
+
+def execute(query, name: str = "query", retry: bool = True):
+    """Run ``query.execute()`` with retries, timing it under ``name``."""
+    return call(query.execute, name, retry)
+
+
+async def aexecute(query, name: str = "query", retry: bool = True):
+    """Async counterpart of :func:`execute` for async client queries."""
+    started = time.perf_counter()
+    attempts = MAX_RETRIES if retry else 1
+    for attempt in range(1, attempts + 1):
+        try:
+            result = await query.execute()
+        except RETRYABLE:
+            if attempt == attempts:
+                QUERY_METRICS.record(name, time.perf_counter() - started, False, attempt - 1)
+                raise
+            await asyncio.sleep(_delay(attempt))
+        except Exception:
+            QUERY_METRICS.record(name, time.perf_counter() - started, False, attempt - 1)
+            raise
+        else:
+            QUERY_METRICS.record(name, time.perf_counter() - started, True, attempt - 1)
+            return result
@@ -0,0 +1,51 @@
+"""Pure NumPy forward pass for the ``Sequential`` Dense models.
+
+Every model in this project is a stack of Dense layers, so once trained the
+weights can be lifted out of Keras and evaluated with a couple of matrix
+multiplications.  This avoids ``model.predict``'s dispatch overhead and lets
+persisted models be served without importing TensorFlow.
+"""
+
+import numpy as np
+
+_ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+    "tanh": np.tanh,
+}
+
+
+class DenseNet:
+    """Weights and activations of a Dense stack, evaluated with NumPy."""
+
+    def __init__(self, layers):
+        for _, _, activation in layers:
+            if activation not in _ACTIVATIONS:
+                raise ValueError(f"Unsupported activation: {activation}")
+        self.layers = [
+            (np.asarray(kernel, dtype=np.float32), np.asarray(bias, dtype=np.float32), activation)
+            for kernel, bias, activation in layers
+        ]
+
+    @classmethod
+    def from_keras(cls, model):
+        layers = []
+        for layer in model.layers:
+            kernel, bias = layer.get_weights()
+            activation = layer.get_config()["activation"]
+            layers.append((kernel, bias, activation))
+        return cls(layers)
+
+    @property
+    def input_dim(self) -> int:
+        return self.layers[0][0].shape[0]
+
+    def predict(self, X, batch_size=None, verbose=0):
+        """Return predictions shaped ``(n_rows, 1)`` like ``model.predict``."""
+        out = np.asarray(X, dtype=np.float32)
+        if out.ndim == 1:
+            out = out.reshape(1, -1)
+        for kernel, bias, activation in self.layers:
+            out = _ACTIVATIONS[activation](out @ kernel + bias)
+        return out
@@ -0,0 +1,271 @@
+"""Vectorised feature computation shared by every model.
+
+All rolling windows are derived from a single set of prefix sums over the
+close prices, so a full rebuild is one pass over a NumPy array.  The engine
+remembers the last dataset it saw (row count, last timestamp and close) and,
+when a new frame merely appends bars to it, only computes the new rows.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+from symbols import symbol_of
+
+WINDOWS = (14, 30, 50, 200)
+HORIZON = 10
+
+# ``rsi200`` needs a 200 day window and the model uses a 10-day look-back and
+# 10-day forecast.
+MIN_REQUIRED_ROWS = max(WINDOWS) + HORIZON
+
+FEATURE_COLUMNS = [f"{HORIZON}d_close_pct"] + [
+    name for w in WINDOWS for name in (f"ma{w}", f"rsi{w}")
+]
+TARGET_COLUMN = f"{HORIZON}d_future_close_pct"
+
+
+def _not_enough_data():
+    return ValueError(
+        f"Not enough data to compute features — at least {MIN_REQUIRED_ROWS} rows required."
+    )
+
+
+def dataset_key(df: pd.DataFrame):
+    """Cheap identity for a price frame: row count, last timestamp and close."""
+    if df.empty:
+        return (0, None, None)
+    last_ts = df["timestamp"].iloc[-1] if "timestamp" in df else None
+    return (len(df), last_ts, float(df["close"].iloc[-1]))
+
+
+def _window_means(cum: np.ndarray, nans: np.ndarray, idx: np.ndarray, window: int, first: int):
+    """Mean of the ``window`` values ending at each index in ``idx``.
+
+    ``cum`` is the prefix sum of the underlying series with missing values
+    counted as 0, ``nans`` the prefix count of those missing values and
+    ``first`` the index of its first defined value.  Windows before ``first``
+    or containing a missing value are NaN, matching pandas.
+    """
+    out = np.full(idx.shape, np.nan)
+    ok = idx >= first + window - 1
+    i = idx[ok]
+    means = (cum[i + 1] - cum[i + 1 - window]) / window
+    means[nans[i + 1] - nans[i + 1 - window] > 0] = np.nan
+    out[ok] = means
+    return out
+
+
+def _prefix_sum(values: np.ndarray, start: float = 0.0):
+    out = np.empty(len(values) + 1)
+    out[0] = start
+    np.cumsum(values, out=out[1:])
+    if start:
+        out[1:] += start
+    return out
+
+
+def _prefix_sums(values: np.ndarray, sums=(0.0, 0.0)):
+    """Prefix sums of ``values`` (NaN as 0) and of its NaN count.
+
+    ``sums`` are the totals the new prefixes continue from.
+    """
+    missing = np.isnan(values)
+    return (
+        _prefix_sum(np.where(missing, 0.0, values), sums[0]),
+        _prefix_sum(missing, sums[1]),
+    )
+
+
+class _Buffer:
+    """Append-only array with spare capacity, doubled when it runs out.
+
+    :meth:`view` returns a read-only view of the filled rows.  Appends only
+    write past the rows already handed out, so earlier views stay valid.
+    """
+
+    def __init__(self, values: np.ndarray):
+        self._data = np.empty((max(2 * len(values), 16), *values.shape[1:]), values.dtype)
+        self._data[:len(values)] = values
+        self.size = len(values)
+
+    def __getitem__(self, item):
+        return self.view()[item]
+
+    def append(self, values: np.ndarray):
+        end = self.size + len(values)
+        if end > len(self._data):
+            grown = np.empty((max(end, 2 * len(self._data)), *self._data.shape[1:]), self._data.dtype)
+            grown[:self.size] = self._data[:self.size]
+            self._data = grown
+        self._data[self.size:end] = values
+        self.size = end
+
+    def view(self) -> np.ndarray:
+        out = self._data[:self.size]
+        out.flags.writeable = False
+        return out
+
+
+class FeatureEngine:
+    """Compute (and incrementally extend) the model feature matrix.
+
+    The close prices, their prefix sums and the valid rows of the result
+    (features, targets and index labels) are kept in growable buffers.  Each
+    prefix sum has a prefix count of missing values next to it, so a gap in
+    the prices only voids the windows covering it.
+    Appending bars computes only the new rows plus the last ``HORIZON``
+    rows, which now gain a target, and the frames are rebuilt as views of
+    the buffers, so an append costs time proportional to the new rows.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._key = None
+        self._result = None
+
+    def compute(self, df: pd.DataFrame):
+        """Return ``(features, targets)`` for ``df``.
+
+        The returned objects are shared between callers and must be treated
+        as read-only.
+        """
+        if len(df) < MIN_REQUIRED_ROWS:
+            raise _not_enough_data()
+
+        key = dataset_key(df)
+        with self._lock:
+            if key != self._key:
+                if self._extends_cached(df):
+                    self._extend(df)
+                else:
+                    self._rebuild(df)
+                self._key = key
+                self._result = None
+            if self._result is None:
+                self._result = self._frames()
+            return self._result
+
+    # -- internal -----------------------------------------------------------
+
+    def _extends_cached(self, df: pd.DataFrame) -> bool:
+        if self._key is None:
+            return False
+        n, last_ts, last_close = self._key
+        if len(df) <= n:
+            return False
+        prev = df.iloc[n - 1]
+        if "timestamp" in df and prev["timestamp"] != last_ts:
+            return False
+        return float(prev["close"]) == last_close
+
+    def _rebuild(self, df: pd.DataFrame):
+        close = df["close"].to_numpy(dtype=float)
+        gains = np.zeros_like(close)
+        gains[1:] = np.clip(np.diff(close), 0, None)
+
+        self._close = _Buffer(close)
+        self._sums = {
+            name: tuple(_Buffer(p) for p in _prefix_sums(values))
+            for name, values in (("close", close), ("gain", gains), ("abs", np.abs(close)))
+        }
+
+        features, targets, labels = self._valid_rows(df, 0)
+        self._features = _Buffer(features)
+        self._targets = _Buffer(targets)
+        self._labels = _Buffer(labels)
+
+    def _extend(self, df: pd.DataFrame):
+        n = self._close.size
+        new_close = df["close"].to_numpy(dtype=float)[n:]
+        new_gains = np.clip(np.diff(new_close, prepend=self._close[n - 1]), 0, None)
+
+        self._close.append(new_close)
+        for name, values in (("close", new_close), ("gain", new_gains), ("abs", np.abs(new_close))):
+            cum, nans = self._sums[name]
+            new_cum, new_nans = _prefix_sums(values, (cum[-1], nans[-1]))
+            cum.append(new_cum[1:])
+            nans.append(new_nans[1:])
+
+        # Rows before ``n - HORIZON`` already had a target and are in the
+        # buffers; the last ``HORIZON`` known rows only now gain one.
+        features, targets, labels = self._valid_rows(df, max(n - HORIZON, 0))
+        self._features.append(features)
+        self._targets.append(targets)
+        self._labels.append(labels)
+
+    def _valid_rows(self, df: pd.DataFrame, start: int):
+        """Features, targets and index labels of the complete rows from ``start``."""
+        idx = np.arange(start, len(df))
+        features = self._feature_rows(idx)
+        targets = self._target_rows(idx)
+        mask = (
+            df.iloc[start:].notna().all(axis=1).to_numpy()
+            & ~np.isnan(features).any(axis=1)
+            & ~np.isnan(targets)
+        )
+        return features[mask], targets[mask], df.index[start:].to_numpy()[mask]
+
+    def _feature_rows(self, idx: np.ndarray) -> np.ndarray:
+        close = self._close.view()
+        out = np.empty((len(idx), len(FEATURE_COLUMNS)))
+
+        pct = np.full(idx.shape, np.nan)
+        ok = idx >= HORIZON
+        pct[ok] = close[idx[ok]] / close[idx[ok] - HORIZON] - 1
+        out[:, 0] = pct
+
+        close_sums, gain_sums, abs_sums = (
+            tuple(b.view() for b in self._sums[name]) for name in ("close", "gain", "abs")
+        )
+        for col, w in enumerate(WINDOWS):
+            out[:, 1 + 2 * col] = _window_means(*close_sums, idx, w, 0)
+            out[:, 2 + 2 * col] = (
+                _window_means(*gain_sums, idx, w, 1) / _window_means(*abs_sums, idx, w, 0)
+            ) * 100
+        return out
+
+    def _target_rows(self, idx: np.ndarray) -> np.ndarray:
+        close = self._close.view()
+        out = np.full(idx.shape, np.nan)
+        ok = idx + HORIZON < len(close)
+        i = idx[ok]
+        out[ok] = (close[i + HORIZON] - close[i]) / close[i]
+        return out
+
+    def _frames(self):
+        if not self._targets.size:
+            raise _not_enough_data()
+        index = pd.Index(self._labels.view(), copy=False)
+        features = pd.DataFrame(
+            self._features.view(), index=index, columns=FEATURE_COLUMNS, copy=False
+        )
+        targets = pd.Series(self._targets.view(), index=index, name=TARGET_COLUMN, copy=False)
+        return features, targets
+
+
+# One engine per symbol, shared by every model so a request computes its
+# features once.  Least recently used symbols are dropped past the limit.
+MAX_ENGINES = 64
+_engines = OrderedDict()
+_engines_lock = Lock()
+
+
+def compute_features(df: pd.DataFrame):
+    """Return feature matrix and targets for training.
+
+    Results are cached per symbol and dataset version and extended
+    incrementally when new bars are appended.  The returned objects must not
+    be modified.
+    """
+    symbol = symbol_of(df)
+    with _engines_lock:
+        engine = _engines.get(symbol)
+        if engine is None:
+            engine = _engines[symbol] = FeatureEngine()
+        _engines.move_to_end(symbol)
+        while len(_engines) > MAX_ENGINES:
+            _engines.popitem(last=False)
+    return engine.compute(df)
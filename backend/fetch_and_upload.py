@@ -1,68 +1,128 @@
 import os
+import time
 import yfinance as yf
+import pandas as pd
 from datetime import datetime
-from supabase import create_client
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
 
-load_dotenv()
+import db
+from stock_cache import existing_timestamps
+from symbols import DEFAULT_SYMBOL, WATCHLIST
 
-# Load Supabase credentials
-SUPABASE_URL = os.environ["SUPABASE_URL"]
-SUPABASE_KEY = os.environ["SUPABASE_KEY"]
 TABLE_NAME = "stock_prices"
-SYMBOL = "AAPL"
+SYMBOL = DEFAULT_SYMBOL
+BATCH_SIZE = int(os.getenv("UPLOAD_BATCH_SIZE", "500"))
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-def fetch_and_upload():
-    print(f"Fetching data for {SYMBOL} via yfinance...")
-    
-    # Fetch data for the last month to ensure we catch recent days
+def history_to_records(hist: pd.DataFrame, symbol: str = SYMBOL) -> list:
+    """Convert a yfinance history frame into ``stock_prices`` rows."""
+    hist = hist.dropna(how="all")
+    frame = pd.DataFrame(
+        {
+            "symbol": symbol,
+            "timestamp": hist.index.strftime("%Y-%m-%d"),
+            "open": hist["Open"].astype(float).to_numpy(),
+            "high": hist["High"].astype(float).to_numpy(),
+            "low": hist["Low"].astype(float).to_numpy(),
+            "close": hist["Close"].astype(float).to_numpy(),
+            "volume": hist["Volume"].astype(float).to_numpy(),
+        }
+    )
+    return frame.to_dict(orient="records")
+
+
+def download_histories(symbols: list, period: str = "1y") -> dict:
+    """Return ``{symbol: history frame}`` using one batched yfinance download."""
+    if len(symbols) == 1:
+        return {symbols[0]: yf.Ticker(symbols[0]).history(period=period)}
+    data = yf.download(
+        symbols,
+        period=period,
+        group_by="ticker",
+        threads=True,
+        auto_adjust=True,
+        progress=False,
+    )
+    return {s: data[s] for s in symbols if s in data.columns.get_level_values(0)}
+
+
+def new_records(records: list, log=print) -> list:
+    """Drop records of a single symbol whose timestamps are already stored."""
+    if not records:
+        return []
+    symbol = records[0]["symbol"]
+    timestamps = [r["timestamp"] for r in records]
+    existing = existing_timestamps(db.get_client(), symbol, min(timestamps), max(timestamps))
+    fresh = [r for r in records if r["timestamp"] not in existing]
+    log(f"   {symbol}: {len(existing)} already stored, {len(fresh)} new.")
+    return fresh
+
+
+def insert_batches(rows: list, log=print) -> list:
+    """Insert ``rows`` in chunks of ``BATCH_SIZE`` and return the stored rows."""
+    inserted = []
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        started = time.perf_counter()
+        resp = db.execute(
+            db.get_client().table(TABLE_NAME).insert(batch), "stock_prices.insert", retry=False
+        )
+        # PostgREST echoes the stored rows (with ids); fall back to the input.
+        inserted.extend(resp.data or batch)
+        log(
+            f"   Batch {start // BATCH_SIZE + 1}: inserted {len(batch)} rows "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+    return inserted
+
+
+def ingest(symbols: list = None, log=print) -> list:
+    """Upload new prices for ``symbols`` and return the inserted rows.
+
+    Progress is reported line by line through ``log``.
+    """
+    symbols = symbols or WATCHLIST
+    log(f"Fetching data for {', '.join(symbols)} via yfinance...")
+
+    # Fetch the last year to ensure we catch recent days
     # yfinance handles the "API" part automatically without a key
     try:
-        ticker = yf.Ticker(SYMBOL)
-        hist = ticker.history(period="1y") 
+        histories = download_histories(symbols)
     except Exception as e:
-        print(f"Error fetching data from Yahoo: {e}")
-        return 0
-    
-    if hist.empty:
-        print("No data fetched.")
-        return 0
-
-    records = []
-    # yfinance returns a DataFrame where the index is the Date
-    for date, row in hist.iterrows():
-        records.append({
-            "timestamp": date.strftime('%Y-%m-%d'),
-            "open": float(row["Open"]),
-            "high": float(row["High"]),
-            "low": float(row["Low"]),
-            "close": float(row["Close"]),
-            "volume": float(row["Volume"]),
-        })
-
-    print(f"Retrieved {len(records)} records. Uploading unique rows to Supabase...")
-    
-    inserted_count = 0
-    for row in records:
-        # Check if this timestamp already exists to avoid duplicates
-        exists = supabase.table(TABLE_NAME).select("id").eq("timestamp", row["timestamp"]).execute()
-        
-        if not exists.data:
-            supabase.table(TABLE_NAME).insert(row).execute()
-            inserted_count += 1
-            print(f"   Inserted: {row['timestamp']}")
-        else:
-            # Optional: Un-comment if you want to see skipped dates
-            # print(f"   Skipped duplicate: {row['timestamp']}")
-            pass
-    
-    print(f"Uploaded {inserted_count} new rows.")
-    
-    # We no longer need to track 'fetch_count' for rate limits, 
+        log(f"Error fetching data from Yahoo: {e}")
+        return []
+
+    records_by_symbol = {}
+    for symbol, hist in histories.items():
+        records = history_to_records(hist, symbol)
+        if records:
+            records_by_symbol[symbol] = records
+    if not records_by_symbol:
+        log("No data fetched.")
+        return []
+
+    total = sum(len(r) for r in records_by_symbol.values())
+    log(
+        f"Retrieved {total} records for {len(records_by_symbol)} symbol(s). "
+        "Uploading unique rows to Supabase..."
+    )
+
+    # Duplicate checks run concurrently per symbol; the writes are batched
+    # across symbols.
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        checked = pool.map(lambda records: new_records(records, log), records_by_symbol.values())
+        fresh = [r for rows in checked for r in rows]
+    inserted = insert_batches(fresh, log)
+
+    log(f"Uploaded {len(inserted)} new rows.")
+    return inserted
+
+
+def fetch_and_upload(symbols: list = None):
+    # We no longer need to track 'fetch_count' for rate limits,
     # but we can log that we finished successfully.
-    return inserted_count
+    return len(ingest(symbols))
 
 if __name__ == "__main__":
     fetch_and_upload()
@@ -1,21 +1,32 @@
 import numpy as np
 import pandas as pd
-from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
+from sklearn.metrics import r2_score
 from sklearn.preprocessing import StandardScaler
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense
 
 from baseline_model import compute_features
+from dense_inference import DenseNet
+from parallel_training import train_many
+from tracing import stage
 
 
+# Grid points fan out to the prediction pool one task each; only the scoring
+# and selection below run in the caller.
+FAN_OUT = True
+
 PARAM_GRID = [
     {"units1": 50, "units2": 20, "epochs": 15},
     {"units1": 100, "units2": 20, "epochs": 25},
     {"units1": 100, "units2": 40, "epochs": 25},
 ]
 
+# Training settings; part of the prediction cache key.
+MODEL_CONFIG = {"param_grid": PARAM_GRID, "train_fraction": 0.85}
+
 
 def _build_model(input_dim: int, units1: int, units2: int):
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Dense
+
     model = Sequential([
         Dense(units1, input_dim=input_dim, activation="relu"),
         Dense(units2, activation="relu"),
@@ -25,36 +36,46 @@ def _build_model(input_dim: int, units1: int, units2: int):
     return model
 
 
+def fit_window(features, targets, previous=None):
+    """Grid search on one backtest training window; returns the best network.
+
+    As in :func:`train_and_predict` each grid point trains on the first
+    ``train_fraction`` of the window and is scored on the rest.
+    """
+    scaler = StandardScaler()
+    scaled = scaler.fit_transform(features)
+    y = np.asarray(targets, dtype=float)
+    train_size = int(MODEL_CONFIG["train_fraction"] * len(scaled))
+    best = None
+    for params in PARAM_GRID:
+        model = _build_model(scaled.shape[1], params["units1"], params["units2"])
+        model.fit(scaled[:train_size], y[:train_size], epochs=params["epochs"], verbose=0)
+        net = DenseNet.from_keras(model)
+        score = r2_score(y[train_size:], net.predict(scaled[train_size:]))
+        if best is None or score > best[0]:
+            best = (score, net)
+    return {"scaler": scaler, "net": best[1]}
+
+
 def train_and_predict(df: pd.DataFrame):
     """Grid search over a small parameter grid and return best metrics."""
-    features, targets = compute_features(df)
+    with stage("compute_features"):
+        features, targets = compute_features(df)
     scaler = StandardScaler()
     scaled = scaler.fit_transform(features)
 
-    train_size = int(0.85 * len(scaled))
-    X_train, X_test = scaled[:train_size], scaled[train_size:]
-    y_train, y_test = targets[:train_size], targets[train_size:]
-
-    best_score = -np.inf
-    best_model = None
-    for params in PARAM_GRID:
-        model = _build_model(scaled.shape[1], params["units1"], params["units2"])
-        model.fit(X_train, y_train, epochs=params["epochs"], verbose=0)
-        preds = model.predict(X_test)
-        score = r2_score(y_test, preds)
-        if score > best_score:
-            best_score = score
-            best_model = model
-
-    preds_test = best_model.predict(X_test)
-    r2 = r2_score(y_test, preds_test)
-    mae = mean_absolute_error(y_test, preds_test)
-    rmse = np.sqrt(mean_squared_error(y_test, preds_test))
-    latest_pred = best_model.predict(scaled[-1].reshape(1, -1))[0][0]
+    train_size = int(MODEL_CONFIG["train_fraction"] * len(scaled))
+    tasks = [
+        {"train": slice(None, train_size), "test": slice(train_size, None), **params}
+        for params in PARAM_GRID
+    ]
+    with stage("fit"):
+        scores = train_many(_build_model, scaled, targets, tasks)
+    best = max(scores, key=lambda s: s["r2"])
 
     return {
-        "prediction": float(latest_pred),
-        "r2": float(r2),
-        "mae": float(mae),
-        "rmse": float(rmse),
+        "prediction": best["latest"],
+        "r2": best["r2"],
+        "mae": best["mae"],
+        "rmse": best["rmse"],
     }
@@ -0,0 +1,90 @@
+"""Coalesced in-process price ingestion with streamed progress."""
+
+import asyncio
+
+
+class IngestionRun:
+    """One ingestion in flight: its log so far plus the live subscribers."""
+
+    def __init__(self):
+        self.lines = []
+        self.finished = False
+        self._subscribers = set()
+
+    def push(self, line: str):
+        self.lines.append(line)
+        for queue in self._subscribers:
+            queue.put_nowait(line)
+
+    def finish(self):
+        self.finished = True
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+
+    async def follow(self):
+        """Yield every line of the run, replaying what was already logged."""
+        queue = asyncio.Queue()
+        for line in self.lines:
+            queue.put_nowait(line)
+        if self.finished:
+            queue.put_nowait(None)
+        else:
+            self._subscribers.add(queue)
+        try:
+            while True:
+                line = await queue.get()
+                if line is None:
+                    return
+                yield line
+        finally:
+            self._subscribers.discard(queue)
+
+
+class IngestionCoordinator:
+    """Runs ``ingest(log)`` in a worker thread, at most one run at a time.
+
+    Requests arriving while a run is in progress attach to it instead of
+    starting another upload of the same rows.  ``on_complete`` receives the
+    inserted rows (in the worker thread) before the run is closed, and may
+    return a summary line for the log.
+    """
+
+    def __init__(self, ingest, on_complete=None):
+        self._ingest = ingest
+        self._on_complete = on_complete
+        self._current = None
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._current is not None
+
+    def attach(self):
+        """Return an async iterator over the current run's log, starting one if idle."""
+        if self._current is None:
+            self._current = IngestionRun()
+            self._task = asyncio.get_running_loop().create_task(self._run(self._current))
+        return self._current.follow()
+
+    async def _run(self, run: IngestionRun):
+        loop = asyncio.get_running_loop()
+
+        def log(message):
+            loop.call_soon_threadsafe(run.push, f"{message}\n")
+
+        def work():
+            rows = self._ingest(log)
+            if self._on_complete is not None:
+                summary = self._on_complete(rows)
+                if summary:
+                    log(summary)
+            return rows
+
+        try:
+            rows = await asyncio.to_thread(work)
+            run.push(f"\nDone. Inserted {len(rows)} rows.\n")
+        except Exception as exc:
+            run.push(f"\nIngestion failed: {exc}\n")
+        finally:
+            self._current = None
+            run.finish()
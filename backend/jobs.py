@@ -0,0 +1,251 @@
+"""Background prediction jobs backed by a bounded process pool.
+
+Training runs in separate worker processes so request threads and the event
+loop stay free for cheap endpoints such as ``/ping`` and ``/stock-100``.
+"""
+
+import importlib
+import multiprocessing
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextvars import ContextVar
+from threading import Condition, Lock
+
+import tracing
+
+JOB_HISTORY_LIMIT = int(os.getenv("JOB_HISTORY_LIMIT", "100"))
+# Set inside pool workers so nested code does not start pools of its own.
+POOL_WORKER_ENV = "STOCK_PREDICTOR_POOL_WORKER"
+
+_current_pool = ContextVar("training_pool", default=None)
+
+
+def init_worker_process(threads: int):
+    # Each worker gets an even share of the cores so concurrently training
+    # models do not oversubscribe the CPU.  These must be set before
+    # TensorFlow is imported in the worker.
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ[POOL_WORKER_ENV] = "1"
+
+
+def in_pool_worker() -> bool:
+    """Whether this process is a worker of a training process pool."""
+    return os.environ.get(POOL_WORKER_ENV) == "1"
+
+
+def current_pool():
+    """The :class:`TrainingPool` training a model in this context, if any."""
+    return _current_pool.get()
+
+
+def warm_worker(module_names):
+    """Import TensorFlow and the model modules inside a pool worker."""
+    import tensorflow  # noqa: F401
+
+    for module_name in module_names:
+        importlib.import_module(module_name)
+
+
+def train_in_worker(module_name: str, df):
+    """Entry point executed inside a pool worker.
+
+    Stage timings recorded during training come back under ``stages``.
+    """
+    module = importlib.import_module(module_name)
+    with tracing.collect() as stages:
+        result = module.train_and_predict(df)
+    result["stages"] = stages
+    return result
+
+
+class TrainingPool:
+    """Lazily started process pool running ``train_and_predict`` functions.
+
+    Models whose module sets ``FAN_OUT = True`` train many small networks
+    (cross validation folds, grid points).  They run in the calling thread
+    instead, and ``parallel_training.train_many`` submits each network to
+    this pool as a task of its own, found through :func:`current_pool`.
+    """
+
+    def __init__(self, max_workers: int = None):
+        cpus = os.cpu_count() or 1
+        # One worker per model by default so a full request trains in parallel.
+        self.max_workers = max_workers or int(
+            os.getenv("PREDICTION_WORKERS", str(min(4, cpus)))
+        )
+        self.threads_per_worker = int(
+            os.getenv("TF_THREADS_PER_WORKER", str(max(1, cpus // self.max_workers)))
+        )
+        self._lock = Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # ``spawn`` avoids forking a parent that may already hold
+                # TensorFlow's thread pools.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_worker_process,
+                    initargs=(self.threads_per_worker,),
+                )
+            return self._executor
+
+    def submit(self, module_name: str, df):
+        return self._get_executor().submit(train_in_worker, module_name, df)
+
+    def submit_task(self, func, *args):
+        """Run ``func(*args)`` in a worker; used for the tasks of one model."""
+        return self._get_executor().submit(func, *args)
+
+    def prewarm(self, module_names):
+        """Start the workers and load the heavy imports ahead of demand."""
+        executor = self._get_executor()
+        for _ in range(self.max_workers):
+            executor.submit(warm_worker, list(module_names))
+
+    def run(self, module_name: str, df):
+        """Train in a worker process and block until the result is ready."""
+        if getattr(importlib.import_module(module_name), "FAN_OUT", False):
+            token = _current_pool.set(self)
+            try:
+                return train_in_worker(module_name, df)
+            finally:
+                _current_pool.reset(token)
+        return self.submit(module_name, df).result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+class Job:
+    """State and event log of one prediction job."""
+
+    def __init__(self, models):
+        self.id = uuid.uuid4().hex
+        self.models = list(dict.fromkeys(models))
+        self.status = "queued"
+        self.results = {}
+        self.errors = {}
+        self.created_at = time.time()
+        self.finished_at = None
+        self.events = []
+        self._pending = set(self.models)
+        self._cond = Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+    def emit(self, event: str, **data):
+        with self._cond:
+            self.events.append({"event": event, **data})
+            self._cond.notify_all()
+
+    def wait_for_events(self, start: int, timeout: float = 15.0):
+        """Return events after index ``start``, blocking until one arrives."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: len(self.events) > start or self.finished, timeout
+            )
+            return self.events[start:]
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "models": self.models,
+            "results": self.results,
+            "errors": self.errors,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Create jobs, dispatch their models and keep a bounded job history.
+
+    ``runner(name, df)`` performs one model run (normally via a
+    :class:`TrainingPool`); ``on_complete(job, df)`` is called once all
+    models of a job have finished.
+    """
+
+    def __init__(self, runner, on_complete=None, history_limit: int = JOB_HISTORY_LIMIT):
+        self._runner = runner
+        self._on_complete = on_complete
+        self._history_limit = history_limit
+        self._jobs = OrderedDict()
+        self._lock = Lock()
+        self._dispatch = ThreadPoolExecutor(thread_name_prefix="job-dispatch")
+
+    def submit(self, models, df) -> Job:
+        job = Job(models)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self._history_limit:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if not oldest.finished:
+                    break
+                del self._jobs[oldest_id]
+
+        job.status = "running"
+        if not job.models:
+            self._finish(job, df)
+        for name in job.models:
+            self._dispatch.submit(self._run_one, job, name, df)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run_one(self, job: Job, name: str, df):
+        job.emit("start", model=name)
+        try:
+            result = self._runner(name, df)
+        except Exception as exc:
+            job.errors[name] = str(exc)
+            job.emit("error", model=name, message=str(exc))
+        else:
+            job.results[name] = result
+            job.emit("end", model=name)
+
+        with job._cond:
+            job._pending.discard(name)
+            last = not job._pending
+        if last:
+            self._finish(job, df)
+
+    def _finish(self, job: Job, df):
+        if self._on_complete is not None and job.results:
+            try:
+                self._on_complete(job, df)
+            except Exception as exc:
+                job.errors["_complete"] = str(exc)
+        with job._cond:
+            job.status = "error" if job.errors and not job.results else "done"
+            job.finished_at = time.time()
+            # Appended under the same lock so streams never see a finished
+            # job without its final event.
+            job.events.append(
+                {
+                    "event": "results",
+                    "status": job.status,
+                    "results": job.results,
+                    "errors": job.errors,
+                }
+            )
+            job._cond.notify_all()
+
+    def shutdown(self):
+        self._dispatch.shutdown(wait=False, cancel_futures=True)
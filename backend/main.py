@@ -1,84 +1,240 @@
+import asyncio
 import os
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 
-import sys
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
-from supabase import create_client
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
-from threading import Lock
-import subprocess
+from datetime import date, datetime, timezone
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
-import baseline_model
-import cross_validation_model
-import persist_model
-import grid_search_model
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import json
-from prediction_history import insert_predictions, refresh_missing_actuals
+import db
+import tracing
+from accuracy_summary import AccuracySummary
+from prediction_history import (
+    afetch_history_page,
+    insert_predictions,
+    refresh_missing_actuals,
+    resolved_count,
+    resolved_rows,
+)
+from prediction_cache import PredictionCache, cache_key, config_hash
+from plots import PLOT_KINDS, PlotStore
+from jobs import JobManager, TrainingPool
+from model_registry import IMPORT_TIMINGS, MODEL_MODULES, ModelRegistry
+from price_store import LocalPriceStore
+from stock_cache import SymbolPriceCache
+from ingestion import IngestionCoordinator
+from precompute import AfterCloseScheduler, SnapshotStore, parse_time
+from symbols import DEFAULT_SYMBOL, WATCHLIST, known_symbol, normalize_symbol, symbol_of
 
 # Load env vars
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-# ALPHA_VANTAGE_API_KEY is no longer strictly needed for the fetch, 
-# but we keep it if other parts use it or for safety.
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise RuntimeError("Supabase credentials are missing.")
-
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-STOCK_SYMBOL = "AAPL"
-
-app = FastAPI()
-
-# --- Caching Logic (Unchanged) ---
-CACHE_TTL_SECONDS = int(os.getenv("STOCK_CACHE_TTL_SECONDS", "300"))
-_stock_cache_lock = Lock()
-_stock_cache = {"df": None, "expires": datetime.min}
-
-def _fetch_stock_prices_from_supabase():
-    page_size = 1000
-    start = 0
-    frames = []
-    while True:
-        end = start + page_size - 1
-        response = (
-            supabase.table("stock_prices")
-            .select("*")
-            .order("timestamp")
-            .range(start, end)
-            .execute()
+STOCK_SYMBOL = DEFAULT_SYMBOL
+
+logger = logging.getLogger(__name__)
+
+# Warn when importing this module takes longer than the startup budget.
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "2"))
+MODEL_PREWARM = os.getenv("MODEL_PREWARM", "0") == "1"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup = IMPORT_TIMINGS.get("main", 0.0)
+    if startup > STARTUP_BUDGET_SECONDS:
+        logger.warning(
+            "main imported in %.2fs, over the %.2fs startup budget",
+            startup,
+            STARTUP_BUDGET_SECONDS,
         )
-        rows = response.data or []
-        if not rows:
-            break
-        frames.append(pd.DataFrame(rows))
-        if len(rows) < page_size:
-            break
-        start += page_size
+    if MODEL_PREWARM:
+        MODELS.prewarm()
+        training_pool.prewarm([MODELS.module_name(name) for name in MODELS.names()])
+    if scheduler is not None:
+        scheduler.start()
+        if PRECOMPUTE_ON_STARTUP:
+            scheduler.trigger()
+    yield
+    if scheduler is not None:
+        scheduler.stop()
+    job_manager.shutdown()
+    _model_dispatch.shutdown(wait=False, cancel_futures=True)
+    training_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+
+# --- Caching Logic ---
+# Refreshes only download rows newer than the cache, so the TTL can be short.
+CACHE_TTL_SECONDS = int(os.getenv("STOCK_CACHE_TTL_SECONDS", "60"))
+CACHE_FULL_SYNC_SECONDS = int(os.getenv("STOCK_CACHE_FULL_SYNC_SECONDS", "86400"))
+# Local columnar snapshot shared by every worker on this host; set
+# STOCK_STORE_DIR to an empty string to disable it.
+STOCK_STORE_DIR = os.getenv(
+    "STOCK_STORE_DIR", os.path.join(os.path.dirname(__file__), "data", "prices")
+)
+# Least recently used symbols are evicted once the cached frames exceed this.
+CACHE_MAX_BYTES = int(os.getenv("STOCK_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# The shared Supabase client is created by the first price fetch, not here.
+stock_cache = SymbolPriceCache(
+    max_bytes=CACHE_MAX_BYTES,
+    store_factory=(
+        (lambda symbol: LocalPriceStore.for_symbol(STOCK_STORE_DIR, symbol))
+        if STOCK_STORE_DIR
+        else None
+    ),
+    ttl_seconds=CACHE_TTL_SECONDS,
+    full_sync_seconds=CACHE_FULL_SYNC_SECONDS,
+)
+
+def get_stock_dataframe(symbol: str = STOCK_SYMBOL, force_refresh: bool = False) -> pd.DataFrame:
+    return stock_cache.get(known_symbol(symbol), force_refresh=force_refresh)
+
+def _traced(name: str, func, *args):
+    """Call ``func`` as stage ``name``; returns its result and the stages timed."""
+    stages = []
+    try:
+        with tracing.collect() as stages, tracing.stage(name):
+            value = func(*args)
+    finally:
+        tracing.observe(stages)
+    return value, stages
+
+# --- Prediction result cache ---
+MODELS = ModelRegistry(MODEL_MODULES)
+
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "32")),
+    ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "0")),
+)
+
+# Results computed after the market close, shared by every worker on this
+# host; set PREDICTION_SNAPSHOT_DIR to an empty string to disable them.
+PREDICTION_SNAPSHOT_DIR = os.getenv(
+    "PREDICTION_SNAPSHOT_DIR", os.path.join(os.path.dirname(__file__), "data", "snapshots")
+)
+snapshots = SnapshotStore(PREDICTION_SNAPSHOT_DIR) if PREDICTION_SNAPSHOT_DIR else None
+
+def _run_diagnostics(run_id: str):
+    """Diagnostics of a run still in the prediction cache or a snapshot."""
+    cached = prediction_cache.find(lambda result: result.get("run_id") == run_id)
+    if cached is not None:
+        return cached.get("diagnostics")
+    if snapshots is not None:
+        return snapshots.find_diagnostics(WATCHLIST, run_id)
+    return None
+
+# Diagnostics live in the cached results themselves, so a plot is served
+# exactly as long as its result; PNGs are rendered on first request.
+plot_store = PlotStore(_run_diagnostics, max_entries=prediction_cache.max_entries)
+
+def _selected_models(models: str):
+    selected = models.split(",") if models else MODELS.names()
+    return [name for name in selected if name in MODELS]
+
+# Training happens in worker processes; request threads only wait on it.
+training_pool = TrainingPool()
+trainings_in_flight = tracing.Gauge()
+
+def run_model_traced(name: str, df: pd.DataFrame, plots: bool = True):
+    """:func:`run_model` plus the stage timings of this call.
 
-    if not frames:
-        raise ValueError("No data available")
-    return pd.concat(frames, ignore_index=True)
+    The stages are empty when the result came from the prediction cache.
+    """
+    module = MODELS.get(name)
+    key = cache_key(name, df, module.MODEL_CONFIG)
 
-def get_stock_dataframe(force_refresh: bool = False) -> pd.DataFrame:
-    now = datetime.utcnow()
-    if not force_refresh:
-        with _stock_cache_lock:
-            if _stock_cache["df"] is not None and now < _stock_cache["expires"]:
-                return _stock_cache["df"].copy()
+    def compute():
+        # A snapshot computed on this dataset version saves the training.
+        if snapshots is not None:
+            with tracing.stage("snapshot_load"):
+                stored = snapshots.get(symbol_of(df), name, config_hash(key))
+            if stored is not None:
+                result, diagnostics = stored
+                if diagnostics is not None:
+                    result["diagnostics"] = diagnostics
+                return result
+        with trainings_in_flight.track():
+            result = training_pool.run(MODELS.module_name(name), df)
+        # Timings from the worker process join this call's collector.
+        tracing.record(result.pop("stages", []))
+        if result.get("diagnostics") is not None:
+            result["run_id"] = config_hash(key)
+        return result
 
-    df = _fetch_stock_prices_from_supabase()
+    stages = []
+    try:
+        with tracing.collect() as stages:
+            result = prediction_cache.get_or_compute(key, compute)
+    finally:
+        tracing.observe(stages, model=name)
+    # ``result`` is a copy; the cached entry keeps the diagnostics.
+    result.pop("diagnostics", None)
+    # Uncached results (PREDICTION_CACHE_MAX_ENTRIES=0) have no plots to link.
+    if plots and "run_id" in result and result["run_id"] in plot_store:
+        base = f"/plots/{result['run_id']}"
+        result["plot_url"] = f"{base}/prediction.png"
+        result["importance_plot_url"] = f"{base}/importance.png"
+        result["plot_data_url"] = f"{base}/data"
+    return result, stages
+
+def run_model(name: str, df: pd.DataFrame, plots: bool = True) -> dict:
+    """Train/predict with one model, reusing results for unchanged data.
+
+    Diagnostic arrays stay with the cached result under a run id; with
+    ``plots`` the result links to the images ``plot_store`` renders from them.
+    """
+    return run_model_traced(name, df, plots)[0]
 
-    with _stock_cache_lock:
-        _stock_cache["df"] = df
-        _stock_cache["expires"] = now + timedelta(seconds=CACHE_TTL_SECONDS)
+def _record_job_predictions(job, df: pd.DataFrame):
+    with tracing.stage("insert_predictions"):
+        insert_predictions(job.results, df["close"].iloc[-1], symbol_of(df))
+
+job_manager = JobManager(run_model, on_complete=_record_job_predictions)
+# Runs the selected models of one request side by side; the training itself
+# happens in ``training_pool``.
+_model_dispatch = ThreadPoolExecutor(thread_name_prefix="predict-models")
+
+def _snapshot_symbol(symbol: str):
+    """Compute every model on ``symbol``'s latest prices and store the snapshot."""
+    df = get_stock_dataframe(symbol, force_refresh=True)
+    entries = {}
+    for name in MODELS.names():
+        key = config_hash(cache_key(name, df, MODELS.get(name).MODEL_CONFIG))
+        try:
+            result = run_model(name, df, plots=False)
+        except ValueError as exc:
+            logger.warning("precompute %s/%s skipped: %s", symbol, name, exc)
+            continue
+        diagnostics = _run_diagnostics(result["run_id"]) if "run_id" in result else None
+        entries[name] = {"key": key, "result": result, "diagnostics": diagnostics}
+    snapshots.save(symbol, entries)
+    logger.info("precompute %s: %s", symbol, ", ".join(entries) or "no models")
 
-    return df.copy()
+async def precompute():
+    """Ingest the day's prices, then snapshot every model for every symbol.
+
+    One process per host does the work; the others skip the run.
+    """
+    with snapshots.exclusive() as owner:
+        if not owner:
+            logger.info("precompute already running in another worker")
+            return
+        async for line in ingestion.attach():
+            logger.debug("precompute ingest: %s", line.rstrip())
+        for symbol in WATCHLIST:
+            try:
+                await asyncio.to_thread(_snapshot_symbol, symbol)
+            except ValueError as exc:
+                logger.warning("precompute %s skipped: %s", symbol, exc)
 
 app.add_middleware(
     CORSMiddleware,
@@ -90,77 +246,179 @@ app.add_middleware(
 
 @app.get("/")
 def root():
-    return {"message": f"FastAPI + yfinance backend for {STOCK_SYMBOL}"}
+    return {"message": f"FastAPI + yfinance backend for {', '.join(WATCHLIST)}"}
 
 @app.get("/predict")
-def predict(models: str = Query("")):
+def predict(
+    models: str = Query(""), symbol: str = Query(STOCK_SYMBOL), plots: bool = Query(True)
+):
     try:
-        df = get_stock_dataframe()
+        with tracing.stage("load_prices"):
+            df = get_stock_dataframe(symbol)
     except ValueError as exc:
         return {"error": str(exc)}
-    available = {
-        "baseline": baseline_model.train_and_predict,
-        "cross_validation": cross_validation_model.train_and_predict,
-        "persist": persist_model.train_and_predict,
-        "grid_search": grid_search_model.train_and_predict,
-    }
-    selected = models.split(",") if models else available.keys()
     try:
-        results = {name: available[name](df) for name in selected if name in available}
-        insert_predictions(results, df["close"].iloc[-1])
+        futures = {
+            name: _model_dispatch.submit(run_model, name, df, plots)
+            for name in _selected_models(models)
+        }
+        results = {name: future.result() for name, future in futures.items()}
+        with tracing.stage("insert_predictions"):
+            insert_predictions(results, df["close"].iloc[-1], symbol_of(df))
         return results
     except ValueError as e:
         return {"error": str(e)}
 
 @app.get("/predict-stream")
-def predict_stream(models: str = Query("")):
+def predict_stream(
+    models: str = Query(""), symbol: str = Query(STOCK_SYMBOL), plots: bool = Query(True)
+):
+    # STAGE lines carry the stage timings of one model (or of the request
+    # itself when ``model`` is null) for the progress view.
+    def stage_line(model, stages):
+        return "STAGE:" + json.dumps({"model": model, "stages": stages}) + "\n"
+
     def stream():
         try:
-            df = get_stock_dataframe()
-        except ValueError:
-            yield "ERROR:No data available\n"
+            df, stages = _traced("load_prices", get_stock_dataframe, symbol)
+        except ValueError as exc:
+            yield f"ERROR:{exc}\n"
             return
-        available = {
-            "baseline": baseline_model.train_and_predict,
-            "cross_validation": cross_validation_model.train_and_predict,
-            "persist": persist_model.train_and_predict,
-            "grid_search": grid_search_model.train_and_predict,
-        }
-        selected = models.split(",") if models else available.keys()
-        model_list = [(name, available[name]) for name in selected if name in available]
-        results = {}
-        for name, fn in model_list:
+        yield stage_line(None, stages)
+        # Dispatch every model at once and report them as they finish.
+        futures = {}
+        for name in _selected_models(models):
             yield f"START:{name}\n"
+            futures[_model_dispatch.submit(run_model_traced, name, df, plots)] = name
+        results = {}
+        for future in as_completed(futures):
+            name = futures[future]
             try:
-                results[name] = fn(df)
+                results[name], stages = future.result()
             except ValueError as e:
                 yield f"ERROR:{str(e)}\n"
                 return
             yield f"END:{name}\n"
-        insert_predictions(results, df["close"].iloc[-1])
+            yield stage_line(name, stages)
+        _, stages = _traced(
+            "insert_predictions", insert_predictions, results, df["close"].iloc[-1], symbol_of(df)
+        )
+        yield stage_line(None, stages)
         yield "RESULTS:" + json.dumps(results) + "\n"
 
     return StreamingResponse(stream(), media_type="text/plain")
 
-@app.get("/prediction-history")
-def prediction_history():
-    resp = (
-        supabase.table("prediction_histories")
-        .select("*")
-        .order("date_of_prediction", desc=True)
-        .execute()
+@app.post("/jobs/predict", status_code=202)
+def create_prediction_job(models: str = Query(""), symbol: str = Query(STOCK_SYMBOL)):
+    try:
+        df = get_stock_dataframe(symbol)
+    except ValueError as exc:
+        return {"error": str(exc)}
+    job = job_manager.submit(_selected_models(models), df)
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown job"})
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/events")
+def job_events(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown job"})
+
+    def stream():
+        sent = 0
+        while True:
+            events = job.wait_for_events(sent)
+            for event in events:
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            sent += len(events)
+            if job.finished and sent >= len(job.events):
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+# Seeded from the resolved rows on first use, then updated as actuals land;
+# re-seeded when rows were resolved elsewhere (another worker or a script).
+accuracy_summary = AccuracySummary(
+    resolved_rows,
+    window=int(os.getenv("PREDICTION_ROLLING_WINDOW", "20")),
+    version=resolved_count,
+)
+
+@app.get("/plots/{run_id}/data")
+def plot_data(run_id: str):
+    try:
+        return plot_store.diagnostics(run_id)
+    except KeyError:
+        return JSONResponse(status_code=404, content={"error": "Unknown prediction run"})
+
+@app.get("/plots/{run_id}/{kind}.png")
+def plot_image(run_id: str, kind: str):
+    if kind not in PLOT_KINDS:
+        return JSONResponse(status_code=404, content={"error": f"Unknown plot: {kind}"})
+    try:
+        image = plot_store.png(run_id, kind)
+    except KeyError:
+        return JSONResponse(status_code=404, content={"error": "Unknown prediction run"})
+    # A run id names one model run on one dataset version, so it never changes.
+    return Response(
+        content=image,
+        media_type="image/png",
+        headers={"Cache-Control": "public, max-age=86400, immutable"},
     )
-    return resp.data or []
+
+@app.get("/prediction-history")
+async def prediction_history(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    model_type: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    symbol: Optional[str] = None,
+):
+    try:
+        return await afetch_history_page(
+            limit=limit,
+            cursor=cursor,
+            model_type=model_type,
+            start=start.isoformat() if start else None,
+            end=end.isoformat() if end else None,
+            symbol=normalize_symbol(symbol) if symbol else None,
+        )
+    except ValueError as exc:
+        return JSONResponse(status_code=400, content={"error": str(exc)})
+
+@app.get("/prediction-history/summary")
+def prediction_history_summary(symbol: Optional[str] = None):
+    try:
+        symbol = normalize_symbol(symbol) if symbol else None
+    except ValueError as exc:
+        return JSONResponse(status_code=400, content={"error": str(exc)})
+    return {"models": accuracy_summary.summary(symbol), "rolling_window": accuracy_summary.window}
 
 @app.post("/refresh-prediction-history")
 def refresh_prediction_history():
-    updated = refresh_missing_actuals()
-    return {"updated": updated}
+    report = refresh_missing_actuals(
+        price_lookup=get_stock_dataframe, on_resolved=accuracy_summary.add
+    )
+    for name, phase in report["phases"].items():
+        logger.info(
+            "refresh-prediction-history %s: %d rows in %.4fs",
+            name, phase["rows"], phase["seconds"],
+        )
+    return report
 
 @app.get("/stock-100")
-def stock_100():
+def stock_100(symbol: str = Query(STOCK_SYMBOL)):
     try:
-        df = get_stock_dataframe()
+        df = get_stock_dataframe(symbol)
     except ValueError:
         return []
     latest = df.tail(100).copy()
@@ -171,9 +429,13 @@ def stock_100():
     ]
 
 @app.get("/stock-stats")
-def stock_stats():
+async def stock_stats(symbol: str = Query(STOCK_SYMBOL)):
     try:
-        df = get_stock_dataframe()
+        symbol = known_symbol(symbol)
+        df = stock_cache.peek(symbol)
+        if df is None:
+            # Cold cache: load it off the event loop.
+            df = await asyncio.to_thread(get_stock_dataframe, symbol)
     except ValueError:
         return {"count": 0, "min_date": None, "max_date": None}
 
@@ -184,34 +446,155 @@ def stock_stats():
     }
 
 # === UPDATED FETCH ENDPOINT ===
+def _ingest(log):
+    # Imported on first use; later runs reuse the loaded module and client.
+    from fetch_and_upload import ingest
+
+    return ingest(log=log)
+
+def _merge_ingested(rows):
+    merged = stock_cache.merge_rows(rows)
+    if merged:
+        return "Price cache updated: " + ", ".join(f"{s} +{n}" for s, n in merged.items())
+
+ingestion = IngestionCoordinator(_ingest, on_complete=_merge_ingested)
+
+# After-close precompute (weekdays, UTC; the default is after 16:00 New York
+# time all year round).  PRECOMPUTE_ON_STARTUP also runs it when the app starts.
+PRECOMPUTE_ENABLED = os.getenv("PRECOMPUTE_ENABLED", "1") == "1"
+PRECOMPUTE_AT_UTC = parse_time(os.getenv("PRECOMPUTE_AT_UTC", "21:30"))
+PRECOMPUTE_ON_STARTUP = os.getenv("PRECOMPUTE_ON_STARTUP", "0") == "1"
+scheduler = (
+    AfterCloseScheduler(precompute, PRECOMPUTE_AT_UTC)
+    if PRECOMPUTE_ENABLED and snapshots is not None
+    else None
+)
+
 @app.post("/fetch-latest-stream")
-def fetch_latest_stream():
-    def stream_logs():
-        # We removed the rate limit check because yfinance allows frequent access
-        yield "Connecting to Yahoo Finance via yfinance...\n"
-
-        process = subprocess.Popen(
-            [sys.executable, "fetch_and_upload.py"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True
-        )
+async def fetch_latest_stream():
+    joined = ingestion.running
+    lines = ingestion.attach()
 
-        for line in process.stdout:
+    async def stream_logs():
+        if joined:
+            yield "Joining the fetch already in progress...\n"
+        else:
+            yield "Connecting to Yahoo Finance via yfinance...\n"
+        async for line in lines:
             yield line
 
-        process.wait()
-        
-        # Refresh cache immediately
-        try:
-            get_stock_dataframe(force_refresh=True)
-        except ValueError:
-            pass
-            
-        yield f"\nDone. Exit code: {process.returncode}\n"
-
     return StreamingResponse(stream_logs(), media_type="text/plain")
 
+@app.post("/precompute", status_code=202)
+async def start_precompute():
+    if scheduler is None:
+        return JSONResponse(status_code=404, content={"error": "Precompute is disabled"})
+    scheduler.trigger()
+    return {"status": "running"}
+
+@app.get("/precompute")
+def precompute_status():
+    if scheduler is None:
+        return JSONResponse(status_code=404, content={"error": "Precompute is disabled"})
+    symbols = {}
+    for symbol in WATCHLIST:
+        snapshot = snapshots.load(symbol)
+        if snapshot is not None:
+            symbols[symbol] = {
+                "created_at": snapshot["created_at"],
+                "models": list(snapshot["models"]),
+            }
+    return {
+        "running": scheduler.running,
+        "last_run": scheduler.last_run,
+        "next_run": scheduler.next_run(datetime.now(timezone.utc)).isoformat(),
+        "snapshots": symbols,
+    }
+
+@app.get("/cache-stats")
+def cache_stats():
+    return stock_cache.stats()
+
+@app.get("/db-metrics")
+def db_metrics():
+    return db.QUERY_METRICS.snapshot()
+
+def _hit_ratio(hits: int, total: int) -> float:
+    return hits / total if total else 0.0
+
+@app.get("/metrics")
+def metrics():
+    """Stage latencies, cache and database counters in Prometheus text format."""
+    prices = stock_cache.stats()
+    price_samples = [
+        ({"symbol": symbol, "result": result}, stats[counter])
+        for symbol, stats in sorted(prices["symbols"].items())
+        for result, counter in (("hit", "hits"), ("stale_hit", "stale_hits"), ("miss", "misses"))
+    ]
+    price_hits = prices["hits"] + prices["stale_hits"]
+    predictions = prediction_cache.stats()
+    prediction_total = sum(predictions[c] for c in PredictionCache.COUNTERS)
+    queries = sorted(db.QUERY_METRICS.snapshot().items())
+
+    body = tracing.render(
+        tracing.metric_lines(
+            "stock_predictor_price_cache_requests_total", "counter",
+            "Price cache reads by symbol and outcome.", price_samples,
+        ),
+        tracing.metric_lines(
+            "stock_predictor_price_cache_hit_ratio", "gauge",
+            "Share of price cache reads served from memory (fresh or stale).",
+            [({}, _hit_ratio(price_hits, price_hits + prices["misses"]))],
+        ),
+        tracing.metric_lines(
+            "stock_predictor_price_cache_refreshes_total", "counter",
+            "Price cache refreshes by outcome.",
+            [({"result": "ok"}, prices["refreshes"]), ({"result": "error"}, prices["refresh_errors"])],
+        ),
+        tracing.metric_lines(
+            "stock_predictor_prediction_cache_requests_total", "counter",
+            "Prediction cache lookups; coalesced calls waited on a training in flight.",
+            [
+                ({"result": result}, predictions[counter])
+                for result, counter in (("hit", "hits"), ("miss", "misses"), ("coalesced", "coalesced"))
+            ],
+        ),
+        tracing.metric_lines(
+            "stock_predictor_prediction_cache_hit_ratio", "gauge",
+            "Share of prediction cache lookups that did not start a training.",
+            [({}, _hit_ratio(prediction_total - predictions["misses"], prediction_total))],
+        ),
+        tracing.metric_lines(
+            "stock_predictor_trainings_in_flight", "gauge",
+            "Model trainings currently running in the worker pool.",
+            [({}, trainings_in_flight.value)],
+        ),
+        tracing.metric_lines(
+            "stock_predictor_db_queries_total", "counter",
+            "Supabase queries by name.", [({"query": n}, q["count"]) for n, q in queries],
+        ),
+        tracing.metric_lines(
+            "stock_predictor_db_query_errors_total", "counter",
+            "Failed Supabase queries by name.", [({"query": n}, q["errors"]) for n, q in queries],
+        ),
+        tracing.metric_lines(
+            "stock_predictor_db_query_seconds_total", "counter",
+            "Time spent in Supabase queries by name, retries included.",
+            [({"query": n}, q["total_seconds"]) for n, q in queries],
+        ),
+    )
+    return Response(content=body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/ping")
 def ping():
     return {"status": "ok", "timestamp": datetime.utcnow().isoformat()}
+
+@app.get("/startup")
+def startup_timings():
+    return {
+        "import_seconds": IMPORT_TIMINGS,
+        "budget_seconds": STARTUP_BUDGET_SECONDS,
+        "models_loaded": MODELS.loaded(),
+    }
+
+IMPORT_TIMINGS["main"] = time.perf_counter() - _IMPORT_STARTED
@@ -0,0 +1,77 @@
+"""Lazily imported registry of the prediction models.
+
+Model modules are only imported the first time they are needed so the API
+can answer ``/ping`` before any of the heavy ML dependencies load.  Import
+durations are recorded to keep an eye on the startup budget.
+"""
+
+import importlib
+import logging
+import time
+from threading import Lock, Thread
+
+logger = logging.getLogger(__name__)
+
+# Wall-clock seconds spent importing modules, keyed by module name.
+IMPORT_TIMINGS = {}
+
+# Model name -> module served by the API and covered by backtests.
+MODEL_MODULES = {
+    "baseline": "baseline_model",
+    "cross_validation": "cross_validation_model",
+    "persist": "persist_model",
+    "grid_search": "grid_search_model",
+}
+
+
+def timed_import(module_name: str):
+    """Import ``module_name`` and record how long the import took."""
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    IMPORT_TIMINGS.setdefault(module_name, time.perf_counter() - started)
+    return module
+
+
+class ModelRegistry:
+    """Map model names to lazily imported modules exposing ``train_and_predict``."""
+
+    def __init__(self, modules: dict):
+        self._module_names = dict(modules)
+        self._modules = {}
+        self._lock = Lock()
+
+    def __contains__(self, name) -> bool:
+        return name in self._module_names
+
+    def names(self):
+        return list(self._module_names)
+
+    def module_name(self, name: str) -> str:
+        return self._module_names[name]
+
+    def get(self, name: str):
+        """Return the module for ``name``, importing it on first use."""
+        module = self._modules.get(name)
+        if module is not None:
+            return module
+        with self._lock:
+            if name not in self._modules:
+                self._modules[name] = timed_import(self._module_names[name])
+            return self._modules[name]
+
+    def loaded(self):
+        return [name for name in self._module_names if name in self._modules]
+
+    def prewarm(self, extra_modules=()):
+        """Import every model (and ``extra_modules``) in a background thread."""
+
+        def warm():
+            for module_name in extra_modules:
+                timed_import(module_name)
+            for name in self._module_names:
+                self.get(name)
+            logger.info("Model registry warm: %s", IMPORT_TIMINGS)
+
+        thread = Thread(target=warm, name="model-prewarm", daemon=True)
+        thread.start()
+        return thread
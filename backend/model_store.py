@@ -0,0 +1,248 @@
+"""Versioned model artifacts stored as compact ``.npz`` archives.
+
+An artifact is a :class:`dense_inference.DenseNet`'s weights plus the
+parameters of its ``StandardScaler``, saved as plain arrays.  The archive
+goes to a Supabase Storage bucket as raw bytes, and each version gets a
+metadata row in ``model_artifacts`` with its content hash and training
+state.  Saving identical weights is a no-op.  Loaded artifacts stay in
+memory and are reused while the stored version is unchanged, so a load
+costs one small metadata query instead of a download.
+
+A save first claims its version by inserting the metadata row (the primary
+key makes concurrent writers pick different versions), then uploads the
+archive and marks the row ``ready``.  Loads only see ready rows and check
+the downloaded archive against the row's content hash.
+"""
+
+import hashlib
+import io
+import os
+from threading import Lock
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+import db
+from dense_inference import DenseNet
+
+TABLE_NAME = "model_artifacts"
+BUCKET = os.getenv("MODEL_ARTIFACT_BUCKET", "models")
+# Versions tried by one save before giving up on concurrent writers.
+MAX_VERSION_CLAIMS = 5
+
+_SCALER_FIELDS = ("mean_", "scale_", "var_")
+
+
+def pack(net: DenseNet, scaler: StandardScaler) -> dict:
+    """The arrays making up an artifact, keyed by archive member name."""
+    arrays = {"n_layers": np.array(len(net.layers))}
+    for i, (kernel, bias, activation) in enumerate(net.layers):
+        arrays[f"kernel_{i}"] = kernel
+        arrays[f"bias_{i}"] = bias
+        arrays[f"activation_{i}"] = np.array(activation)
+    for field in _SCALER_FIELDS:
+        arrays[f"scaler_{field}"] = np.asarray(getattr(scaler, field), dtype=float)
+    arrays["scaler_n_samples_seen_"] = np.asarray(scaler.n_samples_seen_)
+    if hasattr(scaler, "feature_names_in_"):
+        arrays["scaler_feature_names_in_"] = np.asarray(scaler.feature_names_in_, dtype=str)
+    return arrays
+
+
+def unpack(arrays) -> tuple:
+    """Rebuild ``(net, scaler)`` from :func:`pack` output or a loaded archive."""
+    net = DenseNet(
+        [
+            (arrays[f"kernel_{i}"], arrays[f"bias_{i}"], str(arrays[f"activation_{i}"]))
+            for i in range(int(arrays["n_layers"]))
+        ]
+    )
+    scaler = StandardScaler()
+    for field in _SCALER_FIELDS:
+        setattr(scaler, field, arrays[f"scaler_{field}"])
+    scaler.n_samples_seen_ = arrays["scaler_n_samples_seen_"]
+    scaler.n_features_in_ = len(scaler.mean_)
+    if "scaler_feature_names_in_" in arrays:
+        scaler.feature_names_in_ = arrays["scaler_feature_names_in_"].astype(object)
+    return net, scaler
+
+
+def content_hash(arrays: dict) -> str:
+    """SHA-256 over the names, dtypes, shapes and bytes of ``arrays``."""
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(f"{name}:{array.dtype.str}:{array.shape}".encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def to_bytes(arrays: dict) -> bytes:
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **arrays)
+    return buf.getvalue()
+
+
+def load_arrays(data: bytes) -> dict:
+    with np.load(io.BytesIO(data)) as npz:
+        return {name: npz[name] for name in npz.files}
+
+
+def from_bytes(data: bytes) -> tuple:
+    return unpack(load_arrays(data))
+
+
+class Artifact:
+    """One loaded artifact version."""
+
+    def __init__(self, net, scaler, version: int, content_hash: str, state=None):
+        self.net = net
+        self.scaler = scaler
+        self.version = version
+        self.content_hash = content_hash
+        self.state = state
+
+
+class ModelStore:
+    """Save and load artifacts keyed by model name and symbol."""
+
+    COUNTERS = ("memory_hits", "downloads", "saves", "unchanged_saves")
+
+    def __init__(self, client=None, bucket: str = BUCKET):
+        self._client = client
+        self.bucket = bucket
+        self._lock = Lock()
+        self._memory = {}
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+
+    @property
+    def client(self):
+        return self._client if self._client is not None else db.get_client()
+
+    @staticmethod
+    def path(model: str, symbol: str, version: int) -> str:
+        return f"{model}/{symbol}/v{version}.npz"
+
+    def latest(self, model: str, symbol: str):
+        """Metadata row of the newest uploaded version, or ``None``."""
+        resp = db.execute(
+            self.client.table(TABLE_NAME)
+            .select("version", "content_hash", "training_state")
+            .eq("model", model)
+            .eq("symbol", symbol)
+            .eq("ready", True)
+            .order("version", desc=True)
+            .limit(1),
+            "model_artifacts.latest",
+        )
+        rows = resp.data if resp else None
+        return rows[0] if rows else None
+
+    def load(self, model: str, symbol: str):
+        """The newest artifact, from memory when its version is current."""
+        meta = self.latest(model, symbol)
+        if meta is None:
+            return None
+        with self._lock:
+            cached = self._memory.get((model, symbol))
+            if cached is not None and cached.version == meta["version"]:
+                self.counters["memory_hits"] += 1
+                cached.state = meta.get("training_state")
+                return cached
+
+        storage = self.client.storage.from_(self.bucket)
+        data = db.call(
+            lambda: storage.download(self.path(model, symbol, meta["version"])),
+            "model_artifacts.download",
+        )
+        arrays = load_arrays(data)
+        if content_hash(arrays) != meta["content_hash"]:
+            raise ValueError(
+                f"Artifact {self.path(model, symbol, meta['version'])} does not match its content hash."
+            )
+        net, scaler = unpack(arrays)
+        artifact = Artifact(
+            net, scaler, meta["version"], meta["content_hash"], meta.get("training_state")
+        )
+        with self._lock:
+            self.counters["downloads"] += 1
+            self._memory[(model, symbol)] = artifact
+        return artifact
+
+    def save(self, model: str, symbol: str, net: DenseNet, scaler: StandardScaler, state=None):
+        """Store a new version unless it matches the newest one; returns the artifact."""
+        arrays = pack(net, scaler)
+        digest = content_hash(arrays)
+        meta = self.latest(model, symbol)
+        if meta is not None and meta["content_hash"] == digest:
+            if state != meta.get("training_state"):
+                db.execute(
+                    self.client.table(TABLE_NAME)
+                    .update({"training_state": state})
+                    .eq("model", model)
+                    .eq("symbol", symbol)
+                    .eq("version", meta["version"]),
+                    "model_artifacts.update_state",
+                )
+            version = meta["version"]
+            counter = "unchanged_saves"
+        else:
+            data = to_bytes(arrays)
+            version = self._claim_version(
+                model, symbol, (meta["version"] if meta else 0) + 1, digest, len(data), state
+            )
+            storage = self.client.storage.from_(self.bucket)
+            # No upsert: the claimed version's path is ours alone.
+            db.call(
+                lambda: storage.upload(
+                    self.path(model, symbol, version),
+                    data,
+                    {"content-type": "application/octet-stream"},
+                ),
+                "model_artifacts.upload",
+                retry=False,
+            )
+            db.execute(
+                self.client.table(TABLE_NAME)
+                .update({"ready": True})
+                .eq("model", model)
+                .eq("symbol", symbol)
+                .eq("version", version),
+                "model_artifacts.mark_ready",
+            )
+            counter = "saves"
+
+        artifact = Artifact(net, scaler, version, digest, state)
+        with self._lock:
+            self.counters[counter] += 1
+            self._memory[(model, symbol)] = artifact
+        return artifact
+
+    def _claim_version(self, model, symbol, version, digest, size, state) -> int:
+        """Insert the metadata row for the first free version from ``version``."""
+        for attempt in range(MAX_VERSION_CLAIMS):
+            try:
+                db.execute(
+                    self.client.table(TABLE_NAME).insert(
+                        {
+                            "model": model,
+                            "symbol": symbol,
+                            "version": version + attempt,
+                            "content_hash": digest,
+                            "size_bytes": size,
+                            "training_state": state,
+                            "ready": False,
+                        }
+                    ),
+                    "model_artifacts.insert",
+                    retry=False,
+                )
+            except Exception as exc:
+                if not db.is_unique_violation(exc):
+                    raise
+            else:
+                return version + attempt
+        raise RuntimeError(f"Could not claim a version for {model}/{symbol}.")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counters, "in_memory": len(self._memory)}
@@ -0,0 +1,153 @@
+"""Parallel training of independent Keras models on the same arrays.
+
+Cross validation folds and grid search points only differ in which rows and
+hyper-parameters they use, so they are trained side by side in worker
+processes: those of the API's ``jobs.TrainingPool`` when a model is trained
+through it, otherwise a pool of ``TRAINING_WORKERS`` owned by this module.
+The scaled feature matrix and targets are copied into shared memory once per
+call; each task only receives the block names plus its row slices and
+parameters.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
+from threading import Lock
+
+import numpy as np
+from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
+
+from dense_inference import DenseNet
+from jobs import current_pool, in_pool_worker, init_worker_process
+
+TRAINING_WORKERS = int(os.getenv("TRAINING_WORKERS", str(min(3, os.cpu_count() or 1))))
+
+_executor_lock = Lock()
+_executor = None
+_executor_workers = 0
+
+
+def _get_executor(workers: int):
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker_process,
+                initargs=(threads,),
+            )
+            _executor_workers = workers
+        return _executor
+
+
+class SharedArrays:
+    """Context manager exposing NumPy arrays to other processes by name."""
+
+    def __init__(self, **arrays):
+        self.handles = {}
+        self._blocks = []
+        for key, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            block = SharedMemory(create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, arr.dtype, buffer=block.buf)[...] = arr
+            self._blocks.append(block)
+            self.handles[key] = (block.name, arr.shape, arr.dtype.str)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def fit_and_score(build_model, X, y, train, test=None, units1=100, units2=20, epochs=15):
+    """Train on ``X[train]`` and return the latest-row prediction.
+
+    When ``test`` is given the model is also scored on ``X[test]`` and the
+    r2/mae/rmse metrics are included in the result.
+    """
+    model = build_model(X.shape[1], units1, units2)
+    model.fit(X[train], y[train], epochs=epochs, verbose=0)
+    net = DenseNet.from_keras(model)
+    result = {"latest": float(net.predict(X[-1:])[0][0])}
+    if test is not None:
+        y_test = y[test]
+        preds = net.predict(X[test])
+        result.update(
+            r2=float(r2_score(y_test, preds)),
+            mae=float(mean_absolute_error(y_test, preds)),
+            rmse=float(np.sqrt(mean_squared_error(y_test, preds))),
+        )
+    return result
+
+
+@contextmanager
+def attach_shared(handles):
+    """Map :class:`SharedArrays` ``handles`` back to arrays in a worker."""
+    blocks = {key: SharedMemory(name=name) for key, (name, _, _) in handles.items()}
+    arrays = {
+        key: np.ndarray(shape, np.dtype(dtype), buffer=blocks[key].buf)
+        for key, (_, shape, dtype) in handles.items()
+    }
+    try:
+        yield arrays
+    finally:
+        arrays.clear()
+        for block in blocks.values():
+            try:
+                block.close()
+            except BufferError:
+                # A view still referenced elsewhere keeps the mapping alive
+                # until it is garbage collected.
+                pass
+
+
+def run_shared(func, arrays: dict, tasks, workers: int = TRAINING_WORKERS, pool=None) -> list:
+    """Run ``func(handles, task)`` for every task on the process pool.
+
+    ``arrays`` are copied into shared memory once and ``func`` (a module
+    level function or a ``functools.partial`` of one) maps ``handles`` back
+    with :func:`attach_shared`.  The tasks go to ``pool`` (a
+    ``jobs.TrainingPool``) when given, else to a pool of ``workers``.
+    Results are returned in task order.
+    """
+    submit = pool.submit_task if pool is not None else _get_executor(workers).submit
+    with SharedArrays(**arrays) as shared:
+        futures = [submit(func, shared.handles, task) for task in tasks]
+        return [future.result() for future in futures]
+
+
+def _fit_shared(build_model, handles, task):
+    with attach_shared(handles) as arrays:
+        return fit_and_score(build_model, arrays["X"], arrays["y"], **task)
+
+
+def train_many(build_model, X, y, tasks, workers: int = None):
+    """Run :func:`fit_and_score` for every task, in parallel when possible.
+
+    ``build_model(input_dim, units1, units2)`` must be a module level
+    function so it can be sent to worker processes.  Results are returned in
+    task order.  A model trained through ``jobs.TrainingPool`` sends its
+    tasks to that pool, so they share its workers with the other models of
+    a request.  Inside a pool worker the tasks run serially: that worker
+    already holds its share of the cores, and a nested pool would
+    oversubscribe them.
+    """
+    workers = TRAINING_WORKERS if workers is None else workers
+    pool = current_pool()
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(tasks) <= 1 or in_pool_worker() or (pool is None and workers <= 1):
+        return [fit_and_score(build_model, X, y, **task) for task in tasks]
+
+    return run_shared(partial(_fit_shared, build_model), {"X": X, "y": y}, tasks, workers, pool)
@@ -1,122 +1,279 @@
-"""Model that persists its weights to Supabase."""
+"""Model that persists its weights to Supabase.
+
+Weights and scaler are saved as versioned artifacts by
+:class:`model_store.ModelStore`, so predictions are served with
+:class:`dense_inference.DenseNet` and TensorFlow is only imported to train.
+Models saved before the artifact store are still read from the
+``persistence_model`` table until they are next saved.
+
+Each artifact's training state records what the weights were trained on: the
+price rows covered, a fingerprint of those rows and the number of training
+samples.  When new bars arrive the model is fine-tuned on the new samples
+plus a replay sample of older ones instead of being retrained from scratch.
+"""
 
 import base64
-import io
+import hashlib
+import logging
 import os
 import pickle
 import tempfile
 
 import numpy as np
 import pandas as pd
-from dotenv import load_dotenv
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
-from tensorflow.keras.models import Sequential, load_model
-from tensorflow.keras.layers import Dense
-from supabase import create_client
 from postgrest.exceptions import APIError
 
-from baseline_model import compute_features
+import db
+from dense_inference import DenseNet
+from feature_engine import compute_features
+from model_store import ModelStore
+from symbols import symbol_of
+from tracing import stage
+
+TABLE_NAME = "persistence_model"
+MODEL_NAME = "persist"
 
-load_dotenv()
+# Per-process store; a worker keeps serving its loaded artifact while the
+# stored version is unchanged.
+ARTIFACTS = ModelStore()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+logger = logging.getLogger(__name__)
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise RuntimeError("Supabase credentials are missing.")
+# With serving-only mode the model never trains, so TensorFlow is never loaded.
+SERVING_ONLY = os.getenv("PERSIST_SERVING_ONLY", "0") == "1"
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Training settings; part of the prediction cache key.  ``full_retrain_after``
+# is the number of incremental updates after which the next update retrains
+# from scratch (0 always retrains fully).
+MODEL_CONFIG = {
+    "units1": 100,
+    "units2": 20,
+    "epochs": 25,
+    "train_fraction": 0.85,
+    "fine_tune_epochs": int(os.getenv("PERSIST_FINE_TUNE_EPOCHS", "5")),
+    "replay_samples": int(os.getenv("PERSIST_REPLAY_SAMPLES", "256")),
+    "full_retrain_after": int(os.getenv("PERSIST_FULL_RETRAIN_AFTER", "20")),
+}
 
-TABLE_NAME = "persistence_model"
+# Settings that change the network's shape; weights trained under different
+# values cannot be fine-tuned.
+ARCHITECTURE_KEYS = ("units1", "units2")
 
 
 def _build_model(input_dim: int):
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Dense
+
     model = Sequential([
-        Dense(100, input_dim=input_dim, activation="relu"),
-        Dense(20, activation="relu"),
+        Dense(MODEL_CONFIG["units1"], input_dim=input_dim, activation="relu"),
+        Dense(MODEL_CONFIG["units2"], activation="relu"),
         Dense(1, activation="linear"),
     ])
     model.compile(optimizer="adam", loss="mse")
     return model
 
 
-def _load_persisted():
-    """Return persisted (model, scaler) from Supabase or (None, None)."""
+def _model_from_net(net: DenseNet):
+    """A compiled Keras model initialised with ``net``'s weights."""
+    model = _build_model(net.input_dim)
+    model.set_weights([array for kernel, bias, _ in net.layers for array in (kernel, bias)])
+    return model
+
+
+def data_fingerprint(df: pd.DataFrame, rows: int) -> str:
+    """Hash of the timestamps and closes of the first ``rows`` price rows."""
+    prefix = df[["timestamp", "close"]].iloc[:rows]
+    hashed = pd.util.hash_pandas_object(prefix, index=False).to_numpy()
+    return hashlib.sha1(hashed.tobytes()).hexdigest()
+
+
+def _training_state(df: pd.DataFrame, samples: int, updates: int) -> dict:
+    return {
+        "trained_through": str(df["timestamp"].iloc[-1]),
+        "rows": len(df),
+        "samples": samples,
+        "fingerprint": data_fingerprint(df, len(df)),
+        "architecture": {key: MODEL_CONFIG[key] for key in ARCHITECTURE_KEYS},
+        "incremental_updates": updates,
+    }
+
+
+def plan_update(state, df: pd.DataFrame, samples: int) -> str:
+    """Decide how to bring a persisted model up to date with ``df``.
+
+    Returns ``"reuse"`` when nothing new can be learned, ``"incremental"``
+    when ``df`` only appends bars to the data the model was trained on, and
+    ``"full"`` otherwise (no usable state, edited history, a changed
+    architecture or the incremental update budget is spent).
+    """
+    if not state:
+        return "full"
+    architecture = {key: MODEL_CONFIG[key] for key in ARCHITECTURE_KEYS}
+    rows = state.get("rows", 0)
+    if (
+        state.get("architecture") != architecture
+        or len(df) < rows
+        or data_fingerprint(df, rows) != state.get("fingerprint")
+    ):
+        return "full"
+    if samples <= state.get("samples", 0):
+        return "reuse"
+    if state.get("incremental_updates", 0) >= MODEL_CONFIG["full_retrain_after"]:
+        return "full"
+    return "incremental"
+
+
+def _load_persisted(symbol: str):
+    """Return ``(net, scaler, training_state)`` for ``symbol``, or Nones."""
     try:
-        resp = (
-            supabase.table(TABLE_NAME)
+        artifact = ARTIFACTS.load(MODEL_NAME, symbol)
+    except ValueError as exc:
+        # A corrupt archive is retrained; the new version supersedes it.
+        logger.warning("Ignoring persisted model for %s: %s", symbol, exc)
+        return None, None, None
+    if artifact is not None:
+        return artifact.net, artifact.scaler, artifact.state
+    return _load_legacy(symbol)
+
+
+def _load_legacy(symbol: str):
+    """Read a Keras model saved to ``persistence_model`` before the artifact store."""
+    try:
+        resp = db.execute(
+            db.get_client().table(TABLE_NAME)
             .select("model", "scaler")
-            .maybe_single()
-            .execute()
+            .eq("symbol", symbol)
+            .maybe_single(),
+            "persistence_model.load",
         )
     except APIError as e:
         # Supabase table may exist but have no rows yet which raises a 204 error
         if getattr(e, "code", None) == "204":
-            return None, None
+            return None, None, None
         raise
     if resp and resp.data:
+        from tensorflow.keras.models import load_model
+
+        scaler = pickle.loads(base64.b64decode(resp.data["scaler"]))
         model_bytes = base64.b64decode(resp.data["model"])
-        scaler_bytes = base64.b64decode(resp.data["scaler"])
-        scaler = pickle.loads(scaler_bytes)
         with tempfile.NamedTemporaryFile(suffix=".keras", delete=False) as tmp:
             tmp.write(model_bytes)
             tmp.flush()
             model = load_model(tmp.name)
         os.unlink(tmp.name)
-        return model, scaler
-    return None, None
-
-
-def _persist(model, scaler):
-    scaler_b64 = base64.b64encode(pickle.dumps(scaler)).decode()
-    with tempfile.NamedTemporaryFile(suffix=".keras", delete=False) as tmp:
-        model.save(tmp.name)
-        tmp.seek(0)
-        model_b64 = base64.b64encode(tmp.read()).decode()
-    os.unlink(tmp.name)
-
-    existing = (
-        supabase.table(TABLE_NAME).select("id").eq("id", 1).maybe_single().execute()
-    )
-    if existing and existing.data:
-        supabase.table(TABLE_NAME).update(
-            {"model": model_b64, "scaler": scaler_b64}
-        ).eq("id", 1).execute()
+        # No training state: the first update retrains and saves an artifact.
+        return DenseNet.from_keras(model), scaler, None
+    return None, None, None
+
+
+def _fine_tune(net: DenseNet, scaled: np.ndarray, targets, trained_samples: int):
+    """Continue training ``net`` on the samples after ``trained_samples``.
+
+    A random replay sample of the older samples is mixed in so the update
+    does not forget the rest of the history.
+    """
+    y = np.asarray(targets, dtype=float)
+    old = np.arange(trained_samples)
+    rng = np.random.default_rng(trained_samples)
+    replay = rng.choice(old, size=min(MODEL_CONFIG["replay_samples"], len(old)), replace=False)
+    rows = np.concatenate([np.sort(replay), np.arange(trained_samples, len(scaled))])
+
+    model = _model_from_net(net)
+    model.fit(scaled[rows], y[rows], epochs=MODEL_CONFIG["fine_tune_epochs"], verbose=0)
+    return model
+
+
+# ``fit_window`` builds on the previous window's model, so backtests run
+# the windows in order.
+WARM_START = True
+
+
+def fit_window(features, targets, previous=None):
+    """Bring the model up to date on one backtest training window.
+
+    Follows the live policy: ``previous`` (the last window's result) is
+    fine-tuned on the samples added since, and a full retrain happens
+    every ``full_retrain_after`` updates.
+    """
+    if previous is None or previous["incremental_updates"] >= MODEL_CONFIG["full_retrain_after"]:
+        scaler = StandardScaler()
+        scaled = scaler.fit_transform(features)
+        model = _build_model(scaled.shape[1])
+        model.fit(scaled, targets, epochs=MODEL_CONFIG["epochs"], verbose=0)
+        updates = 0
     else:
-        supabase.table(TABLE_NAME).insert(
-            {"id": 1, "model": model_b64, "scaler": scaler_b64}
-        ).execute()
+        scaler = previous["scaler"]
+        model = _fine_tune(previous["net"], scaler.transform(features), targets, previous["samples"])
+        updates = previous["incremental_updates"] + 1
+    return {
+        "scaler": scaler,
+        "net": DenseNet.from_keras(model),
+        "samples": len(features),
+        "incremental_updates": updates,
+    }
+
+
+def _persist(net: DenseNet, scaler, symbol: str, state: dict):
+    ARTIFACTS.save(MODEL_NAME, symbol, net, scaler, state)
 
 
 def train_and_predict(df: pd.DataFrame):
-    """Use a persisted model if available; otherwise train and save it."""
-    features, targets = compute_features(df)
+    """Serve the persisted model, bringing it up to date with new bars first.
 
-    model, scaler = _load_persisted()
+    The model is fine-tuned when ``df`` appends to the data it was trained
+    on and fully retrained when that is not possible; see :func:`plan_update`.
+    """
+    with stage("compute_features"):
+        features, targets = compute_features(df)
 
-    if model and scaler:
-        scaled = scaler.transform(features)
+    symbol = symbol_of(df)
+    with stage("persist_load"):
+        net, scaler, state = _load_persisted(symbol)
+
+    if net and scaler:
+        mode = "reuse" if SERVING_ONLY else plan_update(state, df, len(features))
+    elif SERVING_ONLY:
+        raise ValueError("No persisted model available to serve.")
     else:
+        mode = "full"
+
+    if mode == "full":
         scaler = StandardScaler()
         scaled = scaler.fit_transform(features)
-        model = _build_model(scaled.shape[1])
-        model.fit(scaled, targets, epochs=25, verbose=0)
-        _persist(model, scaler)
+        with stage("fit"):
+            model = _build_model(scaled.shape[1])
+            model.fit(scaled, targets, epochs=MODEL_CONFIG["epochs"], verbose=0)
+        updates = 0
+    else:
+        # The scaler stays fixed between full retrains so the weights keep
+        # seeing inputs on the scale they were trained on.
+        scaled = scaler.transform(features)
+    if mode == "incremental":
+        with stage("fine_tune"):
+            model = _fine_tune(net, scaled, targets, state["samples"])
+        updates = state.get("incremental_updates", 0) + 1
+    if mode != "reuse":
+        net = DenseNet.from_keras(model)
+        with stage("persist_save"):
+            _persist(net, scaler, symbol, _training_state(df, len(features), updates))
 
-    train_size = int(0.85 * len(scaled))
+    train_size = int(MODEL_CONFIG["train_fraction"] * len(scaled))
     X_test = scaled[train_size:]
     y_test = targets[train_size:]
-    preds_test = model.predict(X_test)
+    with stage("predict"):
+        preds_test = net.predict(X_test)
     r2 = r2_score(y_test, preds_test)
     mae = mean_absolute_error(y_test, preds_test)
     rmse = np.sqrt(mean_squared_error(y_test, preds_test))
 
-    latest_pred = model.predict(scaled[-1].reshape(1, -1))[0][0]
+    latest_pred = net.predict(scaled[-1].reshape(1, -1))[0][0]
 
     return {
         "prediction": float(latest_pred),
         "r2": float(r2),
         "mae": float(mae),
         "rmse": float(rmse),
+        "training": mode,
     }
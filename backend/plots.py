@@ -0,0 +1,89 @@
+"""Diagnostic plots rendered on demand from the arrays models return."""
+
+import io
+from collections import OrderedDict
+from threading import Lock
+
+from tracing import stage
+
+PLOT_KINDS = ("prediction", "importance")
+
+
+def _prediction_figure(fig, diagnostics):
+    ax = fig.add_subplot()
+    for label, pairs in diagnostics["predicted_vs_actual"].items():
+        ax.scatter(pairs["predicted"], pairs["actual"], label=label)
+    ax.set_xlabel("Predicted stock price % change (10 days ahead)")
+    ax.set_ylabel("Actual stock price % change (10 days ahead)")
+    ax.legend()
+
+
+def _importance_figure(fig, diagnostics):
+    ax = fig.add_subplot()
+    names = diagnostics["importances"]["features"]
+    values = diagnostics["importances"]["values"]
+    ax.bar(range(len(values)), values)
+    ax.set_xticks(range(len(values)))
+    ax.set_xticklabels(names, rotation=45, ha="right")
+    ax.set_ylabel("Importance (ΔR²)")
+    fig.tight_layout()
+
+
+def render_plot(diagnostics: dict, kind: str) -> bytes:
+    """Return ``kind`` (one of ``PLOT_KINDS``) rendered as PNG bytes."""
+    if kind not in PLOT_KINDS:
+        raise ValueError(f"Unknown plot: {kind}")
+    # The object-oriented API avoids pyplot's global state, so renders are
+    # safe from request threads; matplotlib is only imported when needed.
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    if kind == "prediction":
+        _prediction_figure(fig, diagnostics)
+    else:
+        _importance_figure(fig, diagnostics)
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+class PlotStore:
+    """Rendered PNGs of prediction runs, drawn from their diagnostics.
+
+    ``loader(run_id)`` returns a run's diagnostics, or ``None`` once the run
+    is gone.  The store only keeps an LRU of rendered images, so a plot is
+    available exactly as long as its run's diagnostics are.  Each image is
+    rendered at most once while it stays in the LRU.
+    """
+
+    def __init__(self, loader, max_entries: int = 32):
+        self._loader = loader
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._images = OrderedDict()
+
+    def __contains__(self, run_id: str) -> bool:
+        return self._loader(run_id) is not None
+
+    def diagnostics(self, run_id: str) -> dict:
+        """Raw arrays for ``run_id``; raises ``KeyError`` if unknown."""
+        diagnostics = self._loader(run_id)
+        if diagnostics is None:
+            raise KeyError(run_id)
+        return diagnostics
+
+    def png(self, run_id: str, kind: str) -> bytes:
+        """Rendered ``kind`` plot for ``run_id``; raises ``KeyError`` if unknown."""
+        diagnostics = self.diagnostics(run_id)
+        with self._lock:
+            cached = self._images.get((run_id, kind))
+            if cached is not None:
+                self._images.move_to_end((run_id, kind))
+                return cached
+        with stage("render_plot"):
+            image = render_plot(diagnostics, kind)
+        with self._lock:
+            self._images[(run_id, kind)] = image
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+        return image
@@ -0,0 +1,173 @@
+"""After-close precomputation of every model's prediction.
+
+Daily prices only change once per trading day, so :class:`AfterCloseScheduler`
+runs a job shortly after the market closes (ingest, then train every model
+for every watched symbol) and :class:`SnapshotStore` keeps the results on
+local disk.  Request handlers look results up in the snapshot before
+training on demand; an entry is only used while it was computed on the
+same dataset version and model configuration as the request.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta, timezone
+from threading import Lock
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def parse_time(value: str) -> time:
+    """``"HH:MM"`` as a UTC :class:`datetime.time`."""
+    hours, minutes = value.split(":")
+    return time(int(hours), int(minutes), tzinfo=timezone.utc)
+
+
+class SnapshotStore:
+    """Per-symbol JSON snapshots of model results under ``root``.
+
+    Each model entry holds its result, its diagnostics (so plots can be
+    drawn in any worker) and ``key``, the hash of the prediction cache key
+    it was computed under.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = Lock()
+        self._loaded = {}
+
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.root, f"{symbol}.json")
+
+    def load(self, symbol: str):
+        """The snapshot dict for ``symbol``, or ``None``; re-read only when the file changes."""
+        path = self._path(symbol)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._loaded.get(symbol)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        try:
+            with open(path) as fh:
+                snapshot = json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        with self._lock:
+            self._loaded[symbol] = (mtime, snapshot)
+        return snapshot
+
+    def get(self, symbol: str, model: str, key: str):
+        """``(result, diagnostics)`` when the stored entry matches ``key``, else ``None``."""
+        snapshot = self.load(symbol)
+        entry = (snapshot or {}).get("models", {}).get(model)
+        if entry is None or entry["key"] != key:
+            return None
+        return dict(entry["result"]), entry.get("diagnostics")
+
+    def find_diagnostics(self, symbols, run_id: str):
+        """Diagnostics stored for ``run_id`` in the snapshots of ``symbols``, or ``None``."""
+        for symbol in symbols:
+            for entry in ((self.load(symbol) or {}).get("models") or {}).values():
+                if entry["result"].get("run_id") == run_id:
+                    return entry.get("diagnostics")
+        return None
+
+    def save(self, symbol: str, models: dict) -> dict:
+        """Atomically replace ``symbol``'s snapshot with ``models``."""
+        snapshot = {
+            "symbol": symbol,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "models": models,
+        }
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(snapshot, fh)
+        os.replace(tmp, self._path(symbol))
+        return snapshot
+
+    @contextmanager
+    def exclusive(self):
+        """Yield whether this process won the host-wide precompute lock."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, ".lock"), "w") as fh:
+            if fcntl is None:
+                yield True
+                return
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+class AfterCloseScheduler:
+    """Run the coroutine function ``job`` at ``at`` (UTC) on trading weekdays."""
+
+    def __init__(self, job, at: time, weekdays=range(5)):
+        self._job = job
+        self.at = at
+        self.weekdays = set(weekdays)
+        self._task = None
+        self._running = None
+        self.last_run = None
+
+    @property
+    def running(self) -> bool:
+        return self._running is not None and not self._running.done()
+
+    def next_run(self, now: datetime) -> datetime:
+        """The first scheduled time strictly after ``now``."""
+        candidate = datetime.combine(now.date(), self.at)
+        while candidate <= now or candidate.weekday() not in self.weekdays:
+            candidate = datetime.combine(candidate.date() + timedelta(days=1), self.at)
+        return candidate
+
+    def trigger(self):
+        """Start the job now unless it is already running; returns its task."""
+        if not self.running:
+            self._running = asyncio.get_running_loop().create_task(self._run_job())
+        return self._running
+
+    async def _run_job(self):
+        started = datetime.now(timezone.utc)
+        try:
+            await self._job()
+        except Exception:
+            logger.exception("Scheduled precompute failed")
+        finally:
+            self.last_run = {
+                "started_at": started.isoformat(),
+                "seconds": (datetime.now(timezone.utc) - started).total_seconds(),
+            }
+
+    async def _loop(self):
+        while True:
+            now = datetime.now(timezone.utc)
+            await asyncio.sleep((self.next_run(now) - now).total_seconds())
+            await self.trigger()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    def stop(self):
+        for task in (self._task, self._running):
+            if task is not None:
+                task.cancel()
+        self._task = None
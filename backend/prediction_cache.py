@@ -0,0 +1,105 @@
+"""Single-flight cache for model results keyed by dataset version."""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+
+from symbols import symbol_of
+
+
+def config_hash(config) -> str:
+    """Stable short hash of a JSON-serialisable model configuration."""
+    payload = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+
+def cache_key(model_name: str, df, config) -> tuple:
+    """Key identifying one model run on one version of one symbol's prices."""
+    last_ts = df["timestamp"].iloc[-1] if "timestamp" in df and len(df) else None
+    return (model_name, symbol_of(df), last_ts, len(df), config_hash(config))
+
+
+class PredictionCache:
+    """LRU cache whose misses are coalesced into a single computation.
+
+    Concurrent callers asking for the same key while it is being computed
+    wait on the first caller's result instead of training again.  Failed
+    computations are not cached.
+    """
+
+    COUNTERS = ("hits", "misses", "coalesced")
+
+    def __init__(self, max_entries: int = 32, ttl_seconds: float = 0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = Lock()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or time.monotonic() < expires:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return dict(value)
+                del self._entries[key]
+
+            future = self._inflight.get(key)
+            owner = future is None
+            self.counters["misses" if owner else "coalesced"] += 1
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            return dict(future.result())
+
+        try:
+            value = compute()
+        except BaseException as exc:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(exc)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._store(key, value)
+        future.set_result(value)
+        return dict(value)
+
+    def find(self, predicate):
+        """A live cached value for which ``predicate(value)`` holds, or ``None``.
+
+        The value itself is returned, not a copy; callers must not modify it.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for value, expires in reversed(self._entries.values()):
+                if (expires is None or now < expires) and predicate(value):
+                    return value
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counters, "entries": len(self._entries), "inflight": len(self._inflight)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key, value):
+        if self.max_entries <= 0:
+            return
+        expires = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -1,22 +1,22 @@
+import base64
 import os
+import time
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
-from supabase import create_client
+import pandas as pd
 
-load_dotenv()
+import db
+from symbols import DEFAULT_SYMBOL
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise RuntimeError("Supabase credentials are missing.")
-
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 TABLE_NAME = "prediction_histories"
+UPSERT_BATCH_SIZE = int(os.getenv("PREDICTION_UPSERT_BATCH_SIZE", "500"))
+PAGE_SIZE = 1000
+SCORED_COLUMNS = (
+    "id,symbol,model_type,prediction,predicted_price,base_price,actual_price,10_days_later_date"
+)
 
 
-def insert_predictions(results: dict, latest_close: float) -> None:
+def insert_predictions(results: dict, latest_close: float, symbol: str = DEFAULT_SYMBOL) -> None:
     """Insert prediction records for each model."""
     today = datetime.utcnow().date()
     later = today + timedelta(days=10)
@@ -29,59 +29,254 @@ def insert_predictions(results: dict, latest_close: float) -> None:
         rows.append(
             {
                 "date_of_prediction": today.isoformat(),
+                "symbol": symbol,
                 "model_type": model,
                 "prediction": pct,
                 "predicted_price": predicted_price,
+                # The close the prediction starts from, for hit scoring.
+                "base_price": float(latest_close),
                 "10_days_later_date": later.isoformat(),
             }
         )
     if rows:
-        supabase.table(TABLE_NAME).insert(rows).execute()
+        db.execute(
+            db.get_client().table(TABLE_NAME).insert(rows),
+            "prediction_histories.insert",
+            retry=False,
+        )
+
+
+def _apply_closes(rows: list, closes: pd.DataFrame) -> pd.DataFrame:
+    """Join pending ``rows`` to ``closes`` and compute actuals in one pass.
+
+    ``closes`` has ``symbol``, ``date`` and ``close`` columns.  Rows without a
+    matching close are dropped.
+    """
+    pending = pd.DataFrame(rows)
+    pending["symbol"] = pending.get("symbol", DEFAULT_SYMBOL)
+    pending["symbol"] = pending["symbol"].fillna(DEFAULT_SYMBOL)
+    pending["date"] = pending["10_days_later_date"].astype(str).str[:10]
+    merged = pending.merge(closes, on=["symbol", "date"], how="inner")
+    merged["actual_price"] = merged["close"].astype(float)
+    merged["difference"] = merged["actual_price"] - merged["predicted_price"].astype(float)
+    return merged.drop(columns=["date", "close"])
+
+
+def _upsert(frame: pd.DataFrame, columns) -> int:
+    """Write ``frame`` back by primary key in batches of ``UPSERT_BATCH_SIZE``.
+
+    Whole rows are sent so the upsert never trips NOT NULL constraints.
+    """
+    frame = frame[list(dict.fromkeys(columns))].astype(object)
+    records = frame.where(frame.notna(), None).to_dict(orient="records")
+    for start in range(0, len(records), UPSERT_BATCH_SIZE):
+        batch = records[start:start + UPSERT_BATCH_SIZE]
+        db.execute(
+            db.get_client().table(TABLE_NAME).upsert(batch, on_conflict="id"),
+            "prediction_histories.upsert",
+        )
+    return len(records)
+
+
+def _pending_rows(query) -> list:
+    return db.execute(query, "prediction_histories.pending").data or []
 
 
-def update_with_actual(date: str, close_price: float) -> None:
+def _pending():
+    return db.get_client().table(TABLE_NAME).select("*").is_("actual_price", None)
+
+
+def update_with_actual(
+    date: str, close_price: float, symbol: str = DEFAULT_SYMBOL, on_resolved=None
+) -> int:
     """Update rows whose 10 day date matches provided date with actual price."""
-    resp = (
-        supabase.table(TABLE_NAME)
-        .select("id,predicted_price")
-        .eq("10_days_later_date", date)
-        .is_("actual_price", None)
-        .execute()
+    rows = _pending_rows(_pending().eq("10_days_later_date", date).eq("symbol", symbol))
+    if not rows:
+        return 0
+    closes = pd.DataFrame({"symbol": [symbol], "date": [date[:10]], "close": [close_price]})
+    updated = _apply_closes(rows, closes)
+    count = _upsert(updated, [*rows[0].keys(), "actual_price", "difference"])
+    if on_resolved is not None:
+        on_resolved(updated.to_dict(orient="records"))
+    return count
+
+
+def _closes_from_cache(wanted: pd.DataFrame, price_lookup) -> pd.DataFrame:
+    frames = []
+    for symbol in wanted["symbol"].unique():
+        try:
+            prices = price_lookup(symbol)
+        except ValueError:
+            continue
+        frames.append(
+            pd.DataFrame(
+                {
+                    "symbol": symbol,
+                    "date": prices["timestamp"].astype(str).str[:10],
+                    "close": prices["close"].to_numpy(),
+                }
+            )
+        )
+    if not frames:
+        return pd.DataFrame(columns=["symbol", "date", "close"])
+    return wanted.merge(pd.concat(frames, ignore_index=True), on=["symbol", "date"])
+
+
+def _closes_from_database(wanted: pd.DataFrame) -> pd.DataFrame:
+    """Fetch every needed close with a single ``in_()`` query."""
+    resp = db.execute(
+        db.get_client().table("stock_prices")
+        .select("symbol,timestamp,close")
+        .in_("symbol", sorted(wanted["symbol"].unique()))
+        .in_("timestamp", sorted(wanted["date"].unique())),
+        "stock_prices.closes",
     )
-    for row in resp.data or []:
-        diff = close_price - float(row["predicted_price"])
-        supabase.table(TABLE_NAME).update(
-            {"actual_price": close_price, "difference": diff}
-        ).eq("id", row["id"]).execute()
+    found = pd.DataFrame(resp.data or [], columns=["symbol", "timestamp", "close"])
+    found["date"] = found["timestamp"].astype(str).str[:10]
+    # The two ``in_`` filters select a cross product; keep only wanted pairs.
+    return wanted.merge(found[["symbol", "date", "close"]], on=["symbol", "date"])
+
+
+def refresh_missing_actuals(price_lookup=None, on_resolved=None) -> dict:
+    """Populate actual price/difference for past predictions.
+
+    Closes come from ``price_lookup(symbol)`` (a price frame, e.g. the API's
+    cache) where possible; any still missing are fetched in one query.
+    ``on_resolved`` receives the rows that were written.  Returns the number
+    of rows updated plus row counts and timings per phase.
+    """
+    report = {"updated": 0, "phases": {}}
 
+    def phase(name, rows, started):
+        report["phases"][name] = {
+            "rows": int(rows),
+            "seconds": round(time.perf_counter() - started, 4),
+        }
 
-def refresh_missing_actuals() -> int:
-    """Populate actual price/difference for past predictions."""
+    started = time.perf_counter()
     today = datetime.utcnow().date().isoformat()
-    resp = (
-        supabase.table(TABLE_NAME)
-        .select("id,predicted_price,10_days_later_date")
-        .is_("actual_price", None)
-        .lte("10_days_later_date", today)
-        .execute()
-    )
+    rows = _pending_rows(_pending().lte("10_days_later_date", today))
+    phase("pending", len(rows), started)
+    if not rows:
+        return report
+
+    started = time.perf_counter()
+    wanted = pd.DataFrame(rows)
+    wanted = pd.DataFrame(
+        {
+            "symbol": wanted.get("symbol", DEFAULT_SYMBOL),
+            "date": wanted["10_days_later_date"].astype(str).str[:10],
+        }
+    ).fillna({"symbol": DEFAULT_SYMBOL}).drop_duplicates()
+    closes = pd.DataFrame(columns=["symbol", "date", "close"])
+    if price_lookup is not None:
+        closes = _closes_from_cache(wanted, price_lookup)
+    missing = wanted.merge(closes[["symbol", "date"]], how="left", indicator=True)
+    missing = missing[missing["_merge"] == "left_only"].drop(columns="_merge")
+    if not missing.empty:
+        closes = pd.concat([closes, _closes_from_database(missing)], ignore_index=True)
+    phase("closes", len(closes), started)
+
+    started = time.perf_counter()
+    updated = _apply_closes(rows, closes)
+    phase("compute", len(updated), started)
+
+    started = time.perf_counter()
+    report["updated"] = _upsert(updated, [*rows[0].keys(), "actual_price", "difference"])
+    phase("write", report["updated"], started)
+    if on_resolved is not None:
+        on_resolved(updated.to_dict(orient="records"))
+    return report
+
+
+def encode_cursor(row: dict) -> str:
+    raw = f"{row['date_of_prediction']}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
 
-    updated = 0
-    for row in resp.data or []:
-        date = row["10_days_later_date"]
-        price_resp = (
-            supabase.table("stock_prices")
-            .select("close")
-            .eq("timestamp", date)
-            .maybe_single()
-            .execute()
+
+def decode_cursor(cursor: str):
+    """Return ``(date_of_prediction, id)`` or raise ``ValueError``."""
+    try:
+        date, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(date).date().isoformat(), int(row_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def _history_query(
+    client,
+    limit: int,
+    cursor: str = None,
+    model_type: str = None,
+    start: str = None,
+    end: str = None,
+    symbol: str = None,
+):
+    query = client.table(TABLE_NAME).select("*")
+    if model_type:
+        query = query.eq("model_type", model_type)
+    if symbol:
+        query = query.eq("symbol", symbol)
+    if start:
+        query = query.gte("date_of_prediction", start)
+    if end:
+        query = query.lte("date_of_prediction", end)
+    if cursor:
+        date, row_id = decode_cursor(cursor)
+        query = query.or_(
+            f"date_of_prediction.lt.{date},"
+            f"and(date_of_prediction.eq.{date},id.lt.{row_id})"
         )
-        if price_resp.data:
-            close_price = float(price_resp.data["close"])
-            diff = close_price - float(row["predicted_price"])
-            supabase.table(TABLE_NAME).update(
-                {"actual_price": close_price, "difference": diff}
-            ).eq("id", row["id"]).execute()
-            updated += 1
-
-    return updated
+    return query.order("date_of_prediction", desc=True).order("id", desc=True).limit(limit + 1)
+
+
+def _history_page(rows: list, limit: int) -> dict:
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1]) if len(rows) > limit else None
+    return {"items": page, "next_cursor": next_cursor}
+
+
+def fetch_history_page(limit: int = 50, **filters) -> dict:
+    """One page of predictions, newest first, using keyset pagination.
+
+    Rows are ordered by ``(date_of_prediction, id)`` descending and the
+    cursor holds the last row's pair, so each page is an index range scan no
+    matter how deep the client pages.  ``filters`` are ``cursor``,
+    ``model_type``, ``start``, ``end`` and ``symbol``.
+    """
+    query = _history_query(db.get_client(), limit, **filters)
+    return _history_page(db.execute(query, "prediction_histories.page").data or [], limit)
+
+
+async def afetch_history_page(limit: int = 50, **filters) -> dict:
+    """Async variant of :func:`fetch_history_page`."""
+    query = _history_query(await db.get_async_client(), limit, **filters)
+    resp = await db.aexecute(query, "prediction_histories.page")
+    return _history_page(resp.data or [], limit)
+
+
+def resolved_count() -> int:
+    """Number of predictions with an actual price (the summary's data version)."""
+    resp = db.execute(
+        db.get_client().table(TABLE_NAME)
+        .select("id", count="exact", head=True)
+        .not_.is_("actual_price", "null"),
+        "prediction_histories.resolved_count",
+    )
+    return resp.count or 0
+
+
+def resolved_rows() -> list:
+    """Every prediction with an actual price, paged by id (summary seed)."""
+    rows = []
+    last_id = None
+    while True:
+        query = db.get_client().table(TABLE_NAME).select(SCORED_COLUMNS)
+        query = query.not_.is_("actual_price", "null")
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = db.execute(query.order("id").limit(PAGE_SIZE), "prediction_histories.resolved").data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        last_id = page[-1]["id"]
@@ -0,0 +1,129 @@
+"""On-disk columnar copy of the price history shared by local workers.
+
+Each snapshot is a directory of ``.npy`` files (one per column) plus a small
+JSON manifest pointing at the current snapshot.  Text columns are stored as
+fixed-width strings; their missing values are written as ``""`` and
+restored as missing from a ``<column>.nulls.npy`` mask listed under
+``nulls`` in the manifest.  Readers memory-map the
+columns, so several worker processes on one host share the OS page cache
+instead of each paging the table out of Supabase.  Writers publish a new
+snapshot and atomically swap the manifest; Supabase stays the source of
+truth.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+MANIFEST = "manifest.json"
+
+
+class LocalPriceStore:
+    """Read and publish price snapshots under ``root``."""
+
+    def __init__(self, root: str):
+        # Created by the first save, so stores that never load anything
+        # leave nothing behind.
+        self.root = root
+
+    @classmethod
+    def for_symbol(cls, root: str, symbol: str):
+        """Store for one ticker in its own subdirectory of ``root``."""
+        path = os.path.join(root, symbol)
+        if symbol.startswith(".") or os.path.dirname(os.path.normpath(path)) != os.path.normpath(root):
+            raise ValueError(f"Invalid symbol: {symbol}")
+        return cls(path)
+
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.root, ".lock"), "w") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def manifest(self):
+        """Return the current manifest dict, or ``None`` if nothing is stored."""
+        try:
+            with open(os.path.join(self.root, MANIFEST)) as fh:
+                return json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def load(self):
+        """Return ``(df, manifest)`` for the current snapshot or ``(None, None)``."""
+        manifest = self.manifest()
+        if manifest is None:
+            return None, None
+        snapshot = os.path.join(self.root, manifest["snapshot"])
+        try:
+            columns = {
+                name: np.load(os.path.join(snapshot, f"{name}.npy"), mmap_mode="r")
+                for name in manifest["columns"]
+            }
+            for name in manifest.get("nulls", []):
+                mask = np.load(os.path.join(snapshot, f"{name}.nulls.npy"))
+                values = columns[name].astype(object)
+                values[mask] = None
+                columns[name] = values
+        except FileNotFoundError:
+            # Snapshot was replaced between reading the manifest and the files.
+            return None, None
+        return pd.DataFrame(columns, copy=False), manifest
+
+    def save(self, df: pd.DataFrame, full_sync: bool = False) -> dict:
+        """Publish ``df`` as the new snapshot and return its manifest."""
+        os.makedirs(self.root, exist_ok=True)
+        with self._locked():
+            previous = self.manifest() or {}
+            version = previous.get("version", 0) + 1
+            snapshot = f"v{version:06d}"
+            tmp_dir = tempfile.mkdtemp(dir=self.root, prefix=".tmp-")
+            nulls = []
+            for name in df.columns:
+                values = df[name].to_numpy()
+                if values.dtype == object:
+                    missing = pd.isna(values)
+                    values = np.where(missing, "", values).astype(str)
+                    if missing.any():
+                        np.save(os.path.join(tmp_dir, f"{name}.nulls.npy"), missing)
+                        nulls.append(name)
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), values, allow_pickle=False)
+            os.replace(tmp_dir, os.path.join(self.root, snapshot))
+
+            now = datetime.utcnow().isoformat()
+            manifest = {
+                "version": version,
+                "snapshot": snapshot,
+                "columns": list(df.columns),
+                "nulls": nulls,
+                "rows": int(len(df)),
+                "last_timestamp": str(df["timestamp"].iloc[-1]) if len(df) else None,
+                "synced_at": now,
+                "full_synced_at": now if full_sync else previous.get("full_synced_at"),
+            }
+            fd, tmp_manifest = tempfile.mkstemp(dir=self.root, prefix=".manifest-")
+            with os.fdopen(fd, "w") as fh:
+                json.dump(manifest, fh)
+            os.replace(tmp_manifest, os.path.join(self.root, MANIFEST))
+
+            # Keep the previous snapshot for readers that still map it.
+            keep = {snapshot, previous.get("snapshot")}
+            for entry in os.listdir(self.root):
+                if entry.startswith("v") and entry not in keep:
+                    shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
+            return manifest
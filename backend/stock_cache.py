@@ -0,0 +1,386 @@
+"""In-memory cache of the ``stock_prices`` table with incremental refresh.
+
+After the first full download only rows newer than the cached maximum
+timestamp are requested when the TTL lapses, in the background while the
+expired frame keeps being served.  A periodic full reconciliation
+picks up edits and deletes that a delta sync cannot see.  Each symbol has its
+own cache; :class:`SymbolPriceCache` keeps the recently used ones within a
+memory budget.
+"""
+
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from threading import Lock, Thread
+
+import pandas as pd
+
+import db
+from tracing import stage
+
+TABLE_NAME = "stock_prices"
+PAGE_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_stock_prices(client, symbol=None, after=None) -> pd.DataFrame:
+    """Page through ``stock_prices`` in timestamp order.
+
+    ``symbol`` restricts the rows to one ticker.  With ``after`` only rows
+    whose timestamp is strictly greater are fetched.  Returns an empty frame
+    when there are no matching rows.
+    """
+    start = 0
+    frames = []
+    while True:
+        end = start + PAGE_SIZE - 1
+        query = client.table(TABLE_NAME).select("*")
+        if symbol is not None:
+            query = query.eq("symbol", symbol)
+        if after is not None:
+            query = query.gt("timestamp", after)
+        with stage("supabase_paging"):
+            response = db.execute(query.order("timestamp").range(start, end), "stock_prices.page")
+        rows = response.data or []
+        if not rows:
+            break
+        frames.append(pd.DataFrame(rows))
+        if len(rows) < PAGE_SIZE:
+            break
+        start += PAGE_SIZE
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def existing_timestamps(client, symbol: str, start: str, end: str) -> set:
+    """Dates (``YYYY-MM-DD``) of ``symbol``'s stored rows from ``start`` to ``end``.
+
+    The price loaders use it to skip rows that are already stored.
+    """
+    found = set()
+    offset = 0
+    while True:
+        response = db.execute(
+            client.table(TABLE_NAME)
+            .select("timestamp")
+            .eq("symbol", symbol)
+            .gte("timestamp", start)
+            .lte("timestamp", end)
+            # Offset paging needs a stable order or rows repeat and go missing.
+            .order("timestamp")
+            .range(offset, offset + PAGE_SIZE - 1),
+            "stock_prices.existing",
+        )
+        rows = response.data or []
+        found.update(row["timestamp"][:10] for row in rows)
+        if len(rows) < PAGE_SIZE:
+            return found
+        offset += PAGE_SIZE
+
+
+def freeze(df: pd.DataFrame) -> pd.DataFrame:
+    """Rebuild ``df`` on read-only views of its column arrays (no copy)."""
+    columns = {}
+    for name in df.columns:
+        values = df[name].to_numpy().view()
+        values.flags.writeable = False
+        columns[name] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+class StockPriceCache:
+    """TTL cache of the price history that refreshes with delta syncs.
+
+    Once loaded, an expired cache keeps serving the current frame while a
+    single background thread refreshes it (stale-while-revalidate); only a
+    cold or forced read waits, and concurrent waiters share one fetch.
+    Readers get shallow copies of a frame whose arrays are read-only, so a
+    hit copies no data and nobody can modify the cached prices.
+
+    With a :class:`price_store.LocalPriceStore` the cache reads through the
+    local snapshot first, so a fresh process starts warm and only asks
+    Supabase for rows newer than the snapshot.  Updates are published back to
+    the store for the other workers on the host.
+    """
+
+    COUNTERS = ("hits", "stale_hits", "misses", "refreshes", "refresh_errors")
+
+    def __init__(
+        self,
+        client=None,
+        ttl_seconds: int = 60,
+        full_sync_seconds: int = 86400,
+        store=None,
+        symbol=None,
+    ):
+        self._client = client
+        self.symbol = symbol
+        self.nbytes = 0
+        self.ttl_seconds = ttl_seconds
+        self.full_sync_seconds = full_sync_seconds
+        self._store = store
+        self._store_version = None
+        self._lock = Lock()
+        self._df = None
+        self._expires = datetime.min
+        self._next_full_sync = datetime.min
+        self._refresh = None
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+
+    @property
+    def client(self):
+        # Resolved on first fetch so building the cache never opens a client.
+        return self._client if self._client is not None else db.get_client()
+
+    def get(self, force_refresh: bool = False, block: bool = True):
+        """Return the price frame.
+
+        Expired data is returned immediately while a background refresh runs.
+        A cold cache (or ``force_refresh``) waits for the refresh, unless
+        ``block`` is false, in which case ``None`` is returned instead.
+        """
+        with self._lock:
+            df = self._df
+            if df is not None and not force_refresh:
+                if datetime.utcnow() < self._expires:
+                    self.counters["hits"] += 1
+                else:
+                    self.counters["stale_hits"] += 1
+                    if self._refresh is None:
+                        self._refresh = Future()
+                        Thread(
+                            target=self._run_refresh,
+                            args=(self._refresh,),
+                            name=f"price-refresh-{self.symbol}",
+                            daemon=True,
+                        ).start()
+                return df.copy(deep=False)
+            if not block:
+                return None
+            self.counters["misses"] += 1
+            future = self._refresh
+            owner = future is None
+            if owner:
+                future = self._refresh = Future()
+
+        if owner:
+            self._run_refresh(future)
+        return future.result().copy(deep=False)
+
+    def peek(self):
+        """The cached frame, possibly stale, or ``None`` if cold; never blocks."""
+        return self.get(block=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counters, "nbytes": self.nbytes, "refreshing": self._refresh is not None}
+
+    def _run_refresh(self, future: Future):
+        try:
+            df = self._fetch()
+        except Exception as exc:
+            with self._lock:
+                self._refresh = None
+                self.counters["refresh_errors"] += 1
+                # Keep serving what we have; try again after another TTL.
+                self._expires = datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+            if self._df is not None:
+                logger.warning("Background price refresh for %s failed: %s", self.symbol, exc)
+            future.set_exception(exc)
+            return
+        with self._lock:
+            self._refresh = None
+            self.counters["refreshes"] += 1
+        future.set_result(df)
+
+    def _fetch(self) -> pd.DataFrame:
+        now = datetime.utcnow()
+        with self._lock:
+            df = self._df
+            next_full_sync = self._next_full_sync
+
+        if self._store is not None:
+            df, next_full_sync = self._read_store(df, next_full_sync)
+
+        full = df is None or now >= next_full_sync
+        changed = full
+        if full:
+            df = fetch_stock_prices(self.client, self.symbol)
+            if df.empty:
+                raise ValueError("No data available")
+            next_full_sync = now + timedelta(seconds=self.full_sync_seconds)
+        else:
+            new_rows = fetch_stock_prices(
+                self.client, self.symbol, after=df["timestamp"].iloc[-1]
+            )
+            if not new_rows.empty:
+                df = pd.concat([df, new_rows], ignore_index=True)
+                changed = True
+
+        if self._store is not None and changed:
+            df = self._publish(df, full_sync=full)
+
+        df = freeze(df)
+        nbytes = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            self._df = df
+            self.nbytes = nbytes
+            self._expires = now + timedelta(seconds=self.ttl_seconds)
+            self._next_full_sync = next_full_sync
+        return df
+
+    def merge_rows(self, rows: pd.DataFrame) -> int:
+        """Merge rows just written to Supabase into the cached frame in place.
+
+        Saves the round trip a refresh would make.  Does nothing until the
+        cache has been loaded.  Returns the number of rows merged.
+        """
+        with self._lock:
+            df = self._df
+            if df is None or rows.empty:
+                return 0
+            merged = freeze(
+                pd.concat([df, rows], ignore_index=True)
+                .drop_duplicates("timestamp", keep="last")
+                .sort_values("timestamp", kind="stable", ignore_index=True)
+            )
+            added = len(merged) - len(df)
+            self._df = merged
+            self.nbytes = int(merged.memory_usage(deep=True).sum())
+        if self._store is not None:
+            published = freeze(self._publish(merged))
+            with self._lock:
+                if self._df is merged:
+                    self._df = published
+                    self.nbytes = int(published.memory_usage(deep=True).sum())
+        return added
+
+    def _publish(self, df: pd.DataFrame, full_sync: bool = False) -> pd.DataFrame:
+        """Save ``df`` to the local store and return the mapped snapshot.
+
+        Serving the snapshot rather than ``df`` keeps this process on the
+        pages it shares with the other workers instead of a private copy.
+        If the snapshot cannot be read back, ``df`` is served and the next
+        refresh adopts the snapshot.
+        """
+        self._store.save(df, full_sync=full_sync)
+        stored, manifest = self._store.load()
+        if stored is None or len(stored) < len(df):
+            return df
+        self._store_version = manifest["version"]
+        return stored
+
+    def _read_store(self, df, next_full_sync):
+        """Adopt the local snapshot if another process published a newer one."""
+        manifest = self._store.manifest()
+        if manifest is None or manifest["version"] == self._store_version:
+            return df, next_full_sync
+        stored, manifest = self._store.load()
+        if stored is None or stored.empty or (df is not None and len(stored) < len(df)):
+            return df, next_full_sync
+        self._store_version = manifest["version"]
+        if manifest.get("full_synced_at"):
+            next_full_sync = datetime.fromisoformat(manifest["full_synced_at"]) + timedelta(
+                seconds=self.full_sync_seconds
+            )
+        return stored, next_full_sync
+
+
+class SymbolPriceCache:
+    """Per-symbol price caches evicted least-recently-used past ``max_bytes``.
+
+    The most recently used symbol is always kept, even if it alone exceeds
+    the budget.  Without ``client`` the caches use ``db.get_client()``,
+    created on the first fetch.
+    """
+
+    def __init__(self, client=None, *, max_bytes: int, store_factory=None, **cache_kwargs):
+        self._client = client
+        self.max_bytes = max_bytes
+        self._store_factory = store_factory
+        self._cache_kwargs = cache_kwargs
+        self._caches = OrderedDict()
+        self._lock = Lock()
+        self.evictions = 0
+
+    def _cache_for(self, symbol: str) -> StockPriceCache:
+        with self._lock:
+            cache = self._caches.get(symbol)
+            if cache is None:
+                store = self._store_factory(symbol) if self._store_factory else None
+                cache = StockPriceCache(
+                    self._client, store=store, symbol=symbol, **self._cache_kwargs
+                )
+                self._caches[symbol] = cache
+            self._caches.move_to_end(symbol)
+            return cache
+
+    def get(self, symbol: str, force_refresh: bool = False) -> pd.DataFrame:
+        cache = self._cache_for(symbol)
+        try:
+            df = cache.get(force_refresh=force_refresh)
+        except Exception:
+            # A symbol that never loaded (no rows, Supabase down) must not
+            # linger: its empty entry would never be evicted.
+            if cache.peek() is None:
+                with self._lock:
+                    if self._caches.get(symbol) is cache:
+                        del self._caches[symbol]
+            raise
+        self._evict()
+        return df
+
+    def peek(self, symbol: str):
+        with self._lock:
+            cache = self._caches.get(symbol)
+        return cache.peek() if cache is not None else None
+
+    def merge_rows(self, rows) -> dict:
+        """Merge inserted ``stock_prices`` rows into the already cached symbols.
+
+        Returns ``{symbol: rows merged}``; uncached symbols load lazily later.
+        """
+        frame = pd.DataFrame(rows)
+        if frame.empty:
+            return {}
+        with self._lock:
+            caches = dict(self._caches)
+        merged = {}
+        for symbol, group in frame.groupby("symbol"):
+            cache = caches.get(symbol)
+            if cache is not None:
+                merged[symbol] = cache.merge_rows(group.reset_index(drop=True))
+        self._evict()
+        return merged
+
+    def symbols(self):
+        with self._lock:
+            return list(self._caches)
+
+    def stats(self) -> dict:
+        """Counters summed over the cached symbols, plus each symbol's own."""
+        with self._lock:
+            caches = dict(self._caches)
+            evictions = self.evictions
+        per_symbol = {symbol: cache.stats() for symbol, cache in caches.items()}
+        totals = {
+            key: sum(stats[key] for stats in per_symbol.values())
+            for key in (*StockPriceCache.COUNTERS, "nbytes")
+        }
+        return {**totals, "evictions": evictions, "symbols": per_symbol}
+
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(cache.nbytes for cache in self._caches.values())
+
+    def _evict(self):
+        with self._lock:
+            total = sum(cache.nbytes for cache in self._caches.values())
+            while total > self.max_bytes and len(self._caches) > 1:
+                _, evicted = self._caches.popitem(last=False)
+                total -= evicted.nbytes
+                self.evictions += 1
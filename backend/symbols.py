@@ -0,0 +1,43 @@
+"""Ticker symbol configuration shared by the API, models and ingestion."""
+
+import os
+import re
+
+DEFAULT_SYMBOL = os.getenv("DEFAULT_SYMBOL", "AAPL").upper()
+
+# Tickers ingested by ``fetch_and_upload`` when no explicit list is given.
+WATCHLIST = [
+    s.strip().upper()
+    for s in os.getenv("STOCK_SYMBOLS", DEFAULT_SYMBOL).split(",")
+    if s.strip()
+]
+
+# Symbols the API serves prices for.  Anything else is rejected before it
+# reaches the per-symbol price caches and their directories on disk.
+KNOWN_SYMBOLS = frozenset(WATCHLIST) | {DEFAULT_SYMBOL}
+
+# The first character may not be punctuation, so ``.`` and ``..`` never pass.
+_SYMBOL_RE = re.compile(r"^[A-Z0-9^][A-Z0-9.\-^=]{0,14}$")
+
+
+def normalize_symbol(symbol) -> str:
+    """Return ``symbol`` upper-cased, or raise ``ValueError`` if malformed."""
+    symbol = (symbol or DEFAULT_SYMBOL).strip().upper()
+    if not _SYMBOL_RE.match(symbol):
+        raise ValueError(f"Invalid symbol: {symbol}")
+    return symbol
+
+
+def known_symbol(symbol) -> str:
+    """Like :func:`normalize_symbol`, but also reject symbols not in ``KNOWN_SYMBOLS``."""
+    symbol = normalize_symbol(symbol)
+    if symbol not in KNOWN_SYMBOLS:
+        raise ValueError(f"Unknown symbol: {symbol}")
+    return symbol
+
+
+def symbol_of(df) -> str:
+    """Symbol of a price frame; frames without a ``symbol`` column are the default."""
+    if "symbol" in df and len(df):
+        return str(df["symbol"].iloc[-1])
+    return DEFAULT_SYMBOL
@@ -0,0 +1,157 @@
+"""Lightweight stage timing with Prometheus-format export.
+
+Code paths wrap their phases in :func:`stage`.  Inside a :func:`collect`
+block (a model training in a pool worker, say) the timings are gathered
+into a list that travels back with the result; the receiving side then
+feeds them into the histograms with :func:`observe`.  Outside such a block
+they go straight into the histograms of this process.
+"""
+
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, math.inf)
+
+_collector = ContextVar("stage_collector", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a label tuple."""
+
+    def __init__(self, name: str, help_text: str, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        self._lock = Lock()
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.setdefault(
+                key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def series(self) -> dict:
+        with self._lock:
+            return {
+                key: {"counts": list(s["counts"]), "sum": s["sum"], "count": s["count"]}
+                for key, s in self._series.items()
+            }
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.series().items()):
+            labels = list(zip(self.label_names, key))
+            for bound, count in zip(self.buckets, series["counts"]):
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                lines.append(f"{self.name}_bucket{format_labels(labels + [('le', le)])} {count}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {series['sum']}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {series['count']}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "stock_predictor_stage_seconds",
+    "Time spent in each stage of serving a prediction.",
+    ("stage", "model"),
+)
+
+
+class Gauge:
+    """A value that goes up and down, such as trainings in flight."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.value = 0
+
+    @contextmanager
+    def track(self):
+        with self._lock:
+            self.value += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.value -= 1
+
+
+def format_labels(pairs) -> str:
+    if not pairs:
+        return ""
+    escaped = (
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def metric_lines(name: str, kind: str, help_text: str, samples) -> list:
+    """Prometheus text lines for ``samples``, a list of ``(labels, value)``."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{format_labels(sorted(labels.items()))} {value}")
+    return lines
+
+
+def observe(stages, model: str = ""):
+    """Feed collected ``stages`` (dicts with ``stage`` and ``seconds``) into the histograms."""
+    for entry in stages:
+        STAGE_SECONDS.observe(
+            entry["seconds"], stage=entry["stage"], model=entry.get("model", model)
+        )
+
+
+def record(stages):
+    """Hand ``stages`` timed elsewhere to the open collector, or observe them."""
+    collector = _collector.get()
+    if collector is not None:
+        collector.extend(stages)
+    else:
+        observe(stages)
+
+
+@contextmanager
+def stage(name: str, model: str = ""):
+    """Time the enclosed block as stage ``name``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry = {"stage": name, "seconds": time.perf_counter() - started}
+        if model:
+            entry["model"] = model
+        record([entry])
+
+
+@contextmanager
+def collect():
+    """Gather the stages timed inside the block into the yielded list.
+
+    Collected stages are not observed; the caller passes them on with
+    :func:`observe` or :func:`record`.  The block must not span a
+    generator ``yield``, since the context may differ on resumption.
+    """
+    stages = []
+    token = _collector.set(stages)
+    try:
+        yield stages
+    finally:
+        _collector.reset(token)
+
+
+def render(*sections) -> str:
+    """The stage histograms plus extra ``metric_lines`` sections as Prometheus text."""
+    lines = STAGE_SECONDS.render()
+    for section in sections:
+        lines.extend(section)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,56 @@
+"""Shared fixtures for the benchmark suite.
+
+Benchmarks run against synthetic price series (``BENCH_SIZES`` rows, default
+1k, 5k and 20k) and an in-memory Supabase stand-in, so they need neither
+network access nor credentials.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import db
+from memory_supabase import MemorySupabase
+
+SIZES = [int(n) for n in os.getenv("BENCH_SIZES", "1000,5000,20000").split(",")]
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "training: benchmarks that train a model")
+
+
+def synthetic_prices(n: int, symbol: str = "BENCH", seed: int = 0) -> pd.DataFrame:
+    """Geometric random walk of ``n`` daily closes."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, n)))
+    days = pd.bdate_range("1990-01-01", periods=n)
+    return pd.DataFrame(
+        {
+            "symbol": symbol,
+            "timestamp": days.strftime("%Y-%m-%d"),
+            "open": close,
+            "high": close * 1.01,
+            "low": close * 0.99,
+            "close": close,
+            "volume": rng.integers(1_000_000, 5_000_000, n).astype(float),
+        }
+    )
+
+
+@pytest.fixture(params=SIZES, ids=lambda n: f"{n}rows")
+def size(request):
+    return request.param
+
+
+@pytest.fixture
+def prices(size):
+    return synthetic_prices(size)
+
+
+@pytest.fixture
+def memory_supabase(monkeypatch):
+    client = MemorySupabase()
+    monkeypatch.setattr(db, "_client", client)
+    return client
@@ -0,0 +1,109 @@
+"""In-memory stand-in for the parts of the Supabase client the backend uses."""
+
+from types import SimpleNamespace
+
+
+class MemoryQuery:
+    def __init__(self, tables, name):
+        self._rows = tables.setdefault(name, [])
+        self._filters = []
+        self._order = []
+        self._bounds = None
+        self._single = False
+        self._write = None
+
+    def select(self, *columns, **kwargs):
+        return self
+
+    def _where(self, predicate):
+        self._filters.append(predicate)
+        return self
+
+    def eq(self, column, value):
+        return self._where(lambda r: r.get(column) == value)
+
+    def gt(self, column, value):
+        return self._where(lambda r: r[column] > value)
+
+    def gte(self, column, value):
+        return self._where(lambda r: r[column] >= value)
+
+    def lte(self, column, value):
+        return self._where(lambda r: r[column] <= value)
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._where(lambda r: r.get(column) in values)
+
+    def is_(self, column, value):
+        return self._where(lambda r: r.get(column) is None)
+
+    def order(self, column, desc=False):
+        self._order.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self._bounds = (start, end + 1)
+        return self
+
+    def limit(self, n):
+        self._bounds = (0, n)
+        return self
+
+    def maybe_single(self):
+        self._single = True
+        return self
+
+    def insert(self, rows):
+        self._write = ("insert", rows if isinstance(rows, list) else [rows])
+        return self
+
+    def update(self, values):
+        self._write = ("update", values)
+        return self
+
+    def execute(self):
+        if self._write and self._write[0] == "insert":
+            self._rows.extend(dict(r) for r in self._write[1])
+            return SimpleNamespace(data=self._write[1])
+        rows = [r for r in self._rows if all(f(r) for f in self._filters)]
+        if self._write:
+            for row in rows:
+                row.update(self._write[1])
+            return SimpleNamespace(data=rows)
+        for column, desc in reversed(self._order):
+            rows.sort(key=lambda r: r[column], reverse=desc)
+        if self._bounds:
+            rows = rows[self._bounds[0]:self._bounds[1]]
+        if self._single:
+            return SimpleNamespace(data=rows[0] if rows else None)
+        return SimpleNamespace(data=rows)
+
+
+class MemoryBucket:
+    def __init__(self, objects):
+        self._objects = objects
+
+    def upload(self, path, data, file_options=None):
+        self._objects[path] = bytes(data)
+        return SimpleNamespace(path=path)
+
+    def download(self, path):
+        return self._objects[path]
+
+
+class MemoryStorage:
+    def __init__(self):
+        self.buckets = {}
+
+    def from_(self, bucket):
+        return MemoryBucket(self.buckets.setdefault(bucket, {}))
+
+
+class MemorySupabase:
+    def __init__(self, tables=None):
+        self.tables = tables or {}
+        self.storage = MemoryStorage()
+
+    def table(self, name):
+        return MemoryQuery(self.tables, name)
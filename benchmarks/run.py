@@ -0,0 +1,50 @@
+"""Run the benchmark suite and compare it with the stored JSON baseline.
+
+    python benchmarks/run.py            # fail if slower than the baseline
+    python benchmarks/run.py --save     # record a new baseline
+    python benchmarks/run.py -k features  # extra arguments go to pytest
+
+Baselines live in ``benchmarks/baselines`` (one directory per platform, as
+written by pytest-benchmark).  A benchmark regresses when its fastest round
+is more than ``BENCHMARK_THRESHOLD`` slower than the baseline (default
+``min:25%``; the minimum is the least noisy statistic).  Model training
+(benchmarks marked ``training``) varies far more between runs, so it is
+compared separately against ``BENCHMARK_TRAIN_THRESHOLD`` (default
+``min:50%``).  Record baselines from a clean checkout.
+"""
+
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STORAGE = os.path.join(HERE, "baselines")
+THRESHOLD = os.getenv("BENCHMARK_THRESHOLD", "min:25%")
+TRAIN_THRESHOLD = os.getenv("BENCHMARK_TRAIN_THRESHOLD", "min:50%")
+
+
+def pytest(args):
+    return subprocess.call([sys.executable, "-m", "pytest", *args], cwd=os.path.dirname(HERE))
+
+
+def main(argv):
+    args = [HERE, f"--benchmark-storage=file://{STORAGE}", "--benchmark-columns=min,median,mean,rounds"]
+    if "--save" in argv:
+        argv.remove("--save")
+        return pytest(args + ["--benchmark-save=baseline"] + argv)
+
+    status = 0
+    for marker, threshold in (("not training", THRESHOLD), ("training", TRAIN_THRESHOLD)):
+        code = pytest(
+            args
+            + ["-m", marker, "--benchmark-compare", f"--benchmark-compare-fail={threshold}"]
+            + argv
+        )
+        # 5: no benchmark selected in this group (e.g. filtered out with -k).
+        if code not in (0, 5):
+            status = code
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,31 @@
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def api(memory_supabase, prices, monkeypatch):
+    """``main`` wired to the in-memory client with the snapshot store off."""
+    memory_supabase.tables["stock_prices"] = prices.to_dict(orient="records")
+    monkeypatch.setenv("STOCK_STORE_DIR", "")
+    sys.modules.pop("main", None)
+    import main
+    import symbols
+
+    monkeypatch.setattr(symbols, "KNOWN_SYMBOLS", frozenset({"BENCH"}))
+    yield main
+    sys.modules.pop("main", None)
+
+
+def test_price_cache_cold_load(benchmark, api):
+    def cold():
+        api.stock_cache._caches.clear()
+        return api.get_stock_dataframe("BENCH")
+
+    benchmark(cold)
+
+
+def test_price_cache_hit(benchmark, api):
+    api.get_stock_dataframe("BENCH")
+    df = benchmark(api.get_stock_dataframe, "BENCH")
+    assert len(df) == len(api.stock_cache.peek("BENCH"))
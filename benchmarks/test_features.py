@@ -0,0 +1,36 @@
+import numpy as np
+
+from baseline_model import permutation_importance
+from dense_inference import DenseNet
+from feature_engine import FEATURE_COLUMNS, FeatureEngine
+
+
+def test_compute_features_cold(benchmark, prices):
+    # A fresh engine each round measures the full rebuild, not a cache hit.
+    benchmark(lambda: FeatureEngine().compute(prices))
+
+
+def test_compute_features_append_one_row(benchmark, prices):
+    def setup():
+        engine = FeatureEngine()
+        engine.compute(prices.iloc[:-1])
+        return (engine,), {}
+
+    benchmark.pedantic(lambda engine: engine.compute(prices), setup=setup, rounds=20)
+
+
+def test_permutation_importance(benchmark, size):
+    rng = np.random.default_rng(0)
+    n_features = len(FEATURE_COLUMNS)
+    net = DenseNet(
+        [
+            (rng.normal(size=(n_features, 100)).astype("float32"), np.zeros(100, "float32"), "relu"),
+            (rng.normal(size=(100, 20)).astype("float32"), np.zeros(20, "float32"), "relu"),
+            (rng.normal(size=(20, 1)).astype("float32"), np.zeros(1, "float32"), "linear"),
+        ]
+    )
+    # Importance runs on the 15% test split.
+    X = rng.normal(size=(int(size * 0.15), n_features)).astype("float32")
+    y = rng.normal(size=len(X))
+
+    benchmark(permutation_importance, net, X, y, 0.0, repeats=3, seed=0)
@@ -0,0 +1,42 @@
+import importlib
+import os
+
+import pytest
+
+import persist_model
+
+# A single Keras fit is too noisy to gate on, so training is timed over
+# several rounds (each from an empty store) and compared with its own,
+# wider threshold; see run.py.
+TRAIN_ROUNDS = int(os.getenv("BENCH_TRAIN_ROUNDS", "3"))
+
+@pytest.fixture(scope="module", autouse=True)
+def tensorflow_loaded():
+    # Keep the one-off TensorFlow import out of the first measured round.
+    import tensorflow  # noqa: F401
+
+
+MODEL_MODULES = ["baseline_model", "cross_validation_model", "grid_search_model", "persist_model"]
+
+
+@pytest.mark.training
+@pytest.mark.parametrize("module_name", MODEL_MODULES)
+def test_train_and_predict(benchmark, memory_supabase, prices, module_name):
+    module = importlib.import_module(module_name)
+
+    def empty_store():
+        # Otherwise later rounds would reuse the model persisted by the first.
+        memory_supabase.tables.clear()
+        memory_supabase.storage.buckets.clear()
+        return (prices,), {}
+
+    result = benchmark.pedantic(
+        module.train_and_predict, setup=empty_store, rounds=TRAIN_ROUNDS, iterations=1
+    )
+    assert "prediction" in result
+
+
+def test_persisted_model_load(benchmark, memory_supabase, prices):
+    persist_model.train_and_predict(prices)
+    net, scaler, _ = benchmark(persist_model._load_persisted, "BENCH")
+    assert net is not None and scaler is not None
@@ -0,0 +1,86 @@
+import numpy as np
+
+from backend.accuracy_summary import AccuracySummary, direction_hits
+
+
+def _resolved(id, model, pct, predicted, actual, date="2024-01-10", base=100.0):
+    return {
+        "id": id,
+        "symbol": "AAPL",
+        "model_type": model,
+        "prediction": pct,
+        "predicted_price": predicted,
+        "base_price": base,
+        "actual_price": actual,
+        "10_days_later_date": date,
+    }
+
+
+def test_summary_is_seeded_once_and_updated_incrementally():
+    loads = []
+
+    def loader():
+        loads.append(1)
+        # Base close 100: baseline predicted +10% and the price went up.
+        return [_resolved(1, "baseline", 0.1, 110.0, 105.0)]
+
+    summary = AccuracySummary(loader, window=2)
+    summary.add([_resolved(9, "baseline", 0.1, 110.0, 0.0)])  # ignored before seeding
+    (row,) = summary.summary()
+    assert row["count"] == 1 and row["mae"] == 5.0 and row["hit_rate"] == 1.0
+
+    summary.add([
+        _resolved(2, "baseline", 0.1, 110.0, 90.0, date="2024-01-11"),
+        _resolved(3, "baseline", -0.1, 90.0, 95.0, date="2024-01-12"),
+        _resolved(1, "baseline", 0.1, 110.0, 105.0),  # already counted
+    ])
+    (row,) = summary.summary()
+    assert loads == [1]
+    assert row["count"] == 3
+    assert row["mae"] == (5.0 + 20.0 + 5.0) / 3
+    assert row["hit_rate"] == 2 / 3
+    # Only the two most recent resolutions count towards the rolling figures.
+    assert row["rolling_window"] == 2
+    assert row["rolling_hit_rate"] == 0.5
+    assert row["rolling_mae"] == 12.5
+
+
+def test_summary_filters_by_symbol():
+    msft = dict(_resolved(1, "baseline", 0.1, 110.0, 105.0), symbol="MSFT")
+    summary = AccuracySummary(lambda: [msft, _resolved(2, "baseline", 0.1, 110.0, 105.0)])
+    assert [r["symbol"] for r in summary.summary("MSFT")] == ["MSFT"]
+    assert len(summary.summary()) == 2
+
+
+def test_summary_reseeds_when_rows_were_resolved_elsewhere():
+    stored = [_resolved(1, "baseline", 0.1, 110.0, 105.0)]
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return list(stored)
+
+    summary = AccuracySummary(loader, version=lambda: len(stored))
+    summary.summary()
+    summary.add([_resolved(2, "baseline", 0.1, 110.0, 90.0)])
+    stored.append(_resolved(2, "baseline", 0.1, 110.0, 90.0))
+    summary.summary()
+    assert loads == [1]
+
+    # Another worker resolves a row this process never sees through ``add``.
+    stored.append(_resolved(3, "baseline", -0.1, 90.0, 95.0))
+    (row,) = summary.summary()
+    assert loads == [1, 1]
+    assert row["count"] == 3
+
+
+def test_hits_are_scored_against_the_stored_base_close():
+    # A tiny predicted rise rounds to the base price; -100% has no inverse.
+    hits = direction_hits([0.0001, -1.0, 0.1], [100.2, 40.0, 120.0], [100.0, 50.0, np.nan])
+    assert hits[:2].tolist() == [1.0, 1.0] and np.isnan(hits[2])
+
+    legacy = dict(_resolved(1, "baseline", 0.1, 110.0, 120.0), base_price=None)
+    summary = AccuracySummary(lambda: [legacy, _resolved(2, "baseline", 0.1, 110.0, 90.0)])
+    (row,) = summary.summary()
+    assert row["count"] == 2 and row["mae"] == 15.0
+    assert row["hit_rate"] == 0.0 and row["rolling_hit_rate"] == 0.0
@@ -0,0 +1,135 @@
+import sys
+import types
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import backend.backtest as bt
+from backend.feature_engine import HORIZON, MIN_REQUIRED_ROWS
+
+
+class MeanNet:
+    def __init__(self, value):
+        self.value = value
+
+    def predict(self, X):
+        return np.full((len(X), 1), self.value)
+
+
+class Identity:
+    def transform(self, X):
+        return X
+
+
+def _fake_model(monkeypatch, warm_start=False):
+    calls = []
+
+    def fit_window(features, targets, previous=None):
+        calls.append((len(features), previous))
+        return {"scaler": Identity(), "net": MeanNet(float(np.mean(targets)))}
+
+    module = types.ModuleType("fake_backtest_model")
+    module.fit_window = fit_window
+    module.WARM_START = warm_start
+    monkeypatch.setitem(sys.modules, "fake_backtest_model", module)
+    monkeypatch.setattr(bt, "MODEL_MODULES", {"mean": "fake_backtest_model"})
+    return calls
+
+
+def _prices(n):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2000-01-03", periods=n, freq="B").strftime("%Y-%m-%d"),
+        "close": 100 + np.cumsum(rng.normal(size=n)),
+        "symbol": "BT",
+    })
+
+
+def test_windows_only_train_on_known_outcomes():
+    positions = np.arange(300, 500)
+    plan = bt.plan_windows(positions, cadence=30, min_train=50)
+
+    assert plan[0][0].stop >= 50
+    assert plan[0][1].start == 50 + HORIZON - 1
+    assert plan[-1][1].stop == len(positions)
+    for train, test in plan:
+        assert positions[train.stop - 1] + HORIZON <= positions[test.start]
+        assert positions[train.stop] + HORIZON > positions[test.start]
+    assert [t.start for _, t in plan[1:]] == [t.stop for _, t in plan[:-1]]
+
+
+def test_backtest_rows_match_prediction_history_shape(monkeypatch):
+    calls = _fake_model(monkeypatch)
+    df = _prices(MIN_REQUIRED_ROWS + 200)
+
+    rows, summary = bt.run_backtest(df, symbol="BT", workers=1, cadence=50, min_train=40)
+
+    assert list(rows.columns) == [
+        "date_of_prediction", "symbol", "model_type", "prediction", "predicted_price",
+        "10_days_later_date", "actual_price", "difference", "base_price",
+    ]
+    first = rows.iloc[0]
+    made_on = df.index[df["timestamp"] == first["date_of_prediction"]][0]
+    assert first["10_days_later_date"] == df["timestamp"].iloc[made_on + HORIZON]
+    assert first["actual_price"] == df["close"].iloc[made_on + HORIZON]
+    assert summary["windows"] == len(calls)
+    assert summary["models"]["mean"]["count"] == len(rows)
+    assert all(previous is None for _, previous in calls)
+
+
+def test_warm_start_models_chain_windows(monkeypatch):
+    calls = _fake_model(monkeypatch, warm_start=True)
+    bt.run_backtest(_prices(MIN_REQUIRED_ROWS + 200), workers=1, cadence=50, min_train=40, max_train=40)
+
+    sizes = [size for size, _ in calls]
+    assert sizes == sorted(sizes) and sizes[-1] > 40
+    assert calls[0][1] is None and all(previous is not None for _, previous in calls[1:])
+
+
+def test_unknown_models_are_rejected(monkeypatch):
+    _fake_model(monkeypatch)
+    with pytest.raises(ValueError, match="nope"):
+        bt.run_backtest(_prices(MIN_REQUIRED_ROWS + 50), models=["nope"])
+
+
+def test_write_rows_replaces_previous_run(monkeypatch):
+    ops = []
+
+    class Query:
+        def __getattr__(self, name):
+            def call(*args):
+                ops.append((name, args))
+                return self
+            return call
+
+        def execute(self):
+            return SimpleNamespace(data=[])
+
+    monkeypatch.setattr(bt.db, "_client", SimpleNamespace(table=lambda name: Query()))
+    monkeypatch.setattr(bt, "WRITE_BATCH_SIZE", 2)
+    rows = pd.DataFrame(
+        {"model_type": ["a", "a", "b"], "prediction": [0.1, 0.2, 0.3], "base_price": 1.0}
+    )
+
+    assert bt.write_rows(rows, "BT") == 3
+    names = [name for name, _ in ops]
+    assert names.index("delete") < names.index("insert")
+    inserts = [args[0] for name, args in ops if name == "insert"]
+    assert [len(batch) for batch in inserts] == [2, 1]
+    assert all("base_price" in row for batch in inserts for row in batch)
+
+
+def test_hit_rate_compares_with_the_base_close():
+    rows = pd.DataFrame({
+        "model_type": "m",
+        # A tiny predicted rise rounds to the base price; -100% has no inverse.
+        "prediction": [0.0001, -1.0],
+        "predicted_price": [100.0, 0.0],
+        "base_price": [100.0, 50.0],
+        "actual_price": [100.2, 40.0],
+        "difference": [0.2, 40.0],
+    })
+
+    assert bt.summarize(rows)["m"]["hit_rate"] == 1.0
@@ -0,0 +1,102 @@
+import os
+from types import SimpleNamespace
+
+os.environ.setdefault("SUPABASE_URL", "http://example.com")
+os.environ.setdefault("SUPABASE_KEY", "key")
+
+import backend.bulk_load_full_history as bl
+
+
+class DummyTable:
+    def __init__(self, fail_inserts=0, commit_failed=False):
+        self.rows = []
+        self.fail_inserts = fail_inserts
+        # Whether a failed insert was still stored (a timeout after commit).
+        self.commit_failed = commit_failed
+        self.inserts = 0
+        self.pending = None
+
+    def select(self, *args):
+        self.pending = None
+        return self
+
+    def eq(self, *args):
+        return self
+
+    def gte(self, *args):
+        return self
+
+    def lte(self, *args):
+        return self
+
+    def order(self, *args):
+        return self
+
+    def range(self, *args):
+        return self
+
+    def insert(self, rows):
+        self.pending = rows
+        return self
+
+    def execute(self):
+        if self.pending is None:
+            return SimpleNamespace(data=[{"timestamp": r["timestamp"]} for r in self.rows])
+        self.inserts += 1
+        if self.fail_inserts:
+            self.fail_inserts -= 1
+            if self.commit_failed:
+                self.rows.extend(self.pending)
+            raise RuntimeError("429 Too Many Requests")
+        self.rows.extend(self.pending)
+        return SimpleNamespace(data=self.pending)
+
+
+def _records(n):
+    """``n`` daily rows, newest first like the Alpha Vantage download."""
+    return [
+        {"symbol": "AAPL", "timestamp": f"2024-01-{d:02d}", "close": float(d)}
+        for d in range(n, 0, -1)
+    ]
+
+
+def _patch(mocker, table):
+    mocker.patch.object(bl.db, "_client", SimpleNamespace(table=lambda name: table))
+    mocker.patch.object(bl.time, "sleep")
+
+
+def test_upload_is_chunked_and_retries_failures(mocker, tmp_path):
+    table = DummyTable(fail_inserts=1)
+    _patch(mocker, table)
+    checkpoint = tmp_path / "checkpoint.json"
+
+    uploaded = bl.upload_deduplicated(_records(5), chunk_size=2, checkpoint_path=str(checkpoint))
+
+    assert uploaded == 5
+    assert sorted(r["timestamp"] for r in table.rows) == [f"2024-01-0{d}" for d in range(1, 6)]
+    assert not checkpoint.exists()
+
+
+def test_retry_after_committed_insert_does_not_duplicate(mocker, tmp_path):
+    table = DummyTable(fail_inserts=1, commit_failed=True)
+    _patch(mocker, table)
+
+    uploaded = bl.upload_deduplicated(
+        iter(_records(2)), chunk_size=2, checkpoint_path=str(tmp_path / "checkpoint.json")
+    )
+
+    assert len(table.rows) == 2
+    assert table.inserts == 1
+    assert uploaded == 0
+
+
+def test_upload_resumes_after_checkpoint(mocker, tmp_path):
+    table = DummyTable()
+    _patch(mocker, table)
+    checkpoint = tmp_path / "checkpoint.json"
+    bl.save_checkpoint(str(checkpoint), bl.SYMBOL, "2024-01-03")
+
+    uploaded = bl.upload_deduplicated(_records(5), chunk_size=2, checkpoint_path=str(checkpoint))
+
+    assert uploaded == 2
+    assert [r["timestamp"] for r in table.rows] == ["2024-01-02", "2024-01-01"]
@@ -0,0 +1,67 @@
+import asyncio
+
+import httpx
+import pytest
+
+import backend.db as db
+
+
+class FlakyQuery:
+    def __init__(self, failures, error=httpx.ConnectError("down")):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return "ok"
+
+
+class AsyncFlakyQuery(FlakyQuery):
+    async def execute(self):
+        return super().execute()
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(db, "RETRY_BASE_DELAY", 0)
+    monkeypatch.setattr(db, "QUERY_METRICS", db.QueryMetrics())
+
+
+def test_transient_errors_are_retried_and_timed():
+    query = FlakyQuery(failures=2)
+    assert db.execute(query, "t.select") == "ok"
+    assert query.calls == 3
+    stats = db.QUERY_METRICS.snapshot()["t.select"]
+    assert stats["count"] == 1 and stats["retries"] == 2 and stats["errors"] == 0
+
+
+def test_retries_are_bounded():
+    query = FlakyQuery(failures=10)
+    with pytest.raises(httpx.ConnectError):
+        db.execute(query, "t.select")
+    assert query.calls == db.MAX_RETRIES
+    assert db.QUERY_METRICS.snapshot()["t.select"]["errors"] == 1
+
+
+def test_api_errors_are_not_retried():
+    query = FlakyQuery(failures=1, error=ValueError("bad filter"))
+    with pytest.raises(ValueError):
+        db.execute(query, "t.select")
+    assert query.calls == 1
+
+
+def test_async_execute_retries():
+    query = AsyncFlakyQuery(failures=1)
+    assert asyncio.run(db.aexecute(query, "t.page")) == "ok"
+    assert db.QUERY_METRICS.snapshot()["t.page"]["retries"] == 1
+
+
+def test_non_idempotent_writes_are_not_retried():
+    query = FlakyQuery(failures=1, error=httpx.ReadTimeout("timed out"))
+    with pytest.raises(httpx.ReadTimeout):
+        db.execute(query, "t.insert", retry=False)
+    assert query.calls == 1
+    assert db.QUERY_METRICS.snapshot()["t.insert"]["errors"] == 1
@@ -0,0 +1,26 @@
+import numpy as np
+from tensorflow.keras.layers import Dense
+from tensorflow.keras.models import Sequential
+
+from backend.dense_inference import DenseNet
+
+
+def _keras_model():
+    model = Sequential([
+        Dense(16, input_dim=9, activation="relu"),
+        Dense(4, activation="relu"),
+        Dense(1, activation="linear"),
+    ])
+    model.compile(optimizer="adam", loss="mse")
+    return model
+
+
+def test_numpy_forward_pass_matches_keras():
+    model = _keras_model()
+    X = np.random.default_rng(0).normal(size=(50, 9))
+    net = DenseNet.from_keras(model)
+    np.testing.assert_allclose(
+        net.predict(X), model.predict(X, verbose=0), rtol=1e-5, atol=1e-6
+    )
+    assert net.predict(X[-1]).shape == (1, 1)
+
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.feature_engine import FEATURE_COLUMNS, MIN_REQUIRED_ROWS, FeatureEngine
+
+
+def _reference_features(df):
+    """The original pandas implementation the engine replaces."""
+    df = df.copy()
+    df["10d_future_close_pct"] = (df["close"].shift(-10) - df["close"]) / df["close"]
+    df["10d_close_pct"] = df["close"].pct_change(10)
+    for w in (14, 30, 50, 200):
+        df[f"ma{w}"] = df["close"].rolling(w).mean()
+        df[f"rsi{w}"] = (
+            df["close"].diff().clip(lower=0).rolling(w).mean()
+            / df["close"].abs().rolling(w).mean()
+        ) * 100
+    df = df.dropna()
+    return df[FEATURE_COLUMNS], df["10d_future_close_pct"]
+
+
+def _prices(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    dates = pd.date_range("2000-01-01", periods=n, freq="D").strftime("%Y-%m-%d")
+    return pd.DataFrame({"timestamp": dates, "close": close})
+
+
+def test_matches_reference_implementation():
+    df = _prices(600)
+    features, targets = FeatureEngine().compute(df)
+    ref_features, ref_targets = _reference_features(df)
+    pd.testing.assert_frame_equal(features, ref_features, rtol=1e-9)
+    pd.testing.assert_series_equal(targets, ref_targets, rtol=1e-9)
+
+
+def test_incremental_append_matches_full_rebuild():
+    df = _prices(700, seed=1)
+    engine = FeatureEngine()
+    engine.compute(df.iloc[:500])
+    features, targets = engine.compute(df.iloc[:503])
+    features, targets = engine.compute(df)
+
+    full_features, full_targets = FeatureEngine().compute(df)
+    pd.testing.assert_frame_equal(features, full_features, rtol=1e-9)
+    pd.testing.assert_series_equal(targets, full_targets, rtol=1e-9)
+
+
+def test_same_dataset_returns_cached_result():
+    df = _prices(400)
+    engine = FeatureEngine()
+    first = engine.compute(df)
+    assert engine.compute(df.copy()) is first
+
+
+def test_too_few_rows_raises_value_error():
+    with pytest.raises(ValueError, match=str(MIN_REQUIRED_ROWS)):
+        FeatureEngine().compute(_prices(MIN_REQUIRED_ROWS - 1))
+
+
+def test_missing_close_only_voids_the_windows_covering_it():
+    df = _prices(600, seed=2)
+    df.loc[100, "close"] = np.nan
+    ref_features, ref_targets = _reference_features(df)
+
+    features, targets = FeatureEngine().compute(df)
+    assert len(features) == len(ref_features) == 289
+    pd.testing.assert_frame_equal(features, ref_features, rtol=1e-9)
+    pd.testing.assert_series_equal(targets, ref_targets, rtol=1e-9)
+
+    engine = FeatureEngine()
+    engine.compute(df.iloc[:400])
+    features, targets = engine.compute(df)
+    pd.testing.assert_frame_equal(features, ref_features, rtol=1e-9)
+    pd.testing.assert_series_equal(targets, ref_targets, rtol=1e-9)
@@ -1,80 +1,125 @@
 import os
-from datetime import datetime
 from types import SimpleNamespace
-import sys
-import importlib
+
+import pandas as pd
 
 # Ensure required env vars are set before importing the module
 os.environ.setdefault("ALPHA_VANTAGE_API_KEY", "test")
 os.environ.setdefault("SUPABASE_URL", "http://example.com")
 os.environ.setdefault("SUPABASE_KEY", "key")
 
-sys.modules.setdefault(
-    "prediction_history", importlib.import_module("backend.prediction_history")
-)
 import backend.fetch_and_upload as fu
 
+
 class DummyTable:
-    def __init__(self, count_data):
-        self.count_data = count_data
-        self.last_update = None
-        self.last_insert = None
+    def __init__(self, existing):
+        self.existing = existing
+        self.inserts = []
         self.mode = "select"
+        self.ordered_by = None
 
     def select(self, *args, **kwargs):
         self.mode = "select"
         return self
 
-    def update(self, obj):
-        self.mode = "update"
-        self.last_update = obj
+    def insert(self, rows):
+        self.mode = "insert"
+        self.inserts.append(rows)
         return self
 
-    def insert(self, obj):
-        self.mode = "insert"
-        self.last_insert = obj
+    def eq(self, *args):
         return self
 
-    def eq(self, *args, **kwargs):
+    def gte(self, *args):
         return self
 
-    def maybe_single(self):
+    def lte(self, *args):
+        return self
+
+    def order(self, column):
+        self.ordered_by = column
+        return self
+
+    def range(self, *args):
         return self
 
     def execute(self):
         if self.mode == "select":
-            return SimpleNamespace(data=self.count_data)
-        return SimpleNamespace()
+            return SimpleNamespace(data=[{"timestamp": ts} for ts in self.existing])
+        return SimpleNamespace(data=None)
+
 
 class DummySupabase:
-    def __init__(self, count_data):
-        self.table_instance = DummyTable(count_data)
+    def __init__(self, existing):
+        self.table_instance = DummyTable(existing)
 
     def table(self, name):
         return self.table_instance
 
-def _patch_common(mocker, supabase, date):
-    mocker.patch.object(fu, "supabase", supabase)
-    mocker.patch.object(fu, "get_daily_stock_data", return_value=[])
-    mocker.patch.object(fu, "test_alpha_vantage", return_value=True)
-    dt_mock = mocker.Mock(wraps=datetime)
-    dt_mock.today.return_value = date
-    mocker.patch.object(fu, "datetime", dt_mock)
 
+def _history(days):
+    index = pd.to_datetime([f"2024-01-{d:02d}" for d in days])
+    values = [float(d) for d in days]
+    return pd.DataFrame(
+        {"Open": values, "High": values, "Low": values, "Close": values, "Volume": values},
+        index=index,
+    )
 
-def test_fetch_count_updated_when_no_data(mocker):
-    supa = DummySupabase({"value": "2"})
-    _patch_common(mocker, supa, datetime(2024, 1, 1))
-    result = fu.fetch_and_upload()
-    assert result == 0
-    assert supa.table_instance.last_update == {"value": "3"}
-    assert supa.table_instance.last_insert is None
 
+def _patch_history(mocker, hist):
+    ticker = mocker.Mock()
+    ticker.history.return_value = hist
+    mocker.patch.object(fu.yf, "Ticker", return_value=ticker)
+
+
+def test_only_new_rows_are_inserted_in_batches(mocker):
+    supa = DummySupabase(existing=["2024-01-01", "2024-01-02"])
+    mocker.patch.object(fu.db, "_client", supa)
+    mocker.patch.object(fu, "BATCH_SIZE", 2)
+    _patch_history(mocker, _history(range(1, 6)))
 
-def test_fetch_count_inserted_when_no_data_first_time(mocker):
-    supa = DummySupabase(None)
-    _patch_common(mocker, supa, datetime(2024, 1, 1))
     result = fu.fetch_and_upload()
-    assert result == 0
-    assert supa.table_instance.last_insert == {"date": "2024-01-01", "value": "1"}
-    assert supa.table_instance.last_update is None
+
+    assert result == 3
+    assert supa.table_instance.ordered_by == "timestamp"
+    batches = supa.table_instance.inserts
+    assert [len(b) for b in batches] == [2, 1]
+    assert [r["timestamp"] for b in batches for r in b] == [
+        "2024-01-03",
+        "2024-01-04",
+        "2024-01-05",
+    ]
+    assert batches[0][0] == {
+        "symbol": "AAPL",
+        "timestamp": "2024-01-03",
+        "open": 3.0,
+        "high": 3.0,
+        "low": 3.0,
+        "close": 3.0,
+        "volume": 3.0,
+    }
+
+
+def test_nothing_uploaded_when_no_data(mocker):
+    supa = DummySupabase(existing=[])
+    mocker.patch.object(fu.db, "_client", supa)
+    _patch_history(mocker, _history([]))
+
+    assert fu.fetch_and_upload() == 0
+    assert supa.table_instance.inserts == []
+
+
+def test_watchlist_is_downloaded_in_one_batch(mocker):
+    supa = DummySupabase(existing=[])
+    mocker.patch.object(fu.db, "_client", supa)
+    hist = pd.concat({"AAPL": _history([1, 2]), "MSFT": _history([1])}, axis=1)
+    download = mocker.patch.object(fu.yf, "download", return_value=hist)
+
+    assert fu.fetch_and_upload(["AAPL", "MSFT"]) == 3
+    download.assert_called_once()
+    rows = supa.table_instance.inserts[0]
+    assert sorted((r["symbol"], r["timestamp"]) for r in rows) == [
+        ("AAPL", "2024-01-01"),
+        ("AAPL", "2024-01-02"),
+        ("MSFT", "2024-01-01"),
+    ]
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+
+from backend.ingestion import IngestionCoordinator
+
+
+async def _collect(lines):
+    return [line async for line in lines]
+
+
+def test_concurrent_requests_share_one_run():
+    release = threading.Event()
+    calls = []
+    completed = []
+
+    def ingest(log):
+        calls.append(1)
+        log("fetching")
+        release.wait(5)
+        log("uploaded")
+        return [{"symbol": "AAPL", "timestamp": "2024-01-02"}]
+
+    def on_complete(rows):
+        completed.append(rows)
+        return "cache updated"
+
+    async def scenario():
+        coordinator = IngestionCoordinator(ingest, on_complete=on_complete)
+        first = asyncio.ensure_future(_collect(coordinator.attach()))
+        await asyncio.sleep(0.05)
+        assert coordinator.running
+        second = asyncio.ensure_future(_collect(coordinator.attach()))
+        await asyncio.sleep(0.05)
+        release.set()
+        results = await asyncio.gather(first, second)
+        assert not coordinator.running
+        return results
+
+    first, second = asyncio.run(scenario())
+
+    assert calls == [1]
+    assert completed == [[{"symbol": "AAPL", "timestamp": "2024-01-02"}]]
+    assert first == second
+    assert first == [
+        "fetching\n",
+        "uploaded\n",
+        "cache updated\n",
+        "\nDone. Inserted 1 rows.\n",
+    ]
+
+
+def test_failed_run_is_reported_and_next_request_starts_fresh():
+    attempts = []
+
+    def ingest(log):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("boom")
+        return []
+
+    async def scenario():
+        coordinator = IngestionCoordinator(ingest)
+        failed = await _collect(coordinator.attach())
+        ok = await _collect(coordinator.attach())
+        return failed, ok
+
+    failed, ok = asyncio.run(scenario())
+    assert failed == ["\nIngestion failed: boom\n"]
+    assert ok == ["\nDone. Inserted 0 rows.\n"]
@@ -0,0 +1,62 @@
+from backend.jobs import JobManager
+
+
+def _wait(job):
+    sent = 0
+    events = []
+    while True:
+        new = job.wait_for_events(sent, timeout=5)
+        events.extend(new)
+        sent += len(new)
+        if job.finished and sent >= len(job.events):
+            return events
+
+
+def test_job_runs_models_and_reports_results():
+    completed = []
+    manager = JobManager(
+        lambda name, df: {"prediction": len(name)},
+        on_complete=lambda job, df: completed.append(job.id),
+    )
+    job = manager.submit(["baseline", "persist", "baseline"], df=None)
+    events = _wait(job)
+
+    assert job.status == "done"
+    assert job.results == {"baseline": {"prediction": 8}, "persist": {"prediction": 7}}
+    assert completed == [job.id]
+    assert events[-1]["event"] == "results"
+    assert {e["model"] for e in events if e["event"] == "end"} == {"baseline", "persist"}
+    assert manager.get(job.id) is job
+
+
+def test_failed_models_are_reported_per_model():
+    def runner(name, df):
+        if name == "persist":
+            raise ValueError("Not enough data")
+        return {"prediction": 0.0}
+
+    job = JobManager(runner).submit(["baseline", "persist"], df=None)
+    _wait(job)
+
+    assert job.status == "done"
+    assert job.errors == {"persist": "Not enough data"}
+    assert list(job.results) == ["baseline"]
+
+
+def test_fan_out_models_train_in_the_calling_thread(monkeypatch):
+    import sys
+    import types
+
+    from backend import jobs
+
+    module = types.ModuleType("fan_out_model")
+    module.FAN_OUT = True
+    module.train_and_predict = lambda df: {"pool": jobs.current_pool()}
+    monkeypatch.setitem(sys.modules, "fan_out_model", module)
+    pool = jobs.TrainingPool(max_workers=1)
+
+    result = pool.run("fan_out_model", df=None)
+
+    assert result["pool"] is pool
+    assert pool._executor is None
+    assert jobs.current_pool() is None
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -14,8 +15,33 @@ def test_train_and_predict_returns_metrics():
     df = pd.DataFrame({'close': range(MIN_REQUIRED_ROWS + 10)})
     result = train_and_predict(df)
     assert 'prediction' in result
-    assert 'plot_base64' in result
     assert 'r2' in result
     assert 'mae' in result
     assert 'rmse' in result
-    assert 'importance_plot_base64' in result
+    diagnostics = result['diagnostics']
+    assert len(diagnostics['importances']['values']) == len(diagnostics['importances']['features'])
+    assert set(diagnostics['predicted_vs_actual']) == {'train', 'test'}
+
+
+def test_permutation_importance_uses_one_predict_call():
+    from backend.baseline_model import permutation_importance
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 3))
+    coef = np.array([2.0, 0.5, 0.0])
+    y = X @ coef
+
+    class Linear:
+        calls = 0
+
+        def predict(self, X, **kwargs):
+            Linear.calls += 1
+            return (X @ coef).reshape(-1, 1)
+
+    importances = permutation_importance(Linear(), X, y, baseline=1.0, repeats=4, seed=1)
+
+    assert Linear.calls == 1
+    assert importances[0] > importances[1] > 0
+    assert importances[2] == pytest.approx(0)
+    again = permutation_importance(Linear(), X, y, baseline=1.0, repeats=4, seed=1)
+    assert np.array_equal(importances, again)
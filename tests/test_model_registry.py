@@ -0,0 +1,27 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from backend.model_registry import IMPORT_TIMINGS, ModelRegistry
+
+BACKEND = Path(__file__).resolve().parents[1] / "backend"
+
+
+def test_models_import_lazily_and_record_timings():
+    registry = ModelRegistry({"json": "json"})
+    assert registry.loaded() == []
+    assert registry.get("json").dumps([]) == "[]"
+    assert registry.loaded() == ["json"]
+    assert "json" in IMPORT_TIMINGS
+
+
+def test_model_modules_do_not_import_tensorflow():
+    # Startup budget guard: TensorFlow and matplotlib must only load on first
+    # training, never when the model modules are imported.
+    code = (
+        "import sys\n"
+        "import baseline_model, cross_validation_model, grid_search_model\n"
+        "heavy = [m for m in ('tensorflow', 'matplotlib') if m in sys.modules]\n"
+        "assert not heavy, heavy\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=BACKEND, check=True)
@@ -0,0 +1,152 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from backend.dense_inference import DenseNet
+from backend.model_store import ModelStore, content_hash, from_bytes, pack, to_bytes
+
+
+class DuplicateKey(Exception):
+    code = "23505"
+
+
+class FakeQuery:
+    def __init__(self, client):
+        self.client = client
+        self.filters = {}
+        self.write = None
+
+    def select(self, *columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def order(self, column, desc=False):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def insert(self, row):
+        self.write = ("insert", row)
+        return self
+
+    def update(self, values):
+        self.write = ("update", values)
+        return self
+
+    def execute(self):
+        self.client.queries.append(self.write[0] if self.write else "select")
+        if self.write and self.write[0] == "insert":
+            key = tuple(self.write[1][k] for k in ("model", "symbol", "version"))
+            if any(tuple(r[k] for k in ("model", "symbol", "version")) == key for r in self.client.rows):
+                raise DuplicateKey()
+            self.client.rows.append(dict(self.write[1]))
+            return SimpleNamespace(data=[self.write[1]])
+        rows = [
+            r for r in self.client.rows
+            if all(r.get(k) == v for k, v in self.filters.items())
+        ]
+        if self.write:
+            for row in rows:
+                row.update(self.write[1])
+        return SimpleNamespace(data=sorted(rows, key=lambda r: -r["version"])[:1])
+
+
+class FakeBucket:
+    def __init__(self, client):
+        self.client = client
+
+    def upload(self, path, data, options):
+        self.client.objects[path] = data
+
+    def download(self, path):
+        self.client.downloads.append(path)
+        return self.client.objects[path]
+
+
+class FakeClient:
+    def __init__(self):
+        self.rows = []
+        self.objects = {}
+        self.queries = []
+        self.downloads = []
+        self.storage = SimpleNamespace(from_=lambda bucket: FakeBucket(self))
+
+    def table(self, name):
+        return FakeQuery(self)
+
+
+def _artifact(seed=0):
+    rng = np.random.default_rng(seed)
+    net = DenseNet([(rng.normal(size=(3, 4)), rng.normal(size=4), "relu"),
+                    (rng.normal(size=(4, 1)), rng.normal(size=1), "linear")])
+    scaler = StandardScaler().fit(pd.DataFrame(rng.normal(size=(20, 3)), columns=["a", "b", "c"]))
+    return net, scaler
+
+
+@pytest.fixture
+def store():
+    return ModelStore(FakeClient())
+
+
+def test_round_trip_preserves_weights_and_scaler():
+    net, scaler = _artifact()
+    loaded_net, loaded_scaler = from_bytes(to_bytes(pack(net, scaler)))
+
+    X = pd.DataFrame(np.ones((2, 3)), columns=["a", "b", "c"])
+    np.testing.assert_allclose(loaded_scaler.transform(X), scaler.transform(X))
+    np.testing.assert_allclose(loaded_net.predict(X.to_numpy()), net.predict(X.to_numpy()))
+    assert content_hash(pack(loaded_net, loaded_scaler)) == content_hash(pack(net, scaler))
+
+
+def test_unchanged_artifact_is_not_saved_again(store):
+    net, scaler = _artifact()
+    first = store.save("persist", "AAPL", net, scaler, {"rows": 1})
+    second = store.save("persist", "AAPL", net, scaler, {"rows": 2})
+    third = store.save("persist", "AAPL", *_artifact(seed=1))
+
+    assert (first.version, second.version, third.version) == (1, 1, 2)
+    assert len(store.client.objects) == 2
+    assert store.client.rows[0]["training_state"] == {"rows": 2}
+    assert store.stats()["unchanged_saves"] == 1
+
+
+def test_load_reuses_memory_copy_until_version_changes(store):
+    store.save("persist", "AAPL", *_artifact())
+    other = ModelStore(store.client)
+
+    assert other.load("persist", "AAPL").version == 1
+    assert other.load("persist", "AAPL").version == 1
+    assert store.client.downloads == ["persist/AAPL/v1.npz"]
+
+    store.save("persist", "AAPL", *_artifact(seed=1))
+    assert other.load("persist", "AAPL").version == 2
+    assert len(store.client.downloads) == 2
+    assert other.stats()["memory_hits"] == 1
+    assert other.load("persist", "MSFT") is None
+
+
+def test_concurrent_saves_claim_distinct_versions(store):
+    net, scaler = _artifact()
+    # Another worker claimed version 1 and has not finished uploading.
+    store.client.rows.append(
+        {"model": "persist", "symbol": "AAPL", "version": 1, "content_hash": "x", "ready": False}
+    )
+
+    assert store.save("persist", "AAPL", net, scaler).version == 2
+    assert list(store.client.objects) == ["persist/AAPL/v2.npz"]
+    assert ModelStore(store.client).load("persist", "AAPL").version == 2
+
+
+def test_load_rejects_archive_that_does_not_match_its_hash(store):
+    store.save("persist", "AAPL", *_artifact())
+    store.client.objects["persist/AAPL/v1.npz"] = to_bytes(pack(*_artifact(seed=1)))
+
+    with pytest.raises(ValueError):
+        ModelStore(store.client).load("persist", "AAPL")
@@ -0,0 +1,90 @@
+import numpy as np
+
+from backend.parallel_training import train_many
+
+
+class LinearModel:
+    """Least-squares stand-in exposing a single Keras-like Dense layer."""
+
+    def __init__(self, input_dim, units1, units2):
+        self.coef = np.zeros(input_dim)
+        self.layers = [self]
+
+    def fit(self, X, y, epochs, verbose):
+        self.coef = np.linalg.lstsq(X, y, rcond=None)[0]
+
+    def get_weights(self):
+        return [self.coef.reshape(-1, 1), np.zeros(1)]
+
+    def get_config(self):
+        return {"activation": "linear"}
+
+
+def build_linear(input_dim, units1, units2):
+    return LinearModel(input_dim, units1, units2)
+
+
+def test_parallel_results_match_serial_and_keep_task_order():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 4))
+    y = X @ np.array([1.0, -2.0, 0.5, 0.0]) + rng.normal(0, 0.1, 300)
+    tasks = [
+        {"train": slice(None, 100), "test": slice(100, 200), "epochs": 1},
+        {"train": slice(None, 200), "test": slice(200, None), "epochs": 1},
+        {"train": slice(None), "epochs": 1},
+    ]
+
+    serial = train_many(build_linear, X, y, tasks, workers=1)
+    parallel = train_many(build_linear, X, y, tasks, workers=2)
+
+    assert set(serial[0]) == {"latest", "r2", "mae", "rmse"}
+    assert set(serial[2]) == {"latest"}
+    for a, b in zip(serial, parallel):
+        assert a.keys() == b.keys()
+        for key in a:
+            assert np.isclose(a[key], b[key])
+
+
+def test_pool_workers_train_serially(monkeypatch):
+    from backend import parallel_training
+
+    def no_pool(workers):
+        raise AssertionError("nested pool started")
+
+    monkeypatch.setenv("STOCK_PREDICTOR_POOL_WORKER", "1")
+    monkeypatch.setattr(parallel_training, "_get_executor", no_pool)
+    X = np.arange(40, dtype=float).reshape(20, 2)
+    tasks = [{"train": slice(None, 10), "epochs": 1}, {"train": slice(None), "epochs": 1}]
+
+    assert len(train_many(build_linear, X, X[:, 0], tasks, workers=2)) == 2
+
+
+def test_tasks_go_to_the_current_training_pool(monkeypatch):
+    from concurrent.futures import Future
+
+    import jobs
+    from backend import parallel_training
+
+    class InlinePool:
+        def __init__(self):
+            self.tasks = 0
+
+        def submit_task(self, func, *args):
+            self.tasks += 1
+            future = Future()
+            future.set_result(func(*args))
+            return future
+
+    def no_pool(workers):
+        raise AssertionError("private pool started")
+
+    monkeypatch.setattr(parallel_training, "_get_executor", no_pool)
+    pool = InlinePool()
+    token = jobs._current_pool.set(pool)
+    try:
+        X = np.arange(40, dtype=float).reshape(20, 2)
+        tasks = [{"train": slice(None, 10), "epochs": 1}, {"train": slice(None), "epochs": 1}]
+        assert len(train_many(build_linear, X, X[:, 0], tasks, workers=1)) == 2
+    finally:
+        jobs._current_pool.reset(token)
+    assert pool.tasks == 2
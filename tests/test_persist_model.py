@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backend.persist_model as pm
+from backend.feature_engine import MIN_REQUIRED_ROWS
+
+
+def _prices(n, symbol="PERSIST"):
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({
+        "timestamp": [f"day-{i:05d}" for i in range(n)],
+        "close": 100 + np.cumsum(rng.normal(size=n)),
+        "symbol": symbol,
+    })
+
+
+def _state(df, samples, **overrides):
+    return {**pm._training_state(df, samples, 0), **overrides}
+
+
+def test_plan_update_policy():
+    df = _prices(MIN_REQUIRED_ROWS + 50)
+    trained = df.iloc[:-5]
+    state = _state(trained, 30)
+
+    assert pm.plan_update(None, df, 35) == "full"
+    assert pm.plan_update(_state(df, 35), df, 35) == "reuse"
+    assert pm.plan_update(state, df, 35) == "incremental"
+
+    edited = df.copy()
+    edited.loc[0, "close"] += 1
+    assert pm.plan_update(state, edited, 35) == "full"
+    assert pm.plan_update(_state(trained, 30, architecture={}), df, 35) == "full"
+
+    budget = pm.MODEL_CONFIG["full_retrain_after"]
+    assert pm.plan_update(_state(trained, 30, incremental_updates=budget), df, 35) == "full"
+
+
+def test_new_bars_fine_tune_the_persisted_model(monkeypatch):
+    monkeypatch.setitem(pm.MODEL_CONFIG, "epochs", 1)
+    monkeypatch.setitem(pm.MODEL_CONFIG, "fine_tune_epochs", 1)
+    store = {}
+    monkeypatch.setattr(pm, "_load_persisted", lambda symbol: store.get(symbol, (None, None, None)))
+
+    def persist(net, scaler, symbol, state):
+        store[symbol] = (net, scaler, state)
+
+    monkeypatch.setattr(pm, "_persist", persist)
+
+    df = _prices(MIN_REQUIRED_ROWS + 60)
+    first = pm.train_and_predict(df.iloc[:-20])
+    scaler = store["PERSIST"][1]
+    assert first["training"] == "full"
+    assert pm.train_and_predict(df.iloc[:-20])["training"] == "reuse"
+
+    fitted = []
+    original_fit = pm._fine_tune
+
+    def fine_tune(net, scaled, targets, trained_samples):
+        fitted.append(len(scaled) - trained_samples)
+        return original_fit(net, scaled, targets, trained_samples)
+
+    monkeypatch.setattr(pm, "_fine_tune", fine_tune)
+    second = pm.train_and_predict(df)
+
+    state = store["PERSIST"][2]
+    assert second["training"] == "incremental"
+    assert fitted == [20]
+    assert store["PERSIST"][1] is scaler
+    assert state["incremental_updates"] == 1
+    assert state["trained_through"] == df["timestamp"].iloc[-1]
+
+
+def test_serving_only_never_trains(monkeypatch):
+    monkeypatch.setattr(pm, "SERVING_ONLY", True)
+    monkeypatch.setattr(pm, "_load_persisted", lambda symbol: (None, None, None))
+    with pytest.raises(ValueError):
+        pm.train_and_predict(_prices(MIN_REQUIRED_ROWS + 20))
@@ -0,0 +1,39 @@
+import pytest
+
+from backend.plots import PlotStore, render_plot
+
+DIAGNOSTICS = {
+    "predicted_vs_actual": {
+        "train": {"predicted": [0.1, 0.2], "actual": [0.1, 0.3]},
+        "test": {"predicted": [0.0], "actual": [-0.1]},
+    },
+    "importances": {"features": ["a", "b"], "values": [0.5, 0.1]},
+}
+
+
+def test_render_plot_returns_png():
+    for kind in ("prediction", "importance"):
+        assert render_plot(DIAGNOSTICS, kind).startswith(b"\x89PNG")
+    with pytest.raises(ValueError):
+        render_plot(DIAGNOSTICS, "other")
+
+
+def test_plot_store_renders_once_and_follows_its_loader(monkeypatch):
+    import backend.plots as plots
+
+    calls = []
+    monkeypatch.setattr(plots, "render_plot", lambda d, kind: calls.append(kind) or b"png")
+    runs = {"run1": DIAGNOSTICS}
+    store = PlotStore(runs.get, max_entries=1)
+
+    assert "run1" in store and "run2" not in store
+    assert store.png("run1", "prediction") == b"png"
+    assert store.png("run1", "prediction") == b"png"
+    assert calls == ["prediction"]
+
+    # Once the run's result is gone its plots are too, rendered or not.
+    del runs["run1"]
+    with pytest.raises(KeyError):
+        store.png("run1", "prediction")
+    with pytest.raises(KeyError):
+        store.diagnostics("run1")
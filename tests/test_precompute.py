@@ -0,0 +1,71 @@
+import asyncio
+from datetime import datetime, timezone
+
+from backend.precompute import AfterCloseScheduler, SnapshotStore, parse_time
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_next_run_is_the_next_weekday_after_close():
+    scheduler = AfterCloseScheduler(None, parse_time("21:30"))
+
+    # Wednesday before and after the close, then Friday evening.
+    assert scheduler.next_run(_utc(2024, 5, 15, 12, 0)) == _utc(2024, 5, 15, 21, 30)
+    assert scheduler.next_run(_utc(2024, 5, 15, 21, 30)) == _utc(2024, 5, 16, 21, 30)
+    assert scheduler.next_run(_utc(2024, 5, 17, 22, 0)) == _utc(2024, 5, 20, 21, 30)
+
+
+def test_snapshot_entries_are_served_only_for_their_key(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    assert store.get("AAPL", "baseline", "k1") is None
+
+    store.save("AAPL", {
+        "baseline": {"key": "k1", "result": {"prediction": 0.1, "run_id": "k1"}, "diagnostics": {"d": 1}},
+    })
+    result, diagnostics = store.get("AAPL", "baseline", "k1")
+    assert result == {"prediction": 0.1, "run_id": "k1"} and diagnostics == {"d": 1}
+    result["prediction"] = 9.0
+    assert store.get("AAPL", "baseline", "k1")[0]["prediction"] == 0.1
+    # Different dataset version or config, or a model that was not computed.
+    assert store.get("AAPL", "baseline", "k2") is None
+    assert store.get("AAPL", "persist", "k1") is None
+
+    # Another worker's store sees a replaced snapshot.
+    SnapshotStore(str(tmp_path)).save("AAPL", {"baseline": {"key": "k2", "result": {}}})
+    assert store.get("AAPL", "baseline", "k2") == ({}, None)
+
+
+def test_only_one_holder_of_the_precompute_lock(tmp_path):
+    first, second = SnapshotStore(str(tmp_path)), SnapshotStore(str(tmp_path))
+    with first.exclusive() as owner:
+        with second.exclusive() as other:
+            assert owner and not other
+    with second.exclusive() as owner:
+        assert owner
+
+
+def test_trigger_runs_one_job_at_a_time():
+    calls = []
+    release = None
+
+    async def job():
+        calls.append(1)
+        await release.wait()
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        scheduler = AfterCloseScheduler(job, parse_time("21:30"))
+        task = scheduler.trigger()
+        assert scheduler.trigger() is task
+        await asyncio.sleep(0)
+        assert scheduler.running
+        release.set()
+        await task
+        assert not scheduler.running and scheduler.last_run is not None
+        scheduler.stop()
+
+    asyncio.run(scenario())
+    assert calls == [1]
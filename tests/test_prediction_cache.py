@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from backend.prediction_cache import PredictionCache
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = PredictionCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"prediction": 0.1}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{"prediction": 0.1}] * 5
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_entries=2)
+    cache.get_or_compute("a", lambda: {"v": 1})
+    cache.get_or_compute("b", lambda: {"v": 2})
+    cache.get_or_compute("a", lambda: {"v": 0})
+    cache.get_or_compute("c", lambda: {"v": 3})
+
+    assert cache.get_or_compute("a", lambda: {"v": 0}) == {"v": 1}
+    assert cache.get_or_compute("b", lambda: {"v": 4}) == {"v": 4}
+
+
+def test_failures_are_not_cached():
+    cache = PredictionCache()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute("k", fail)
+    assert cache.get_or_compute("k", lambda: {"v": 1}) == {"v": 1}
+
+
+def test_stats_count_hits_and_misses():
+    cache = PredictionCache()
+    cache.get_or_compute("a", lambda: {"v": 1})
+    cache.get_or_compute("a", lambda: {"v": 0})
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["coalesced"]) == (1, 1, 0)
+    assert stats["entries"] == 1
+
+
+def test_find_returns_live_cached_values():
+    cache = PredictionCache(max_entries=1)
+    cache.get_or_compute("a", lambda: {"run_id": "a"})
+    assert cache.find(lambda v: v["run_id"] == "a") == {"run_id": "a"}
+
+    cache.get_or_compute("b", lambda: {"run_id": "b"})
+    assert cache.find(lambda v: v["run_id"] == "a") is None
@@ -0,0 +1,163 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import backend.prediction_history as ph
+
+
+class FakeQuery:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.filters = []
+        self.order_by = []
+        self.max_rows = None
+
+    def select(self, *args):
+        return self
+
+    def is_(self, column, value):
+        self.filters.append(lambda r: r.get(column) is None)
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda r: r.get(column) == value)
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda r: r[column] <= value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda r: r[column] in values)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda r: r[column] >= value)
+        return self
+
+    def or_(self, expression):
+        # Only the keyset condition built by fetch_history_page is supported.
+        self.client.cursors.append(expression)
+        date = expression.split(",")[0].rsplit(".", 1)[1]
+        row_id = int(expression.rsplit(".", 1)[1].rstrip(")"))
+        self.filters.append(
+            lambda r: (r["date_of_prediction"], r["id"]) < (date, row_id)
+        )
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, n):
+        self.max_rows = n
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.client.upserts.append(rows)
+        return self
+
+    def execute(self):
+        self.client.calls.append(self.name)
+        rows = [r for r in self.client.tables[self.name] if all(f(r) for f in self.filters)]
+        for column, desc in reversed(self.order_by):
+            rows.sort(key=lambda r: r[column], reverse=desc)
+        return SimpleNamespace(data=rows[: self.max_rows])
+
+
+class FakeClient:
+    def __init__(self, predictions, prices):
+        self.tables = {ph.TABLE_NAME: predictions, "stock_prices": prices}
+        self.calls = []
+        self.upserts = []
+        self.cursors = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+def _prediction(id, date, predicted, symbol="AAPL"):
+    return {
+        "id": id,
+        "symbol": symbol,
+        "model_type": "baseline",
+        "predicted_price": predicted,
+        "10_days_later_date": date,
+        "actual_price": None,
+        "difference": None,
+    }
+
+
+@pytest.fixture
+def client(monkeypatch):
+    predictions = [
+        _prediction(1, "2024-01-02", 10.0),
+        _prediction(2, "2024-01-02", 12.0),
+        _prediction(3, "2024-01-03", 20.0, symbol="MSFT"),
+        _prediction(4, "2024-01-04", 5.0),  # no close stored yet
+    ]
+    prices = [
+        {"symbol": "AAPL", "timestamp": "2024-01-02", "close": 11.0},
+        {"symbol": "MSFT", "timestamp": "2024-01-02", "close": 99.0},
+        {"symbol": "MSFT", "timestamp": "2024-01-03", "close": 21.0},
+    ]
+    fake = FakeClient(predictions, prices)
+    monkeypatch.setattr(ph.db, "_client", fake)
+    return fake
+
+
+def test_refresh_uses_one_query_per_phase(client):
+    report = ph.refresh_missing_actuals()
+
+    assert report["updated"] == 3
+    assert client.calls == [ph.TABLE_NAME, "stock_prices", ph.TABLE_NAME]
+    assert len(client.upserts) == 1
+    written = {r["id"]: (r["actual_price"], r["difference"]) for r in client.upserts[0]}
+    assert written == {1: (11.0, 1.0), 2: (11.0, -1.0), 3: (21.0, 1.0)}
+    assert set(report["phases"]) == {"pending", "closes", "compute", "write"}
+    assert report["phases"]["pending"]["rows"] == 4
+
+
+def test_refresh_prefers_cached_prices(client):
+    cached = {
+        "AAPL": pd.DataFrame({"timestamp": ["2024-01-02"], "close": [11.0]}),
+        "MSFT": pd.DataFrame({"timestamp": ["2024-01-03"], "close": [21.0]}),
+    }
+
+    report = ph.refresh_missing_actuals(price_lookup=cached.__getitem__)
+
+    assert report["updated"] == 3
+    # Only the close missing from the cache goes to the database.
+    assert client.calls.count("stock_prices") == 1
+
+
+def test_update_with_actual_writes_in_one_call(client):
+    assert ph.update_with_actual("2024-01-02", 11.5) == 2
+    assert [r["id"] for r in client.upserts[0]] == [1, 2]
+
+
+def test_history_pages_with_keyset_cursor(monkeypatch):
+    rows = [
+        {"id": i, "date_of_prediction": f"2024-01-{1 + i // 2:02d}", "model_type": "baseline"}
+        for i in range(1, 6)
+    ]
+    fake = FakeClient(rows, [])
+    monkeypatch.setattr(ph.db, "_client", fake)
+
+    first = ph.fetch_history_page(limit=2)
+    assert [r["id"] for r in first["items"]] == [5, 4]
+    second = ph.fetch_history_page(limit=2, cursor=first["next_cursor"])
+    assert [r["id"] for r in second["items"]] == [3, 2]
+    last = ph.fetch_history_page(limit=2, cursor=second["next_cursor"])
+    assert [r["id"] for r in last["items"]] == [1]
+    assert last["next_cursor"] is None
+    assert fake.cursors[0] == (
+        "date_of_prediction.lt.2024-01-03,and(date_of_prediction.eq.2024-01-03,id.lt.4)"
+    )
+
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        ph.decode_cursor("not-a-cursor")
@@ -0,0 +1,250 @@
+import threading
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import backend.stock_cache as sc
+from backend.stock_cache import StockPriceCache, SymbolPriceCache
+
+
+class FakeQuery:
+    def __init__(self, client):
+        self.client = client
+        self.after = None
+        self.bounds = None
+        self.symbol = None
+
+    def select(self, *args):
+        return self
+
+    def eq(self, column, value):
+        self.symbol = value
+        return self
+
+    def gt(self, column, value):
+        self.after = value
+        return self
+
+    def order(self, column):
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end)
+        return self
+
+    def execute(self):
+        self.client.queries.append(self.after)
+        rows = [
+            r for r in self.client.rows
+            if (self.after is None or r["timestamp"] > self.after)
+            and (self.symbol is None or r.get("symbol", "AAPL") == self.symbol)
+        ]
+        start, end = self.bounds
+        return SimpleNamespace(data=rows[start:end + 1])
+
+
+class FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def table(self, name):
+        return FakeQuery(self)
+
+
+def _row(day, close):
+    return {"timestamp": f"2024-01-{day:02d}", "close": close}
+
+
+def test_refresh_fetches_only_new_rows(monkeypatch):
+    monkeypatch.setattr(sc, "PAGE_SIZE", 2)
+    client = FakeClient([_row(d, float(d)) for d in range(1, 6)])
+    cache = StockPriceCache(client, ttl_seconds=0)
+
+    assert len(cache.get()) == 5
+    client.rows.append(_row(6, 6.0))
+    client.queries.clear()
+
+    df = cache.get(force_refresh=True)
+    assert list(df["close"]) == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+    assert client.queries == ["2024-01-05"]
+
+
+def test_full_sync_picks_up_edits():
+    client = FakeClient([_row(d, float(d)) for d in range(1, 4)])
+    cache = StockPriceCache(client, ttl_seconds=0, full_sync_seconds=0)
+    cache.get()
+    client.rows[0] = _row(1, 10.0)
+
+    assert cache.get(force_refresh=True)["close"].iloc[0] == 10.0
+
+
+def test_new_process_starts_from_local_store(tmp_path):
+    from backend.price_store import LocalPriceStore
+
+    client = FakeClient([_row(d, float(d)) for d in range(1, 4)])
+    StockPriceCache(client, store=LocalPriceStore(str(tmp_path))).get()
+
+    client.rows.append(_row(4, 4.0))
+    client.queries.clear()
+    fresh = StockPriceCache(client, store=LocalPriceStore(str(tmp_path)))
+    df = fresh.get()
+
+    assert list(df["timestamp"]) == [f"2024-01-0{d}" for d in range(1, 5)]
+    assert client.queries == ["2024-01-03"]
+    assert LocalPriceStore(str(tmp_path)).manifest()["rows"] == 4
+
+
+def test_symbol_caches_are_separate_and_evicted_lru():
+    rows = [dict(_row(d, float(d)), symbol="AAPL") for d in range(1, 4)]
+    rows += [dict(_row(d, 10.0 * d), symbol="MSFT") for d in range(1, 3)]
+    caches = SymbolPriceCache(FakeClient(rows), max_bytes=1, ttl_seconds=0)
+
+    assert list(caches.get("AAPL")["close"]) == [1.0, 2.0, 3.0]
+    assert list(caches.get("MSFT")["close"]) == [10.0, 20.0]
+    # Over budget: only the most recently used symbol stays cached.
+    assert caches.symbols() == ["MSFT"]
+
+
+def test_merge_rows_updates_cached_symbols_in_place():
+    rows = [dict(_row(d, float(d)), symbol="AAPL") for d in range(1, 4)]
+    client = FakeClient(rows)
+    caches = SymbolPriceCache(client, max_bytes=10**9, ttl_seconds=60)
+    caches.get("AAPL")
+    client.queries.clear()
+
+    merged = caches.merge_rows([
+        dict(_row(4, 4.0), symbol="AAPL"),
+        dict(_row(3, 3.0), symbol="AAPL"),  # already cached
+        dict(_row(1, 1.0), symbol="MSFT"),  # not cached, loaded lazily later
+    ])
+
+    assert merged == {"AAPL": 1}
+    assert list(caches.get("AAPL")["close"]) == [1.0, 2.0, 3.0, 4.0]
+    assert client.queries == []
+
+
+def test_expired_cache_serves_stale_data_during_one_background_refresh():
+    client = FakeClient([_row(d, float(d)) for d in range(1, 4)])
+    cache = StockPriceCache(client, ttl_seconds=0)
+    cache.get()
+    client.rows.append(_row(4, 4.0))
+
+    release = threading.Event()
+    original = client.table
+    client.table = lambda name: release.wait(5) and original(name)
+
+    stale = [cache.get() for _ in range(5)]
+    assert all(len(df) == 3 for df in stale)
+    assert cache.stats()["refreshing"]
+
+    release.set()
+    while cache.stats()["refreshing"]:
+        threading.Event().wait(0.01)
+    client.table = original
+
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["stale_hits"] == 5
+    # One initial load plus a single background refresh for the burst.
+    assert stats["refreshes"] == 2
+    assert len(cache.peek()) == 4
+
+
+def test_cached_frame_is_read_only_and_not_copied():
+    cache = StockPriceCache(FakeClient([_row(d, float(d)) for d in range(1, 4)]), ttl_seconds=60)
+    first, second = cache.get(), cache.get()
+
+    assert first["close"].to_numpy().base is second["close"].to_numpy().base
+    with pytest.raises(ValueError):
+        first["close"].to_numpy()[0] = 99.0
+    # Edits through pandas land in the caller's own copy, never the cache.
+    first.loc[0, "close"] = 99.0
+    first["extra"] = 1
+    cached = cache.get()
+    assert cached["close"].iloc[0] == 1.0 and "extra" not in cached
+    assert cache.stats()["hits"] == 2
+
+
+def test_symbols_that_fail_to_load_are_not_kept(tmp_path):
+    from backend.price_store import LocalPriceStore
+
+    caches = SymbolPriceCache(
+        FakeClient([_row(1, 1.0)]),
+        max_bytes=10**9,
+        store_factory=lambda symbol: LocalPriceStore.for_symbol(str(tmp_path), symbol),
+    )
+    for symbol in ("ZZZ1", "ZZZ2"):
+        with pytest.raises(ValueError):
+            caches.get(symbol)
+
+    assert caches.symbols() == []
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_symbol_paths_stay_inside_the_store(tmp_path):
+    from backend.price_store import LocalPriceStore
+    from backend.symbols import normalize_symbol
+
+    for symbol in (".", ".."):
+        with pytest.raises(ValueError):
+            normalize_symbol(symbol)
+        with pytest.raises(ValueError):
+            LocalPriceStore.for_symbol(str(tmp_path), symbol)
+    assert normalize_symbol("brk.b") == "BRK.B"
+
+
+def test_local_store_keeps_missing_text_values(tmp_path):
+    from backend.price_store import LocalPriceStore
+
+    store = LocalPriceStore(str(tmp_path))
+    store.save(
+        pd.DataFrame(
+            {"timestamp": ["2024-01-01", "2024-01-02"], "note": [None, "split"], "close": [1.0, None]}
+        )
+    )
+    df, manifest = store.load()
+
+    assert df["note"].isna().tolist() == [True, False]
+    assert df["note"].iloc[1] == "split"
+    assert df["close"].isna().tolist() == [False, True]
+    assert manifest["nulls"] == ["note"]
+
+
+def _mapped(values) -> bool:
+    import numpy as np
+
+    while values is not None:
+        if isinstance(values, np.memmap):
+            return True
+        values = values.base
+    return False
+
+
+def test_updates_are_served_from_the_mapped_snapshot(tmp_path):
+    from backend.price_store import LocalPriceStore
+
+    store = LocalPriceStore(str(tmp_path))
+    client = FakeClient([_row(d, float(d)) for d in range(1, 4)])
+    cache = StockPriceCache(client, ttl_seconds=0, store=store)
+    cache.get()
+
+    client.rows.append(_row(4, 4.0))
+    df = cache.get(force_refresh=True)
+    assert len(df) == 4 and _mapped(df["close"].to_numpy())
+
+    cache.merge_rows(pd.DataFrame([_row(5, 5.0)]))
+    df = cache.peek()
+    assert len(df) == 5 and _mapped(df["close"].to_numpy())
+    assert store.manifest()["rows"] == 5
+
+
+def test_shared_client_is_resolved_on_first_fetch(monkeypatch):
+    client = FakeClient([_row(1, 1.0)])
+    calls = []
+    monkeypatch.setattr(sc.db, "get_client", lambda: calls.append(1) or client)
+
+    caches = SymbolPriceCache(max_bytes=10**9)
+    assert calls == []
+    assert len(caches.get("AAPL")) == 1
+    assert calls
@@ -0,0 +1,51 @@
+from backend import tracing
+
+
+def _count(stage, model=""):
+    series = tracing.STAGE_SECONDS.series().get((stage, model))
+    return series["count"] if series else 0
+
+
+def test_stage_outside_collector_is_observed_directly():
+    before = _count("test_direct")
+    with tracing.stage("test_direct"):
+        pass
+    assert _count("test_direct") == before + 1
+
+
+def test_collected_stages_are_returned_and_observed_once_by_the_caller():
+    before = _count("test_collected", "baseline")
+    with tracing.collect() as stages:
+        with tracing.stage("test_collected"):
+            pass
+        # Timings from a worker process join the open collector.
+        tracing.record([{"stage": "test_collected", "seconds": 0.5}])
+
+    assert [s["stage"] for s in stages] == ["test_collected", "test_collected"]
+    assert _count("test_collected", "baseline") == before
+
+    tracing.observe(stages, model="baseline")
+    assert _count("test_collected", "baseline") == before + 2
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = tracing.Histogram("demo_seconds", "Demo.", ("stage",), buckets=(0.1, 1, float("inf")))
+    hist.observe(0.05, stage='a"b')
+    hist.observe(0.5, stage='a"b')
+
+    lines = hist.render()
+    assert 'demo_seconds_bucket{stage="a\\"b",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{stage="a\\"b",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{stage="a\\"b",le="+Inf"} 2' in lines
+    assert 'demo_seconds_count{stage="a\\"b"} 2' in lines
+
+
+def test_gauge_tracks_blocks_in_flight():
+    gauge = tracing.Gauge()
+    with gauge.track():
+        with gauge.track():
+            assert gauge.value == 2
+    assert gauge.value == 0
+
+    body = tracing.render(tracing.metric_lines("demo_in_flight", "gauge", "Demo.", [({}, gauge.value)]))
+    assert "# TYPE demo_in_flight gauge\ndemo_in_flight 0\n" in body